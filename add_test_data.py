@@ -1,8 +1,9 @@
-from app import app, db
-from models import Person, Holiday, Team
+from config import create_db_app
+from models import db, Person, Holiday, Team
 from datetime import date
 
 def add_test_data():
+    app = create_db_app()
     with app.app_context():
         # Takımlar ekle
         if not Team.query.first():
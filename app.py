@@ -1,82 +1,142 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session
+import click
+import io
+from flask import Blueprint, Response, current_app, render_template, request, jsonify, redirect, url_for, flash, session, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from models import db, User, Person, Team, LeaveRequest, Holiday, LeaveBalance
+from config import create_db_app, init_template_cache
+from models import db, User, Person, Team, LeaveRequest, Holiday, LeaveBalance, Notification
+from overlap import find_conflicts, has_conflict, overlaps
+from work_calendar import work_calendar
+from balances import (ANNUAL_LEAVE_TYPE, STATUS_CONFLICT_MESSAGE, apply_status_change, balance_deltas,
+                      balance_message, balance_or_default, get_or_create_balance, insufficient_year,
+                      rebuild_balances, remaining_balances, rollover_balances, transition_status)
+from capacity import capacity_index, capacity_message
+from policy import AUTO_APPROVER, policy_engine
+from backups import suggest_backups
+from availability import MAX_DAYS as MAX_AVAILABILITY_DAYS, availability_cache, team_availability
+from bulk import BulkError, parse_items, process as process_bulk
+from instrumentation import init_query_stats
+from metrics import init_metrics
+from identity import identity_cache, init_identity_cache
+from fragments import fragment_cache, init_fragment_cache
+from refdata import init_reference_cache, reference_response, response_cache as reference_cache
+from auth import HasherBusy, authenticate, init_auth, login_retry_after
+from notifications import (LONG_POLL_MAX, init_notifications, leave_status_changed,
+                           unread_counter, unread_events, unread_for)
+from reconcile import reconcile
+from export import BALANCE_HEADER, LEAVE_REQUEST_HEADER, balance_rows, leave_request_rows, stream_csv
+from importer import IMPORTERS, import_stream
+from migrations import HEAD as SCHEMA_HEAD, current_version, upgrade as upgrade_schema
+from pagination import keyset_page, parse_limit, stream_page
+from queries import (balances_with_person, leave_requests_with_person, pending_requests,
+                     persons_with_team, upcoming_approved, users_with_person)
 from datetime import datetime, date, timedelta
 from werkzeug.security import generate_password_hash, check_password_hash
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'your-secret-key-here'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///izin_takip.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.permanent_session_lifetime = timedelta(hours=8)
+# Rotalar ve CLI komutları create_app ile uygulamaya bağlanır
+bp = Blueprint('main', __name__, cli_group=None)
 
 # Flask-Login setup
 login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
+login_manager.login_view = 'main.login'
 login_manager.login_message = 'Bu sayfaya erişmek için giriş yapmalısınız.'
 login_manager.login_message_category = 'info'
 
+def create_app(config=None):
+    """Uygulamayı oluştur; config verilirse ortam ayarlarının üzerine yazılır"""
+    app = create_db_app(config, __name__)
+    app.permanent_session_lifetime = timedelta(hours=8)
+    init_template_cache(app)
+    init_query_stats(app)
+    init_metrics(app)
+    init_identity_cache(app)
+    init_reference_cache(app)
+    init_fragment_cache(app)
+    init_auth(app)
+    init_notifications(app)
+    login_manager.init_app(app)
+    app.register_blueprint(bp)
+    return app
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # Pasifleştirilen kullanıcının açık oturumu da sonlanır
+    identity = identity_cache.get(int(user_id))
+    return identity if identity and identity.is_active else None
+
+@bp.app_template_filter('working_days')
+def working_days_filter(leave):
+    """Şablonlarda izin talebinin iş günü sayısı"""
+    return work_calendar.working_days(leave.start_date, leave.end_date)
 
 # Yetki kontrolü decorator'ı
 def admin_required(f):
     def wrapper(*args, **kwargs):
         if not current_user.is_authenticated or not current_user.can_access_admin():
             flash('Bu sayfaya erişim yetkiniz yok', 'error')
-            return redirect(url_for('index'))
+            return redirect(url_for('main.index'))
         return f(*args, **kwargs)
     wrapper.__name__ = f.__name__
     return wrapper
 
 # Login ve Authentication Routes
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
         
-        user = User.query.filter_by(username=username, is_active=True).first()
+        # Deneme sınırı aşıldıysa hash hesaplanmadan reddedilir
+        retry_after = login_retry_after(username, request.remote_addr)
+        if retry_after:
+            flash(f'Çok fazla başarısız deneme. {retry_after} saniye sonra tekrar deneyin', 'error')
+            return render_template('login.html'), 429, {'Retry-After': str(retry_after)}
         
-        if user and user.check_password(password):
+        try:
+            user = authenticate(username, password, request.remote_addr)
+        except HasherBusy:
+            flash('Sunucu şu anda yoğun, lütfen biraz sonra tekrar deneyin', 'error')
+            return render_template('login.html'), 503, {'Retry-After': '1'}
+        
+        if user:
             login_user(user, remember=False)
             session.permanent = True
-            user.last_login = datetime.now()
-            db.session.commit()
             
             next_page = request.args.get('next')
             if next_page:
                 return redirect(next_page)
             
             if user.can_access_admin():
-                return redirect(url_for('admin'))
+                return redirect(url_for('main.admin'))
             else:
-                return redirect(url_for('index'))
+                return redirect(url_for('main.index'))
         else:
             flash('Geçersiz kullanıcı adı veya şifre', 'error')
     
     return render_template('login.html')
 
-@app.route('/logout')
+@bp.route('/logout')
 @login_required
 def logout():
     logout_user()
     flash('Başarıyla çıkış yaptınız', 'success')
-    return redirect(url_for('login'))
+    return redirect(url_for('main.login'))
 
 # Ana sayfa
-@app.route('/')
+@bp.route('/')
 @login_required
 def index():
     try:
         today = date.today()
-        holidays = Holiday.query.filter(Holiday.date >= date(today.year, 1, 1)).order_by(Holiday.date).limit(30).all()
-        upcoming = LeaveRequest.query.filter(LeaveRequest.start_date >= today, LeaveRequest.status == 'approved').order_by(LeaveRequest.start_date).limit(20).all()
-        persons = Person.query.order_by(Person.name).all()
-        return render_template('index.html', holidays=holidays, upcoming=upcoming, persons=persons)
+        holiday_list = fragment_cache.render('holiday_list', 'fragments/holiday_list.html', lambda: {
+            'holidays': Holiday.query.filter(Holiday.date >= date(today.year, 1, 1)).order_by(Holiday.date).limit(5).all()
+        }, year=today.year)
+        person_options = fragment_cache.render('person_options', 'fragments/person_options.html', lambda: {
+            'persons': Person.query.order_by(Person.name).all()
+        })
+        upcoming = upcoming_approved(today, 20).all()
+        return render_template('index.html', holiday_list=holiday_list, upcoming=upcoming,
+                               person_options=person_options)
     except Exception as e:
         return f"Template hatası: {str(e)}", 500
 
@@ -84,30 +144,47 @@ def index():
 # Admin Panel (Kullanıcı yönetimi)
 
 # Status sayfası - Bağlantı testi için
-@app.route('/status')
+@bp.route('/status')
 def status():
     return render_template('status.html')
 
 # Admin Panel (Kullanıcı yönetimi)
-@app.route('/admin')
+@bp.route('/admin')
 @login_required
 @admin_required
 def admin():
-    with app.app_context():
-        # Bekleyen izin taleplerini getir
-        pending = LeaveRequest.query.filter_by(status='pending').all()
-        
-        # Yıllık izin özetini getir
-        year = datetime.now().year
-        summary = LeaveBalance.query.filter_by(year=year).join(Person).all()
-        
-        return render_template('admin.html',
-                               pending=pending,
-                               summary=summary,
-                               year=year)
+    # Bekleyen izin taleplerini getir
+    pending = pending_requests().all()
+    
+    # Yıllık izin özeti yalnızca personel sayısı olarak gösterilir
+    year = datetime.now().year
+    summary_count = balances_with_person(year).count()
+    
+    return render_template('admin.html',
+                           pending=pending,
+                           summary_count=summary_count,
+                           year=year)
 
 # İzin Talebi API'leri
-@app.route('/api/leave/check', methods=['POST'])
+def _after_status_change(leave_request, team_id, old_status):
+    """Commit sonrası süreç içi yapıları güncelle"""
+    capacity_index.apply_status_change(team_id, leave_request.start_date,
+                                       leave_request.end_date, old_status,
+                                       leave_request.status)
+    availability_cache.invalidate(team_id, leave_request.start_date,
+                                  leave_request.end_date)
+    leave_status_changed(leave_request, old_status)
+
+def _has_balance(person, leave_request):
+    """Yıllık izinde talep edilen günler her yılın kalan bakiyesine sığıyor mu"""
+    if leave_request.leave_type != ANNUAL_LEAVE_TYPE:
+        return True
+    requested_by_year = work_calendar.working_days_by_year(leave_request.start_date,
+                                                           leave_request.end_date)
+    return all(balance_or_default(person, year).remaining >= days
+               for year, days in requested_by_year.items())
+
+@bp.route('/api/leave/check', methods=['POST'])
 @login_required
 def check_leave():
     try:
@@ -122,95 +199,144 @@ def check_leave():
         if start_date > end_date:
             return jsonify({'available': False, 'message': 'Başlangıç tarihi bitiş tarihinden sonra olamaz'})
         
-        # Mevcut izinlerle çakışma kontrolü
-        conflicts = LeaveRequest.query.filter(
-            LeaveRequest.person_id == person_id,
-            LeaveRequest.status.in_(['approved', 'pending']),
-            db.or_(
-                (LeaveRequest.start_date <= start_date) & (LeaveRequest.end_date >= start_date),
-                (LeaveRequest.start_date <= end_date) & (LeaveRequest.end_date >= end_date),
-                (LeaveRequest.start_date >= start_date) & (LeaveRequest.end_date <= end_date)
-            )
-        ).all()
-        
-        # Yıllık izin bakiyesi kontrolü
-        requested_days = (end_date - start_date).days + 1
-        year = start_date.year
-        
-        # Bu yıl kullanılan izin günlerini hesapla
-        used_leaves = LeaveRequest.query.filter(
-            LeaveRequest.person_id == person_id,
-            LeaveRequest.status == 'approved',
-            db.or_(
-                (LeaveRequest.start_date <= start_date) & (LeaveRequest.end_date >= start_date),
-                (LeaveRequest.start_date <= end_date) & (LeaveRequest.end_date >= end_date),
-                (LeaveRequest.start_date >= start_date) & (LeaveRequest.end_date <= end_date)
-            )
-        ).all()
+        # Mevcut izinlerle çakışma kontrolü (onaylı + bekleyen, tek sorgu)
+        conflicts = find_conflicts(person_id, start_date, end_date)
+        
+        # Yıllık izin bakiyesi kontrolü (hafta sonu ve resmi tatiller hariç)
+        requested_days = work_calendar.working_days(start_date, end_date)
+        requested_by_year = work_calendar.working_days_by_year(start_date, end_date)
+        balances = {year: balance_or_default(person, year) for year in requested_by_year}
+        
+        # Talep yıllara bölünür; her yılın bakiyesi ayrı yetmeli
+        enough_balance = all(balances[year].remaining >= days
+                             for year, days in requested_by_year.items())
+        used_days = balances[start_date.year].used
+        remaining_days = balances[start_date.year].remaining
         
-        used_days = sum([
-            (min(lr.end_date, date(year, 12, 31)) - max(lr.start_date, date(year, 1, 1))).days + 1
-            for lr in used_leaves
-            if lr.start_date.year == year or lr.end_date.year == year
-        ])
+        # Resmi tatiller (önbellekteki takvimden)
+        holidays = work_calendar.holidays_between(start_date, end_date)
         
-        # Yıllık izin limiti (varsayılan: 20 gün)
-        annual_limit = 20
-        remaining_days = annual_limit - used_days
+        # Takım kapasitesi (onaylı + bekleyen takım arkadaşları)
+        overbooked = capacity_index.overbooked_days(person.team_id, start_date, end_date)
         
-        # Resmi tatiller
-        holidays = Holiday.query.filter(
-            Holiday.date >= start_date,
-            Holiday.date <= end_date
-        ).all()
+        # Takım politikası ve engelleyici etkinlikler (önbellekteki kurallardan)
+        policy = policy_engine.evaluate(person.team_id, data.get('leave_type', 'annual'),
+                                        start_date, end_date)
+        
+        available = len(conflicts) == 0 and enough_balance and not overbooked and policy.allowed
         
         return jsonify({
-            'available': len(conflicts) == 0 and remaining_days >= requested_days,
-            'holidays': [{'date': h.date.strftime('%Y-%m-%d'), 'name': h.name} for h in holidays],
+            'available': available,
+            'holidays': [{'date': d.strftime('%Y-%m-%d'), 'name': name} for d, name in holidays],
             'conflicts': [{'start': c.start_date.strftime('%Y-%m-%d'), 'end': c.end_date.strftime('%Y-%m-%d')} for c in conflicts],
+            'capacity_conflicts': [d.strftime('%Y-%m-%d') for d in overbooked],
+            'policy_violations': policy.violations,
+            'requires_approval': policy.requires_approval,
+            'requested_days': requested_days,
             'used_days': used_days,
             'remaining_days': remaining_days,
-            'message': 'İzin uygun' if len(conflicts) == 0 and remaining_days >= requested_days else 'İzin uygun değil'
+            'message': 'İzin uygun' if available else 'İzin uygun değil'
         })
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/leave/request', methods=['POST'])
+@bp.route('/api/leave/request', methods=['POST'])
 @login_required
 def request_leave():
     try:
         data = request.get_json()
+        person = Person.query.get_or_404(data['person_id'])
+        start_date = datetime.strptime(data['start_date'], '%Y-%m-%d').date()
+        end_date = datetime.strptime(data['end_date'], '%Y-%m-%d').date()
+        
+        if start_date > end_date:
+            return jsonify({'error': 'Başlangıç tarihi bitiş tarihinden sonra olamaz'}), 400
+        
+        # Aynı personelin onaylı/bekleyen bir izniyle çakışıyorsa reddet
+        if has_conflict(data['person_id'], start_date, end_date):
+            return jsonify({'error': 'Bu tarihlerde mevcut bir izin talebi var'}), 409
+        
+        overbooked = capacity_index.overbooked_days(person.team_id, start_date, end_date)
+        if overbooked:
+            return jsonify({'error': capacity_message(overbooked)}), 409
+        
+        leave_type = data.get('leave_type', 'annual')
+        policy = policy_engine.evaluate(person.team_id, leave_type, start_date, end_date)
+        if not policy.allowed:
+            return jsonify({'error': '; '.join(policy.violations)}), 400
         
         leave_request = LeaveRequest(
-            person_id=data['person_id'],
-            start_date=datetime.strptime(data['start_date'], '%Y-%m-%d').date(),
-            end_date=datetime.strptime(data['end_date'], '%Y-%m-%d').date(),
+            person_id=person.id,
+            leave_type=leave_type,
+            start_date=start_date,
+            end_date=end_date,
             reason=data.get('reason', ''),
             status='pending',
             created_at=datetime.now()
         )
         
+        # Onay gerektirmeyen türler bakiye yetiyorsa doğrudan onaylanır
+        if not policy.requires_approval and _has_balance(person, leave_request):
+            leave_request.status = 'approved'
+            leave_request.approved_by = AUTO_APPROVER
+            leave_request.approved_at = datetime.now()
+        
         db.session.add(leave_request)
+        # Bakiye aynı transaction içinde güncellenir (pending/used += gün)
+        apply_status_change(leave_request, None, leave_request.status, person=person)
         db.session.commit()
+        _after_status_change(leave_request, person.team_id, None)
         
-        return jsonify({'message': 'İzin talebi başarıyla oluşturuldu'}), 201
+        if leave_request.status == 'approved':
+            return jsonify({'message': 'İzin talebi otomatik olarak onaylandı',
+                            'id': leave_request.id, 'status': leave_request.status}), 201
+        return jsonify({'message': 'İzin talebi başarıyla oluşturuldu',
+                        'id': leave_request.id, 'status': leave_request.status}), 201
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/admin/leave/approve/<int:request_id>', methods=['PUT'])
+@bp.route('/api/admin/leave/approve/<int:request_id>', methods=['PUT'])
 @login_required
 @admin_required
 def approve_leave(request_id):
     try:
         leave_request = LeaveRequest.query.get_or_404(request_id)
-        leave_request.status = 'approved'
-        leave_request.approved_by = current_user.username
-        leave_request.approved_at = datetime.now()
+        
+        # Aynı aralıkta onaylanmış başka bir izin varsa onaylama
+        if has_conflict(leave_request.person_id, leave_request.start_date,
+                        leave_request.end_date, statuses=('approved',),
+                        exclude_id=leave_request.id):
+            return jsonify({'error': 'Personelin bu tarihlerde onaylı başka bir izni var'}), 409
+        
+        # Onaylı takım arkadaşlarıyla birlikte kapasite aşılıyorsa onaylama
+        team_id = leave_request.person.team_id
+        if leave_request.status != 'approved':
+            overbooked = capacity_index.overbooked_days(team_id, leave_request.start_date,
+                                                        leave_request.end_date,
+                                                        statuses=('approved',))
+            if overbooked:
+                return jsonify({'error': capacity_message(overbooked)}), 409
+        
+        # Toplu onayla aynı kural: geçişten sonra bakiye eksiye düşmemeli
+        old_status = leave_request.status
+        person = leave_request.person
+        remaining = remaining_balances(
+            balance_deltas([(leave_request, old_status, 'approved')]), {person.id: person})
+        year = insufficient_year(leave_request, old_status, 'approved', remaining)
+        if year is not None:
+            return jsonify({'error': balance_message(year)}), 409
+        
+        if not transition_status(leave_request, 'approved',
+                                 approved_by=current_user.username,
+                                 approved_at=datetime.now()):
+            db.session.rollback()
+            return jsonify({'error': STATUS_CONFLICT_MESSAGE}), 409
         
         db.session.commit()
+        _after_status_change(leave_request, team_id, old_status)
         
         return jsonify({'message': 'İzin talebi onaylandı'})
         
@@ -218,17 +344,22 @@ def approve_leave(request_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/admin/leave/reject/<int:request_id>', methods=['PUT'])
+@bp.route('/api/admin/leave/reject/<int:request_id>', methods=['PUT'])
 @login_required
 @admin_required
 def reject_leave(request_id):
     try:
         leave_request = LeaveRequest.query.get_or_404(request_id)
-        leave_request.status = 'rejected'
-        leave_request.approved_by = current_user.username
-        leave_request.approved_at = datetime.now()
+        team_id = leave_request.person.team_id
+        old_status = leave_request.status
+        if not transition_status(leave_request, 'rejected',
+                                 approved_by=current_user.username,
+                                 approved_at=datetime.now()):
+            db.session.rollback()
+            return jsonify({'error': STATUS_CONFLICT_MESSAGE}), 409
         
         db.session.commit()
+        _after_status_change(leave_request, team_id, old_status)
         
         return jsonify({'message': 'İzin talebi reddedildi'})
         
@@ -236,7 +367,32 @@ def reject_leave(request_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/users', methods=['GET'])
+@bp.route('/api/admin/leave/bulk', methods=['POST'])
+@login_required
+@admin_required
+def bulk_leave_action():
+    try:
+        pairs = parse_items(request.get_json(silent=True))
+        results, changes = process_bulk(pairs, current_user.username)
+        db.session.commit()
+        for snapshot, team_id, old_status in changes:
+            _after_status_change(snapshot, team_id, old_status)
+        
+        succeeded = [r for r in results if r['ok']]
+        return jsonify({
+            'results': results,
+            'approved': sum(1 for r in succeeded if r['status'] == 'approved'),
+            'rejected': sum(1 for r in succeeded if r['status'] == 'rejected'),
+            'failed': len(results) - len(succeeded),
+        })
+        
+    except BulkError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/users', methods=['GET'])
 @login_required
 def get_users():
     if not current_user.can_manage_users():
@@ -253,7 +409,7 @@ def get_users():
         'last_login': user.last_login.strftime('%Y-%m-%d %H:%M:%S') if user.last_login else None
     } for user in users])
 
-@app.route('/api/users', methods=['POST'])
+@bp.route('/api/users', methods=['POST'])
 @login_required
 def create_user():
     if not current_user.can_manage_users():
@@ -286,7 +442,7 @@ def create_user():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/users/<int:user_id>', methods=['PUT'])
+@bp.route('/api/users/<int:user_id>', methods=['PUT'])
 @login_required
 def update_user(user_id):
     if not current_user.can_manage_users():
@@ -322,7 +478,7 @@ def update_user(user_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/users/<int:user_id>', methods=['DELETE'])
+@bp.route('/api/users/<int:user_id>', methods=['DELETE'])
 @login_required
 def delete_user(user_id):
     if not current_user.can_manage_users():
@@ -349,11 +505,11 @@ def delete_user(user_id):
         return jsonify({'error': str(e)}), 500
 
 # Kullanıcı Yönetimi Web Routes
-@app.route('/admin/users')
+@bp.route('/admin/users')
 @login_required
 @admin_required
 def admin_users():
-    users = User.query.order_by(User.username).all()
+    users = users_with_person().all()
     persons = Person.query.order_by(Person.name).all()
     # Kullanıcıları JSON'a serialize edilebilir hale getir
     users_json = [{
@@ -367,7 +523,7 @@ def admin_users():
     } for u in users]
     return render_template('admin_users.html', users=users, users_json=users_json, persons=persons)
 
-@app.route('/admin/users/create', methods=['POST'])
+@bp.route('/admin/users/create', methods=['POST'])
 @login_required
 @admin_required
 def admin_create_user():
@@ -382,12 +538,12 @@ def admin_create_user():
         # Kullanıcı adı kontrolü
         if User.query.filter_by(username=username).first():
             flash('Bu kullanıcı adı zaten kullanılıyor', 'error')
-            return redirect(url_for('admin_users'))
+            return redirect(url_for('main.admin_users'))
             
         # Email kontrolü
         if User.query.filter_by(email=email).first():
             flash('Bu email adresi zaten kullanılıyor', 'error')
-            return redirect(url_for('admin_users'))
+            return redirect(url_for('main.admin_users'))
         
         user = User(
             username=username,
@@ -406,9 +562,9 @@ def admin_create_user():
         db.session.rollback()
         flash(f'Hata: {str(e)}', 'error')
     
-    return redirect(url_for('admin_users'))
+    return redirect(url_for('main.admin_users'))
 
-@app.route('/admin/users/<int:user_id>/update', methods=['POST'])
+@bp.route('/admin/users/<int:user_id>/update', methods=['POST'])
 @login_required
 @admin_required
 def admin_update_user(user_id):
@@ -425,13 +581,13 @@ def admin_update_user(user_id):
         existing_user = User.query.filter_by(username=username).first()
         if existing_user and existing_user.id != user_id:
             flash('Bu kullanıcı adı zaten kullanılıyor', 'error')
-            return redirect(url_for('admin_users'))
+            return redirect(url_for('main.admin_users'))
             
         # Email kontrolü (kendisi hariç)
         existing_email = User.query.filter_by(email=email).first()
         if existing_email and existing_email.id != user_id:
             flash('Bu email adresi zaten kullanılıyor', 'error')
-            return redirect(url_for('admin_users'))
+            return redirect(url_for('main.admin_users'))
         
         user.username = username
         user.email = email
@@ -448,9 +604,9 @@ def admin_update_user(user_id):
         db.session.rollback()
         flash(f'Hata: {str(e)}', 'error')
     
-    return redirect(url_for('admin_users'))
+    return redirect(url_for('main.admin_users'))
 
-@app.route('/admin/users/<int:user_id>/delete', methods=['POST'])
+@bp.route('/admin/users/<int:user_id>/delete', methods=['POST'])
 @login_required
 @admin_required
 def admin_delete_user(user_id):
@@ -460,12 +616,12 @@ def admin_delete_user(user_id):
         # Admin kullanıcısını silmeyi engelle
         if user.username == 'admin':
             flash('Admin kullanıcısı silinemez', 'error')
-            return redirect(url_for('admin_users'))
+            return redirect(url_for('main.admin_users'))
         
         # Kendini silmeyi engelle
         if user.id == current_user.id:
             flash('Kendi hesabınızı silemezsiniz', 'error')
-            return redirect(url_for('admin_users'))
+            return redirect(url_for('main.admin_users'))
         
         db.session.delete(user)
         db.session.commit()
@@ -475,34 +631,38 @@ def admin_delete_user(user_id):
         db.session.rollback()
         flash(f'Hata: {str(e)}', 'error')
     
-    return redirect(url_for('admin_users'))
+    return redirect(url_for('main.admin_users'))
 
 # İzin Bakiyesi Yönetimi
-@app.route('/admin/leave-balances')
+@bp.route('/admin/leave-balances')
 @login_required
 @admin_required
 def admin_leave_balances():
     year = request.args.get('year', datetime.now().year, type=int)
-    balances = LeaveBalance.query.filter_by(year=year).join(Person).order_by(Person.name).all()
-    return render_template('admin_leave_balances.html', balances=balances, year=year)
+    balance_table = fragment_cache.render('balance_table', 'fragments/balance_table.html', lambda: {
+        'balances': balances_with_person(year).all()
+    }, year=year)
+    return render_template('admin_leave_balances.html', balance_table=balance_table, year=year)
 
-@app.route('/admin/leave-balances/update', methods=['POST'])
+@bp.route('/admin/leave-balances/update', methods=['POST'])
 @login_required
 @admin_required
 def admin_update_leave_balance():
+    year = None
     try:
-        person_id = request.form['person_id']
-        year = int(request.form['year'])
-        annual_leave = int(request.form['annual_leave'])
-        used_leave = int(request.form['used_leave'])
-        
-        balance = LeaveBalance.query.filter_by(person_id=person_id, year=year).first()
-        if not balance:
-            balance = LeaveBalance(person_id=person_id, year=year)
-            db.session.add(balance)
+        # Kullanılan/bekleyen günler defter tarafından tutulur; burada yalnızca
+        # izin hakkı ve devreden gün düzenlenir
+        balance_id = request.form.get('balance_id', type=int)
+        if balance_id:
+            balance = LeaveBalance.query.get_or_404(balance_id)
+        else:
+            person = Person.query.get_or_404(request.form.get('person_id', type=int))
+            balance = get_or_create_balance(person, int(request.form['year']))
+        year = balance.year
         
-        balance.annual_leave = annual_leave
-        balance.used_leave = used_leave
+        balance.entitlement = int(request.form['entitlement'])
+        if request.form.get('carryover'):
+            balance.carryover = int(request.form['carryover'])
         
         db.session.commit()
         flash('İzin bakiyesi güncellendi', 'success')
@@ -511,46 +671,90 @@ def admin_update_leave_balance():
         db.session.rollback()
         flash(f'Hata: {str(e)}', 'error')
     
-    return redirect(url_for('admin_leave_balances'))
+    return redirect(url_for('main.admin_leave_balances', year=year))
 
 # API Endpoints
-@app.route('/api/holidays', methods=['GET'])
+def _parse_date_arg(name, default=None):
+    """Sorgu parametresindeki YYYY-MM-DD tarihini çöz"""
+    value = request.args.get(name)
+    if not value:
+        return default
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f'{name} parametresi YYYY-MM-DD formatında olmalı')
+
+@bp.route('/api/holidays', methods=['GET'])
 @login_required
 def get_holidays():
-    holidays = Holiday.query.order_by(Holiday.date).all()
-    return jsonify([{
+    return reference_response(('holiday',), _holidays_page)
+
+def _holidays_page():
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        query = Holiday.query
+        if request.args.get('country'):
+            query = query.filter(Holiday.country == request.args['country'])
+        if request.args.get('from'):
+            query = query.filter(Holiday.date >= _parse_date_arg('from'))
+        if request.args.get('to'):
+            query = query.filter(Holiday.date <= _parse_date_arg('to'))
+        
+        query = keyset_page(query, [Holiday.date, Holiday.id],
+                            request.args.get('cursor'), limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return stream_page(query, limit, lambda h: {
         'id': h.id,
         'date': h.date.strftime('%Y-%m-%d'),
         'name': h.name
-    } for h in holidays])
+    }, lambda h: (h.date, h.id))
 
-@app.route('/api/persons', methods=['GET'])
+@bp.route('/api/persons', methods=['GET'])
 @login_required
 def get_persons():
-    persons = Person.query.order_by(Person.name).all()
-    return jsonify([{
+    return reference_response(('person', 'team'), lambda: jsonify([{
         'id': p.id,
         'name': p.name,
         'email': p.email,
         'team_id': p.team_id,
         'team_name': p.team.name if p.team else None
-    } for p in persons])
+    } for p in persons_with_team()]))
 
-@app.route('/api/teams', methods=['GET'])
+@bp.route('/api/teams', methods=['GET'])
 @login_required
 def get_teams():
-    teams = Team.query.order_by(Team.name).all()
-    return jsonify([{
+    return reference_response(('team',), lambda: jsonify([{
         'id': t.id,
         'name': t.name,
         'manager': t.manager
-    } for t in teams])
+    } for t in Team.query.order_by(Team.name)]))
 
-@app.route('/api/leave-requests', methods=['GET'])
+@bp.route('/api/leave-requests', methods=['GET'])
 @login_required
 def get_leave_requests():
-    requests = LeaveRequest.query.order_by(LeaveRequest.created_at.desc()).all()
-    return jsonify([{
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        query = leave_requests_with_person()
+        if request.args.get('status'):
+            query = query.filter(LeaveRequest.status == request.args['status'])
+        if request.args.get('person_id'):
+            query = query.filter(LeaveRequest.person_id == request.args.get('person_id', type=int))
+        if request.args.get('team_id'):
+            query = query.filter(LeaveRequest.person.has(Person.team_id == request.args.get('team_id', type=int)))
+        if request.args.get('from') or request.args.get('to'):
+            # Verilen tarih aralığıyla kesişen talepler
+            query = query.filter(overlaps(_parse_date_arg('from', date.min),
+                                          _parse_date_arg('to', date.max)))
+        
+        # En yeni talepler önce; eşit created_at için id ile kesin sıra
+        query = keyset_page(query, [LeaveRequest.created_at, LeaveRequest.id],
+                            request.args.get('cursor'), limit, descending=True)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return stream_page(query, limit, lambda r: {
         'id': r.id,
         'person_name': r.person.name,
         'start_date': r.start_date.strftime('%Y-%m-%d'),
@@ -558,27 +762,306 @@ def get_leave_requests():
         'reason': r.reason,
         'status': r.status,
         'created_at': r.created_at.strftime('%Y-%m-%d %H:%M:%S')
-    } for r in requests])
+    }, lambda r: (r.created_at, r.id))
+
+@bp.route('/api/calendar/availability', methods=['GET'])
+@login_required
+def calendar_availability():
+    team_id = request.args.get('team', type=int)
+    if team_id is None:
+        return jsonify({'error': 'team parametresi zorunlu'}), 400
+    team = Team.query.get_or_404(team_id)
+    
+    try:
+        start_date = _parse_date_arg('from', date.today().replace(day=1))
+        # Varsayılan bitiş: başlangıç ayının son günü
+        next_month = (start_date.replace(day=28) + timedelta(days=4)).replace(day=1)
+        end_date = _parse_date_arg('to', next_month - timedelta(days=1))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if start_date > end_date:
+        return jsonify({'error': 'from tarihi to tarihinden sonra olamaz'}), 400
+    if (end_date - start_date).days >= MAX_AVAILABILITY_DAYS:
+        return jsonify({'error': f'En fazla {MAX_AVAILABILITY_DAYS} günlük aralık sorgulanabilir'}), 400
+    
+    return jsonify(team_availability(team, start_date, end_date))
 
-@app.route('/api/admin/person/list', methods=['GET'])
+@bp.route('/api/admin/person/list', methods=['GET'])
 @login_required
 def admin_person_list():
     if not current_user.can_access_admin():
         return jsonify({'error': 'Yetkiniz yok'}), 403
-        
-    persons = Person.query.order_by(Person.name).all()
     
-    return jsonify([{
+    return reference_response(('person', 'team'), lambda: jsonify([{
         'id': person.id,
         'name': person.name,
         'email': person.email,
         'team_name': person.team.name if person.team else 'Takım Atanmamış'
-    } for person in persons])
+    } for person in persons_with_team()]))
+
+# Dışa aktarım (mutabakat)
+def _csv_response(filename, header, rows):
+    response = Response(stream_with_context(stream_csv(header, rows)),
+                        mimetype='text/csv; charset=utf-8')
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    return response
+
+@bp.route('/api/export/leave-requests', methods=['GET'])
+@login_required
+def export_leave_requests():
+    if not current_user.can_access_admin():
+        return jsonify({'error': 'Yetkiniz yok'}), 403
+    
+    try:
+        rows = leave_request_rows(status=request.args.get('status'),
+                                  team_id=request.args.get('team_id', type=int),
+                                  start_date=_parse_date_arg('from'),
+                                  end_date=_parse_date_arg('to'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return _csv_response('izin_talepleri.csv', LEAVE_REQUEST_HEADER, rows)
+
+@bp.route('/api/export/balances', methods=['GET'])
+@login_required
+def export_balances():
+    if not current_user.can_access_admin():
+        return jsonify({'error': 'Yetkiniz yok'}), 403
+    
+    year = request.args.get('year', type=int)
+    filename = f'izin_bakiyeleri_{year}.csv' if year else 'izin_bakiyeleri.csv'
+    return _csv_response(filename, BALANCE_HEADER, balance_rows(year))
+
+@bp.route('/api/admin/reconcile', methods=['GET'])
+@login_required
+def admin_reconcile():
+    if not current_user.can_access_admin():
+        return jsonify({'error': 'Yetkiniz yok'}), 403
+    
+    year = request.args.get('year', datetime.now().year, type=int)
+    try:
+        return jsonify(reconcile(year))
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/leave/<int:request_id>/backup-suggestions', methods=['GET'])
+@login_required
+def backup_suggestions(request_id):
+    leave_request = LeaveRequest.query.get_or_404(request_id)
+    try:
+        limit = parse_limit(request.args.get('limit', 10))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'leave_request_id': leave_request.id,
+        'start_date': leave_request.start_date.strftime('%Y-%m-%d'),
+        'end_date': leave_request.end_date.strftime('%Y-%m-%d'),
+        'suggestions': suggest_backups(leave_request, limit)
+    })
+
+# Bildirimler
+def _notification_person_id():
+    """Oturumdaki kullanıcının personeli; admin ?person_id= verebilir"""
+    person_id = request.args.get('person_id', type=int)
+    if person_id is not None and person_id != current_user.person_id:
+        if not current_user.can_access_admin():
+            return None
+        return person_id
+    return current_user.person_id
+
+@bp.route('/api/notifications', methods=['GET'])
+@login_required
+def get_notifications():
+    person_id = _notification_person_id()
+    if person_id is None:
+        return jsonify({'items': [], 'unread_count': 0})
+    try:
+        limit = parse_limit(request.args.get('limit'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    items = unread_for(person_id, limit).all()
+    unread_counter.ensure_loaded()
+    unread_count, _ = unread_counter.get(person_id)
+    return jsonify({
+        'items': [{
+            'id': n.id,
+            'message': n.message,
+            'created_at': n.created_at.strftime('%Y-%m-%d %H:%M:%S') if n.created_at else None
+        } for n in items],
+        'unread_count': unread_count
+    })
+
+@bp.route('/api/notifications/unread-count', methods=['GET'])
+@login_required
+def get_unread_count():
+    """Uzun yoklama: since sürümü değişene kadar en fazla wait sn bekler"""
+    person_id = _notification_person_id()
+    if person_id is None:
+        return jsonify({'unread_count': 0, 'version': 0})
+    since = request.args.get('since', type=int)
+    wait = min(max(request.args.get('wait', 0, type=float), 0), LONG_POLL_MAX)
+    unread_counter.ensure_loaded()
+    # Beklerken veritabanı bağlantısı tutulmaz
+    db.session.remove()
+    if since is None:
+        unread_count, version = unread_counter.get(person_id)
+    else:
+        unread_count, version = unread_counter.wait(person_id, since, wait)
+    return jsonify({'unread_count': unread_count, 'version': version})
+
+@bp.route('/api/notifications/stream', methods=['GET'])
+@login_required
+def stream_notifications():
+    """Okunmamış bildirim sayısı için Server-Sent Events akışı"""
+    person_id = _notification_person_id()
+    if person_id is None:
+        return jsonify({'error': 'Personel kaydı bulunamadı'}), 404
+    last_event_id = request.headers.get('Last-Event-ID', request.args.get('since'))
+    version = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    unread_counter.ensure_loaded()
+    return Response(unread_events(person_id, version), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@bp.route('/api/notifications/read', methods=['PUT'])
+@login_required
+def mark_notifications_read():
+    person_id = _notification_person_id()
+    if person_id is None:
+        return jsonify({'updated': 0})
+    try:
+        data = request.get_json(silent=True) or {}
+        query = Notification.query.filter(
+            Notification.person_id == person_id,
+            Notification.is_read.is_(False)
+        )
+        # ids verilmezse tümü okundu işaretlenir
+        if data.get('ids'):
+            query = query.filter(Notification.id.in_(data['ids']))
+        updated = query.update({Notification.is_read: True}, synchronize_session=False)
+        db.session.commit()
+        unread_counter.add({person_id: -updated})
+        return jsonify({'updated': updated})
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/admin/cache-stats', methods=['GET'])
+@login_required
+def cache_stats():
+    if not current_user.can_access_admin():
+        return jsonify({'error': 'Yetkiniz yok'}), 403
+    
+    return jsonify({'identity': identity_cache.stats(),
+                    'reference': reference_cache.stats(),
+                    'fragments': fragment_cache.stats()})
+
+# Toplu içe aktarım
+@bp.route('/api/admin/import', methods=['POST'])
+@login_required
+def admin_import():
+    if not current_user.can_access_admin():
+        return jsonify({'error': 'Yetkiniz yok'}), 403
+    
+    try:
+        kind = request.form.get('kind')
+        upload = request.files.get('file')
+        if kind not in IMPORTERS or upload is None:
+            return jsonify({'error': f"kind ({', '.join(IMPORTERS)}) ve file alanları zorunlu"}), 400
+        
+        fmt = request.form.get('format') or ('json' if upload.filename.lower().endswith(('.json', '.jsonl')) else 'csv')
+        stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+        report = import_stream(kind, stream, fmt)
+        return jsonify(report.to_dict())
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+# CLI komutları
+@bp.cli.command('rebuild-balances')
+@click.option('--year', type=int, default=None, help='Yalnızca bu yılı yeniden hesapla')
+def rebuild_balances_command(year):
+    """İzin bakiyelerini taleplerden toplu olarak yeniden hesapla"""
+    result = rebuild_balances(year)
+    click.echo(f"{result['updated']} bakiye güncellendi, {result['created']} bakiye oluşturuldu")
+
+@bp.cli.command('rollover')
+@click.option('--year', type=int, required=True, help='Bakiyeleri oluşturulacak yıl')
+@click.option('--max-carryover', type=int, default=None,
+              help='Devreden en fazla gün (varsayılan: LEAVE_CARRYOVER_MAX, yoksa sınırsız)')
+@click.option('--batch-size', type=int, default=5000, help='Tek seferde işlenen personel sayısı')
+def rollover_command(year, max_carryover, batch_size):
+    """Yeni yıl bakiyelerini kıdeme göre hak ve önceki yıldan devirle oluştur"""
+    if max_carryover is None:
+        max_carryover = current_app.config.get('LEAVE_CARRYOVER_MAX')
+    started = datetime.now()
+    
+    def progress(totals):
+        elapsed = (datetime.now() - started).total_seconds()
+        click.echo(f"  {totals['persons']} personel işlendi ({elapsed:.1f} sn)")
+    
+    totals = rollover_balances(year, max_carryover, batch_size, log=progress)
+    elapsed = (datetime.now() - started).total_seconds()
+    click.echo(f"{year}: {totals['created']} bakiye oluşturuldu, {totals['updated']} bakiyenin "
+               f"devri güncellendi, {totals['persons']} personel ({elapsed:.1f} sn)")
+
+@bp.cli.command('reconcile')
+@click.option('--year', type=int, default=None, help='Karşılaştırılacak yıl (varsayılan: bu yıl)')
+@click.option('--fix', is_flag=True, help='Fark varsa yılın bakiyelerini taleplerden yeniden hesapla')
+def reconcile_command(year, fix):
+    """Bakiyeleri izin talepleriyle karşılaştır; fark varsa çıkış kodu 1"""
+    year = year or datetime.now().year
+    started = datetime.now()
+    report = reconcile(year)
+    elapsed = (datetime.now() - started).total_seconds()
+    click.echo(f"{year}: {report['checked']} bakiye kontrol edildi, "
+               f"{report['mismatched']} fark ({elapsed:.1f} sn)")
+    for item in report['items'][:20]:
+        click.echo(f"  {item['name']} (#{item['person_id']}): kullanılan {item['stored']['used']}"
+                   f"/{item['expected']['used']}, bekleyen {item['stored']['pending']}"
+                   f"/{item['expected']['pending']} (kayıtlı/beklenen)")
+    if report['mismatched'] > 20:
+        click.echo(f"  ... ve {report['mismatched'] - 20} fark daha")
+    if report['mismatched'] and fix:
+        result = rebuild_balances(year)
+        click.echo(f"{result['updated']} bakiye güncellendi, {result['created']} bakiye oluşturuldu")
+    elif report['mismatched']:
+        raise SystemExit(1)
+
+@bp.cli.command('import')
+@click.argument('kind', type=click.Choice(list(IMPORTERS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'json']), default=None,
+              help='Dosya formatı (varsayılan: uzantıdan)')
+@click.option('--batch-size', type=int, default=5000, help='Tek seferde yazılan satır sayısı')
+def import_command(kind, path, fmt, batch_size):
+    """CSV/JSON dosyasından personel, takım, tatil veya izin aktar"""
+    fmt = fmt or ('json' if path.lower().endswith(('.json', '.jsonl')) else 'csv')
+    started = datetime.now()
+    with open(path, encoding='utf-8-sig', newline='') as stream:
+        report = import_stream(kind, stream, fmt, batch_size)
+    elapsed = (datetime.now() - started).total_seconds()
+    click.echo(f'{report.imported}/{report.total} satır aktarıldı, '
+               f'{report.rejected} satır reddedildi ({elapsed:.1f} sn)')
+    for error in report.errors[:20]:
+        click.echo(f"  satır {error['line']}: {', '.join(error['errors'])}")
+    if report.rejected > 20:
+        click.echo(f'  ... ve {report.rejected - 20} satır daha')
+
+@bp.cli.command('db-upgrade')
+def db_upgrade_command():
+    """Şema geçişlerini uygula"""
+    if not upgrade_schema(db.engine, log=click.echo):
+        click.echo(f'Şema güncel (sürüm {current_version(db.engine)}/{SCHEMA_HEAD})')
 
 if __name__ == '__main__':
+    app = create_app()
     with app.app_context():
-        db.init_app(app)
-        db.create_all()
+        upgrade_schema(db.engine)
         
         # Varsayılan admin kullanıcısı oluştur
         admin = User.query.filter_by(username='admin').first()
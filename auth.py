@@ -0,0 +1,311 @@
+"""Giriş işlemleri: şifre doğrulama havuzu, yeniden hashleme, deneme sınırı
+
+Şifre hashleri (PBKDF2/scrypt) CPU yoğundur. Doğrulama ve hashleme
+AUTH_HASH_WORKERS iş parçacıklı bir havuzda yapılır; hashlib bu sırada
+GIL'i bıraktığından hashler paralel çalışır, aynı anda en fazla
+AUTH_HASH_WORKERS + AUTH_HASH_QUEUE iş kabul edilir. Havuz doluysa giriş
+hash hesaplanmadan reddedilir (HasherBusy) ve diğer isteklerin CPU'su
+korunur.
+
+PASSWORD_HASH_METHOD değiştiğinde (ör. pbkdf2:sha256:600000 ->
+scrypt) eski hashli kullanıcıların şifresi başarılı girişte yeni yöntemle
+yeniden hashlenir.
+
+Başarısız denemeler kullanıcı adı ve IP başına kayan pencerede sayılır;
+sınır aşılınca istek hash hesaplanmadan reddedilir. Sayaçlar süreç
+içindedir; çok işçili sunucu (server.py) fork'tan önce share_login_throttles
+ile paylaşımlı bellekteki tablolara geçer, böylece sınır tüm işçiler için
+ortaktır. last_login her girişte
+commit edilmez; bellekte biriktirilip LAST_LOGIN_FLUSH_INTERVAL saniyede
+bir tek toplu UPDATE ile yazılır.
+"""
+import atexit
+import hashlib
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from models import db, User
+
+
+class HasherBusy(Exception):
+    """Şifre havuzu dolu"""
+
+
+class PasswordHasher:
+    def __init__(self, method=None, workers=4, queue=32):
+        self.method = method
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(workers + queue)
+        self._prefix = None
+
+    def _hash(self, password):
+        if self.method:
+            return generate_password_hash(password, method=self.method)
+        return generate_password_hash(password)
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy()
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+    def hash(self, password):
+        return self._submit(self._hash, password)
+
+    def verify(self, password_hash, password):
+        return self._submit(check_password_hash, password_hash, password)
+
+    @property
+    def prefix(self):
+        """Yapılandırılan yöntemin hash öneki, ör. 'pbkdf2:sha256:600000'"""
+        if self._prefix is None:
+            self._prefix = self._hash('').split('$', 1)[0]
+        return self._prefix
+
+    def needs_rehash(self, password_hash):
+        return password_hash.split('$', 1)[0] != self.prefix
+
+
+class LoginThrottle:
+    """Anahtar başına (kullanıcı adı, IP) kayan pencerede başarısız deneme"""
+
+    def __init__(self, max_attempts, window, max_keys=100000):
+        self.max_attempts = max_attempts
+        self.window = window
+        self.max_keys = max_keys
+        self._failures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _recent(self, key, now):
+        attempts = self._failures.get(key)
+        if attempts is None:
+            return None
+        while attempts and attempts[0] <= now - self.window:
+            attempts.popleft()
+        if not attempts:
+            del self._failures[key]
+            return None
+        return attempts
+
+    def retry_after(self, key):
+        """Engelliyse kalan süre (sn), değilse 0"""
+        now = time.monotonic()
+        with self._lock:
+            attempts = self._recent(key, now)
+            if attempts is None or len(attempts) < self.max_attempts:
+                return 0
+            return int(attempts[0] + self.window - now) + 1
+
+    def failure(self, key):
+        now = time.monotonic()
+        with self._lock:
+            attempts = self._recent(key, now)
+            if attempts is None:
+                attempts = self._failures[key] = deque(maxlen=self.max_attempts)
+                if len(self._failures) > self.max_keys:
+                    self._failures.popitem(last=False)
+            else:
+                self._failures.move_to_end(key)
+            attempts.append(now)
+
+    def reset(self, key):
+        with self._lock:
+            self._failures.pop(key, None)
+
+
+class SharedLoginThrottle:
+    """LoginThrottle'ın fork edilen işçiler arasında paylaşılan karşılığı
+
+    Sabit boyutlu bir hash tablosu paylaşımlı bellekte tutulur: her yuva
+    anahtarın 64 bitlik özeti ve son max_attempts denemenin zamanıdır.
+    Anahtar PROBES ardışık yuvada aranır; yer yoksa en uzun süredir
+    denenmeyen anahtarın yuvası kullanılır.
+    """
+
+    PROBES = 8
+
+    def __init__(self, max_attempts, window, slots=8192):
+        self.max_attempts = max_attempts
+        self.window = window
+        self.slots = slots
+        self._keys = multiprocessing.RawArray('Q', slots)
+        self._times = multiprocessing.RawArray('d', slots * max_attempts)
+        self._lock = multiprocessing.Lock()
+
+    @staticmethod
+    def _digest(key):
+        digest = hashlib.blake2b(str(key).encode(), digest_size=8).digest()
+        # 0 boş yuvayı gösterir
+        return int.from_bytes(digest, 'big') or 1
+
+    def _attempts(self, slot):
+        start = slot * self.max_attempts
+        return self._times[start:start + self.max_attempts]
+
+    def _last_attempt(self, slot):
+        return max(self._attempts(slot)) if self._keys[slot] else float('-inf')
+
+    def _find(self, key, create):
+        digest = self._digest(key)
+        candidates = [(digest + i) % self.slots for i in range(self.PROBES)]
+        for slot in candidates:
+            if self._keys[slot] == digest:
+                return slot
+        if not create:
+            return None
+        # Boş yuva, yoksa en uzun süredir denenmeyen anahtarınki
+        slot = min(candidates, key=self._last_attempt)
+        start = slot * self.max_attempts
+        self._keys[slot] = digest
+        self._times[start:start + self.max_attempts] = [0.0] * self.max_attempts
+        return slot
+
+    def retry_after(self, key):
+        """Engelliyse kalan süre (sn), değilse 0"""
+        now = time.monotonic()
+        with self._lock:
+            slot = self._find(key, create=False)
+            if slot is None:
+                return 0
+            recent = [t for t in self._attempts(slot) if t > now - self.window]
+            if len(recent) < self.max_attempts:
+                return 0
+            return int(min(recent) + self.window - now) + 1
+
+    def failure(self, key):
+        now = time.monotonic()
+        with self._lock:
+            slot = self._find(key, create=True)
+            attempts = self._attempts(slot)
+            # En eski denemenin yerine yazılır
+            oldest = min(range(self.max_attempts), key=attempts.__getitem__)
+            self._times[slot * self.max_attempts + oldest] = now
+
+    def reset(self, key):
+        with self._lock:
+            slot = self._find(key, create=False)
+            if slot is not None:
+                self._keys[slot] = 0
+
+
+class LastLoginWriter:
+    """last_login değerlerini biriktirip toplu yaz"""
+
+    def __init__(self, app, interval):
+        self.app = app
+        self.interval = interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def touch(self, user_id, when=None):
+        with self._lock:
+            self._pending[user_id] = when or datetime.now()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True,
+                                                name='last-login-writer')
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        with self.app.app_context():
+            try:
+                db.session.execute(db.update(User), [
+                    {'id': user_id, 'last_login': when}
+                    for user_id, when in pending.items()])
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                self.app.logger.exception('last_login yazılamadı')
+                # Yazılamayanlar bir sonraki turda yeniden denenir
+                with self._lock:
+                    for user_id, when in pending.items():
+                        self._pending.setdefault(user_id, when)
+                return 0
+        return len(pending)
+
+
+hasher = None
+user_throttle = None
+ip_throttle = None
+last_login_writer = None
+
+
+def init_auth(app):
+    """Şifre havuzu, deneme sınırları ve last_login yazıcısını kur"""
+    global hasher, user_throttle, ip_throttle, last_login_writer
+    config = app.config
+    config.setdefault('PASSWORD_HASH_METHOD', None)
+    config.setdefault('AUTH_HASH_WORKERS', 4)
+    config.setdefault('AUTH_HASH_QUEUE', 32)
+    config.setdefault('LOGIN_MAX_ATTEMPTS', 5)
+    config.setdefault('LOGIN_MAX_ATTEMPTS_PER_IP', 50)
+    config.setdefault('LOGIN_THROTTLE_WINDOW', 300)
+    config.setdefault('LAST_LOGIN_FLUSH_INTERVAL', 5)
+
+    hasher = PasswordHasher(config['PASSWORD_HASH_METHOD'],
+                            config['AUTH_HASH_WORKERS'], config['AUTH_HASH_QUEUE'])
+    # Yeni ve değiştirilen şifreler de yapılandırılan yöntemle hashlenir
+    User.password_method = config['PASSWORD_HASH_METHOD']
+    user_throttle = LoginThrottle(config['LOGIN_MAX_ATTEMPTS'],
+                                  config['LOGIN_THROTTLE_WINDOW'])
+    ip_throttle = LoginThrottle(config['LOGIN_MAX_ATTEMPTS_PER_IP'],
+                                config['LOGIN_THROTTLE_WINDOW'])
+    last_login_writer = LastLoginWriter(app, config['LAST_LOGIN_FLUSH_INTERVAL'])
+    atexit.register(last_login_writer.flush)
+
+
+def share_login_throttles(app, slots=8192):
+    """Deneme sınırlarını paylaşımlı belleğe taşı (fork'tan önce çağrılır)"""
+    global user_throttle, ip_throttle
+    config = app.config
+    user_throttle = SharedLoginThrottle(config['LOGIN_MAX_ATTEMPTS'],
+                                        config['LOGIN_THROTTLE_WINDOW'], slots)
+    ip_throttle = SharedLoginThrottle(config['LOGIN_MAX_ATTEMPTS_PER_IP'],
+                                      config['LOGIN_THROTTLE_WINDOW'], slots)
+
+
+def login_retry_after(username, ip):
+    """Kullanıcı adı veya IP engelliyse beklenecek süre (sn), değilse 0"""
+    return max(user_throttle.retry_after(username.lower()),
+               ip_throttle.retry_after(ip))
+
+
+def authenticate(username, password, ip):
+    """Kullanıcıyı doğrula; başarısızsa None (HasherBusy fırlatabilir)"""
+    user = User.query.filter_by(username=username, is_active=True).first()
+    if user is None or not hasher.verify(user.password_hash, password):
+        user_throttle.failure(username.lower())
+        ip_throttle.failure(ip)
+        return None
+
+    user_throttle.reset(username.lower())
+    if hasher.needs_rehash(user.password_hash):
+        try:
+            user.password_hash = hasher.hash(password)
+            db.session.commit()
+        except HasherBusy:
+            # Havuz doluysa yeniden hashleme sonraki girişe kalır
+            pass
+    last_login_writer.touch(user.id)
+    return user
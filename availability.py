@@ -0,0 +1,176 @@
+"""Takım müsaitlik takvimi (gün × personel doluluk matrisi)
+
+Her (takım, yıl, ay) için bir kez kurulan ızgara bellekte tutulur: satırlar
+ayın günleri, sütunlar takımın aktif personelidir ve her hücre bytearray
+içinde tek bayttır (0: çalışıyor, 1: bekleyen izin, 2: onaylı izin). Gün
+başına onaylı/bekleyen sayıları kurulum sırasında array içine yazılır;
+istek yalnızca ilgili ayları okur. Talep durumu değiştiğinde etkilenen
+aylar, personel eklendiğinde/değiştiğinde tüm ızgaralar düşürülür.
+"""
+import threading
+from array import array
+from calendar import monthrange
+from collections import OrderedDict
+from datetime import date, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db, LeaveRequest, Person
+from overlap import overlaps
+from work_calendar import work_calendar
+
+# Hücre değerleri; aynı güne düşen iki talepte büyük olan yazılır
+FREE, PENDING, APPROVED = 0, 1, 2
+STATUS_CODES = {'pending': PENDING, 'approved': APPROVED}
+# Bellekte tutulacak en fazla takım-ay ızgarası
+MAX_MONTHS = 1024
+# Tek istekte sorgulanabilecek en fazla gün
+MAX_DAYS = 366
+
+
+class MonthGrid:
+    """Bir takımın bir aylık doluluk ızgarası"""
+
+    def __init__(self, year, month, persons, intervals):
+        self.first = date(year, month, 1)
+        self.days = monthrange(year, month)[1]
+        self.persons = persons
+        width = len(persons)
+        self.cells = bytearray(self.days * width)
+        column = {person_id: index for index, (person_id, _) in enumerate(persons)}
+        first_ordinal = self.first.toordinal()
+        for person_id, start_date, end_date, status in intervals:
+            code = STATUS_CODES[status]
+            col = column[person_id]
+            start = max(start_date.toordinal() - first_ordinal, 0)
+            end = min(end_date.toordinal() - first_ordinal, self.days - 1)
+            for day in range(start, end + 1):
+                cell = day * width + col
+                if self.cells[cell] < code:
+                    self.cells[cell] = code
+        self.approved = array('H', (self.row(day).count(APPROVED)
+                                    for day in range(self.days)))
+        self.pending = array('H', (self.row(day).count(PENDING)
+                                   for day in range(self.days)))
+
+    def row(self, day):
+        width = len(self.persons)
+        return self.cells[day * width:(day + 1) * width]
+
+
+class AvailabilityCache:
+    """(takım, yıl, ay) -> MonthGrid önbelleği (LRU sınırlı)"""
+
+    def __init__(self, max_months=MAX_MONTHS):
+        self.max_months = max_months
+        self._grids = OrderedDict()
+        self._lock = threading.RLock()
+
+    def invalidate(self, team_id=None, start_date=None, end_date=None):
+        """Takımın verilen aralıktaki aylarını (aralık yoksa tümünü) düşür"""
+        with self._lock:
+            if team_id is None:
+                self._grids.clear()
+                return
+            for key in list(self._grids):
+                if key[0] != team_id:
+                    continue
+                if start_date is None or (
+                        (start_date.year, start_date.month) <= key[1:]
+                        <= (end_date.year, end_date.month)):
+                    del self._grids[key]
+
+    def _build(self, team_id, year, month):
+        first = date(year, month, 1)
+        last = date(year, month, monthrange(year, month)[1])
+        persons = db.session.query(Person.id, Person.name).filter(
+            Person.team_id == team_id, Person.is_active.is_(True)
+        ).order_by(Person.name, Person.id).all()
+        intervals = db.session.query(
+            LeaveRequest.person_id, LeaveRequest.start_date,
+            LeaveRequest.end_date, LeaveRequest.status
+        ).join(Person, LeaveRequest.person_id == Person.id).filter(
+            Person.team_id == team_id,
+            Person.is_active.is_(True),
+            LeaveRequest.status.in_(STATUS_CODES),
+            overlaps(first, last)
+        )
+        return MonthGrid(year, month, [tuple(p) for p in persons], intervals)
+
+    def month(self, team_id, year, month):
+        key = (team_id, year, month)
+        with self._lock:
+            grid = self._grids.get(key)
+            if grid is None:
+                grid = self._grids[key] = self._build(team_id, year, month)
+                if len(self._grids) > self.max_months:
+                    self._grids.popitem(last=False)
+            else:
+                self._grids.move_to_end(key)
+            return grid
+
+    def days(self, team_id, start_date, end_date):
+        """Aralıktaki her gün için (tarih, ızgara, ay içi gün indeksi)"""
+        current = start_date
+        while current <= end_date:
+            grid = self.month(team_id, current.year, current.month)
+            last = min(end_date, date(current.year, current.month, grid.days))
+            for day in range(current.day - 1, last.day):
+                yield grid.first + timedelta(days=day), grid, day
+            current = last + timedelta(days=1)
+
+
+availability_cache = AvailabilityCache()
+
+
+def team_availability(team, start_date, end_date):
+    """Takımın gün bazında izinli personeli ve kalan kapasitesi"""
+    persons = {}
+    days = []
+    for day, grid, index in availability_cache.days(team.id, start_date, end_date):
+        row = grid.row(index)
+        approved = [grid.persons[i][0] for i, code in enumerate(row) if code == APPROVED]
+        pending = [grid.persons[i][0] for i, code in enumerate(row) if code == PENDING]
+        persons.update(grid.persons)
+        occupied = grid.approved[index] + grid.pending[index]
+        remaining = None
+        if team.max_concurrent_leaves:
+            remaining = max(team.max_concurrent_leaves - occupied, 0)
+        days.append({
+            'date': day.isoformat(),
+            'working_day': work_calendar.is_working_day(day),
+            'approved': approved,
+            'pending': pending,
+            'absent_count': grid.approved[index],
+            'pending_count': grid.pending[index],
+            'remaining_capacity': remaining,
+        })
+    return {
+        'team': {'id': team.id, 'name': team.name,
+                 'max_concurrent_leaves': team.max_concurrent_leaves},
+        'persons': [{'id': person_id, 'name': name}
+                    for person_id, name in sorted(persons.items(),
+                                                  key=lambda p: (p[1], p[0]))],
+        'days': days,
+    }
+
+
+# Personel eklenir, takım değiştirir veya pasifleşirse ızgaraların
+# sütunları değişir; personelin eski takımı bilinmediğinden tümü düşürülür.
+# Transaction sonunda bir kez daha düşürülür ki arada eski satırları okuyan
+# eşzamanlı istekler önbelleğe eski ızgarayı bırakmasın
+@event.listens_for(Session, 'after_flush')
+def _membership_flushed(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Person):
+            session.info['persons_changed'] = True
+            availability_cache.invalidate()
+            return
+
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+def _membership_transaction_end(session):
+    if session.info.pop('persons_changed', False):
+        availability_cache.invalidate()
@@ -0,0 +1,86 @@
+"""Yedek personel önerileri
+
+Bir izin talebi için takım arkadaşları tek bir sorguda süzülür ve
+sıralanır: talep aralığında onaylı/bekleyen izni olan veya aynı aralıkta
+başka birine yedeklik yapan kişiler NOT EXISTS alt sorgularıyla elenir,
+kalanlar aynı role sahip olma ve son bir yıldaki yedeklik yüküne göre
+sıralanır. Alt sorgular (person_id, status, tarih) ve BackupAssignment
+indeksleriyle taranır; aday başına sorgu atılmaz.
+"""
+from datetime import timedelta
+
+from sqlalchemy.orm import aliased
+
+from models import db, BackupAssignment, LeaveRequest, Person
+from overlap import ACTIVE_STATUSES
+
+# Yedeklik yükünün sayıldığı geçmiş dönem
+LOAD_WINDOW = timedelta(days=365)
+
+
+def _overlapping(alias, start_date, end_date):
+    return db.and_(alias.status.in_(ACTIVE_STATUSES),
+                   alias.start_date <= end_date,
+                   alias.end_date >= start_date)
+
+
+def suggestion_query(leave_request, team_id, role=None):
+    """(Person, aynı_rol, yedeklik_yükü) satırları döndüren sorgu"""
+    start_date, end_date = leave_request.start_date, leave_request.end_date
+
+    own_leave = aliased(LeaveRequest)
+    on_leave = db.session.query(own_leave.id).filter(
+        own_leave.person_id == Person.id,
+        _overlapping(own_leave, start_date, end_date))
+
+    covered = aliased(LeaveRequest)
+    already_backup = db.session.query(BackupAssignment.id).join(
+        covered, covered.id == BackupAssignment.leave_request_id
+    ).filter(
+        BackupAssignment.backup_person_id == Person.id,
+        db.or_(covered.id == leave_request.id,
+               _overlapping(covered, start_date, end_date)))
+
+    past = aliased(LeaveRequest)
+    load = db.session.query(
+        BackupAssignment.backup_person_id.label('person_id'),
+        db.func.count(BackupAssignment.id).label('backups')
+    ).join(
+        past, past.id == BackupAssignment.leave_request_id
+    ).join(
+        Person, Person.id == BackupAssignment.backup_person_id
+    ).filter(
+        Person.team_id == team_id,
+        past.status.in_(ACTIVE_STATUSES),
+        past.start_date >= start_date - LOAD_WINDOW
+    ).group_by(BackupAssignment.backup_person_id).subquery()
+
+    same_role = (Person.role == role) if role is not None else db.false()
+    backups = db.func.coalesce(load.c.backups, 0)
+    return db.session.query(
+        Person, same_role.label('same_role'), backups.label('backups')
+    ).outerjoin(
+        load, load.c.person_id == Person.id
+    ).filter(
+        Person.team_id == team_id,
+        Person.id != leave_request.person_id,
+        Person.is_active.is_(True),
+        ~on_leave.exists(),
+        ~already_backup.exists()
+    ).order_by(same_role.desc(), backups, Person.name, Person.id)
+
+
+def suggest_backups(leave_request, limit=10):
+    """Talep aralığının tamamında müsait takım arkadaşları, uygunluk sırasıyla"""
+    owner = leave_request.person
+    if owner.team_id is None:
+        return []
+    rows = suggestion_query(leave_request, owner.team_id, owner.role).limit(limit)
+    return [{
+        'id': person.id,
+        'name': person.name,
+        'email': person.email,
+        'role': person.role,
+        'same_role': bool(same_role),
+        'recent_backups': backups,
+    } for person, same_role, backups in rows]
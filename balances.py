@@ -0,0 +1,430 @@
+"""İzin bakiyesi defteri
+
+LeaveBalance satırları talep oluşturma, onay ve red işlemlerinde aynı
+transaction içinde artımlı olarak güncellenir. Bir talebin katkısı
+durumuna göre belirlenir: bekleyen talep `pending`, onaylı talep `used`
+sütununa iş günü olarak yazılır; yıl sınırını aşan talepler yıllara
+bölünür.
+
+Gün sayıları güncel iş günü takvimine göre hesaplanır. Tatil eklenir,
+silinir veya değişirse o günleri kapsayan taleplerin bakiyeleri aynı
+transaction içinde yeniden hesaplanır; böylece sonraki geri alımlar
+eklenen gün sayısıyla aynı olur.
+"""
+from collections import defaultdict
+from datetime import date
+
+from sqlalchemy import event, inspect, tuple_
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.sql import ClauseElement
+
+from models import db, Holiday, LeaveBalance, LeaveRequest, Person
+from overlap import overlaps
+from work_calendar import work_calendar
+
+# Yıllık izin bakiyesinden düşülen izin türü
+ANNUAL_LEAVE_TYPE = 'annual'
+
+# Durum -> bakiyede etkilediği sütun
+STATUS_COLUMNS = {'pending': 'pending', 'approved': 'used'}
+# Talep okunduktan sonra başka bir işlemle güncellendiğinde dönen hata
+STATUS_CONFLICT_MESSAGE = 'Talep bu sırada başka bir işlemle güncellendi'
+
+
+def entitlement_for(person, year):
+    """Personelin verilen yıl için izin hakkı (yıl başındaki kıdeme göre)"""
+    return person.annual_leave_entitlement(as_of=date(year, 1, 1))
+
+
+def get_balance(person_id, year):
+    """(person_id, year) bakiyesini döndür; yoksa None"""
+    return LeaveBalance.query.filter_by(person_id=person_id, year=year).first()
+
+
+def get_or_create_balance(person, year):
+    """Bakiye satırını getir, yoksa oturuma ekle (commit etmez)"""
+    balance = get_balance(person.id, year)
+    if balance is None:
+        balance = LeaveBalance(person_id=person.id, year=year,
+                               entitlement=entitlement_for(person, year),
+                               used=0, pending=0, carryover=0)
+        db.session.add(balance)
+    return balance
+
+
+def balance_or_default(person, year):
+    """Okuma amaçlı bakiye: satır yoksa kaydedilmeyen varsayılan bakiye"""
+    return get_balance(person.id, year) or LeaveBalance(
+        person_id=person.id, year=year,
+        entitlement=entitlement_for(person, year),
+        used=0, pending=0, carryover=0)
+
+
+def days_by_year(leave_request):
+    """Talebin iş günlerini yıllara böl: {yıl: gün}"""
+    return work_calendar.working_days_by_year(leave_request.start_date,
+                                              leave_request.end_date)
+
+
+def apply_status_change(leave_request, old_status, new_status, person=None):
+    """Talebin eski durumundaki katkısını geri al, yenisini ekle
+
+    Yeni talep için old_status=None verilir. Değişiklikler oturuma yazılır,
+    commit çağıranın sorumluluğundadır.
+    """
+    persons = {person.id: person} if person is not None else None
+    apply_status_changes([(leave_request, old_status, new_status)], persons)
+
+
+def transition_status(leave_request, new_status, **values):
+    """Talebi okunduğu durumdan new_status'a koşullu UPDATE ile geçir
+
+    UPDATE ... WHERE id=:id AND status=:eski yalnızca durum arada
+    değişmediyse satırı günceller; eşzamanlı başka bir işlem talebi
+    önce güncellediyse False döner ve bakiyeye dokunulmaz. Commit
+    çağıranın sorumluluğundadır.
+    """
+    old_status = leave_request.status
+    result = db.session.execute(
+        db.update(LeaveRequest).where(
+            LeaveRequest.id == leave_request.id,
+            LeaveRequest.status == old_status
+        ).values(status=new_status, **values)
+    )
+    if result.rowcount != 1:
+        return False
+    apply_status_change(leave_request, old_status, new_status)
+    return True
+
+
+def apply_status_changes(changes, persons=None):
+    """Birden çok (talep, eski_durum, yeni_durum) değişikliğini uygula
+
+    Etkilenen bakiyeler tek sorguyla yüklenir; toplu onay/red için.
+    """
+    deltas = balance_deltas(changes)
+    if not deltas:
+        return
+
+    balances = load_balances(deltas.keys())
+    missing = [key for key in deltas if key not in balances]
+    if missing:
+        persons = dict(persons or {})
+        unknown = {person_id for person_id, _ in missing} - persons.keys()
+        if unknown:
+            persons.update((p.id, p) for p in
+                           Person.query.filter(Person.id.in_(unknown)))
+        for person_id, year in missing:
+            balance = LeaveBalance(person_id=person_id, year=year,
+                                   entitlement=entitlement_for(persons[person_id], year),
+                                   used=0, pending=0, carryover=0)
+            db.session.add(balance)
+            balances[(person_id, year)] = balance
+
+    for key, columns in deltas.items():
+        for column, delta in columns.items():
+            if delta:
+                _add(balances[key], column, delta)
+
+
+def balance_deltas(changes):
+    """Durum değişikliklerinin bakiye etkisi: {(person_id, yıl): {sütun: gün}}"""
+    deltas = defaultdict(lambda: defaultdict(int))
+    for leave_request, old_status, new_status in changes:
+        if leave_request.leave_type != ANNUAL_LEAVE_TYPE:
+            continue
+        old_column = STATUS_COLUMNS.get(old_status)
+        new_column = STATUS_COLUMNS.get(new_status)
+        if old_column == new_column:
+            continue
+        for year, days in days_by_year(leave_request).items():
+            if not days:
+                continue
+            key = (leave_request.person_id, year)
+            if old_column:
+                deltas[key][old_column] -= days
+            if new_column:
+                deltas[key][new_column] += days
+    return deltas
+
+
+def remaining_balances(keys, persons):
+    """[(person_id, yıl)] için kalan gün; satırı olmayan yılda izin hakkı
+
+    persons: {person_id: Person}
+    """
+    keys = list(keys)
+    balances = load_balances(keys) if keys else {}
+    return {key: balances[key].remaining if key in balances
+            else entitlement_for(persons[key[0]], key[1])
+            for key in keys}
+
+
+def insufficient_year(leave_request, old_status, new_status, remaining):
+    """Geçişten sonra kalan bakiyesi eksiye düşen ilk yıl; yoksa None
+
+    Bekleyen talep bakiyeden zaten düşülmüş olduğundan onay kalan günü
+    değiştirmez; hak sonradan azaltıldıysa onay engellenir.
+    remaining: {(person_id, yıl): kalan gün}
+    """
+    deltas = balance_deltas([(leave_request, old_status, new_status)])
+    for (person_id, year), columns in sorted(deltas.items()):
+        if remaining[(person_id, year)] - sum(columns.values()) < 0:
+            return year
+    return None
+
+
+def balance_message(year):
+    """Yetersiz bakiye hata mesajı"""
+    return f'{year} yılı için izin bakiyesi yetersiz'
+
+
+def load_balances(keys):
+    """[(person_id, year)] için mevcut bakiyeler: {(person_id, year): bakiye}"""
+    keys = list(keys)
+    if len(keys) == 1:
+        balance = get_balance(*keys[0])
+        return {keys[0]: balance} if balance else {}
+    result = {}
+    for start in range(0, len(keys), 500):
+        chunk = keys[start:start + 500]
+        query = LeaveBalance.query.filter(
+            tuple_(LeaveBalance.person_id, LeaveBalance.year).in_(chunk))
+        result.update(((b.person_id, b.year), b) for b in query)
+    return result
+
+
+def _add(balance, column, delta):
+    if balance.id is None:
+        setattr(balance, column, getattr(balance, column) + delta)
+        return
+    # Eşzamanlı güncellemelerde kaybolmaması için SQL ifadesi kullanılır;
+    # aynı flush içindeki ardışık değişiklikler birleştirilir
+    current = inspect(balance).dict.get(column)
+    if not isinstance(current, ClauseElement):
+        current = getattr(LeaveBalance, column)
+    setattr(balance, column, current + delta)
+
+
+def compute_usage(year=None, batch_size=5000, person_ids=None):
+    """Onaylı ve bekleyen taleplerden beklenen kullanım
+
+    person_ids verilirse yalnızca o personelin talepleri taranır.
+    Döndürür: {(person_id, year): {'used': gün, 'pending': gün}}
+    """
+    query = db.session.query(
+        LeaveRequest.person_id, LeaveRequest.start_date,
+        LeaveRequest.end_date, LeaveRequest.status
+    ).filter(
+        LeaveRequest.leave_type == ANNUAL_LEAVE_TYPE,
+        LeaveRequest.status.in_(STATUS_COLUMNS.keys())
+    )
+    if year is not None:
+        query = query.filter(overlaps(date(year, 1, 1), date(year, 12, 31)))
+    if person_ids is not None:
+        query = query.filter(LeaveRequest.person_id.in_(person_ids))
+
+    usage = defaultdict(lambda: {'used': 0, 'pending': 0})
+    for person_id, start_date, end_date, status in query.yield_per(batch_size):
+        column = STATUS_COLUMNS[status]
+        for y, days in work_calendar.working_days_by_year(start_date,
+                                                          end_date).items():
+            if year is None or y == year:
+                usage[(person_id, y)][column] += days
+    return usage
+
+
+def rebuild_balances(year=None, batch_size=5000):
+    """Tüm bakiyelerin used/pending değerlerini tek geçişte yeniden hesapla"""
+    usage = compute_usage(year, batch_size)
+
+    query = db.session.query(LeaveBalance.id, LeaveBalance.person_id,
+                             LeaveBalance.year)
+    if year is not None:
+        query = query.filter(LeaveBalance.year == year)
+
+    updates = []
+    for balance_id, person_id, balance_year in query:
+        values = usage.pop((person_id, balance_year), {'used': 0, 'pending': 0})
+        updates.append({'id': balance_id, **values})
+
+    inserts = []
+    if usage:
+        person_ids = sorted({person_id for person_id, _ in usage})
+        persons = {}
+        for start in range(0, len(person_ids), batch_size):
+            chunk = person_ids[start:start + batch_size]
+            persons.update((p.id, p) for p in
+                           Person.query.filter(Person.id.in_(chunk)))
+        for (person_id, balance_year), values in usage.items():
+            inserts.append({
+                'person_id': person_id,
+                'year': balance_year,
+                'entitlement': entitlement_for(persons[person_id], balance_year),
+                'carryover': 0,
+                **values
+            })
+
+    for start in range(0, len(updates), batch_size):
+        db.session.execute(db.update(LeaveBalance),
+                           updates[start:start + batch_size])
+    for start in range(0, len(inserts), batch_size):
+        db.session.execute(db.insert(LeaveBalance),
+                           inserts[start:start + batch_size])
+    db.session.commit()
+    return {'updated': len(updates), 'created': len(inserts)}
+
+
+def resync_balances(dates):
+    """Verilen tatil günlerini kapsayan taleplerin bakiyelerini yeniden yaz
+
+    Her gün için o günle kesişen yıllık izin talebi olan personelin o
+    yılki used/pending değerleri güncel takvimle taleplerden hesaplanır.
+    Commit etmez.
+    """
+    by_year = defaultdict(set)
+    for day in dates:
+        by_year[day.year].add(day)
+
+    for year, days in sorted(by_year.items()):
+        person_ids = [person_id for (person_id,) in db.session.query(
+            LeaveRequest.person_id
+        ).filter(
+            LeaveRequest.leave_type == ANNUAL_LEAVE_TYPE,
+            LeaveRequest.status.in_(STATUS_COLUMNS.keys()),
+            db.or_(*(overlaps(day, day) for day in sorted(days)))
+        ).distinct()]
+        for start in range(0, len(person_ids), 500):
+            chunk = person_ids[start:start + 500]
+            usage = compute_usage(year, person_ids=chunk)
+            keys = [(person_id, year) for person_id in chunk]
+            balances = load_balances(keys)
+            persons = {}
+            missing = [person_id for person_id, _ in keys
+                       if (person_id, year) not in balances]
+            if missing:
+                persons.update((p.id, p) for p in
+                               Person.query.filter(Person.id.in_(missing)))
+            for key in keys:
+                values = usage.get(key, {'used': 0, 'pending': 0})
+                balance = balances.get(key)
+                if balance is None:
+                    balance = LeaveBalance(person_id=key[0], year=year,
+                                           entitlement=entitlement_for(persons[key[0]], year),
+                                           carryover=0)
+                    db.session.add(balance)
+                balance.used = values['used']
+                balance.pending = values['pending']
+
+
+def _carryover(person, year, previous, max_carryover, usage):
+    """Önceki yıldan devreden gün (kalan bakiye, tavanla sınırlı)
+
+    Önceki yıl satırı olmayan personelin kalanı o yılın hakkından onaylı
+    ve bekleyen talepleri (usage: compute_usage(year - 1)) düşülerek
+    bulunur; o yıl işe başlamamış personele devir yapılmaz.
+    """
+    if previous is None:
+        if person.hire_date is None or person.hire_date >= date(year - 1, 1, 1):
+            return 0
+        used = usage().get((person.id, year - 1), {'used': 0, 'pending': 0})
+        remaining = entitlement_for(person, year - 1) - used['used'] - used['pending']
+    else:
+        entitlement, carryover, used, pending = previous
+        remaining = (entitlement or 0) + (carryover or 0) - (used or 0) - (pending or 0)
+    remaining = max(remaining, 0)
+    return remaining if max_carryover is None else min(remaining, max_carryover)
+
+
+def rollover_balances(year, max_carryover=None, batch_size=5000, log=None):
+    """Aktif personel için year bakiyelerini oluştur (yıl sonu devri)
+
+    Personel id sırasıyla batch_size'lık parçalar halinde işlenir; her
+    parça önceki yıl bakiyesiyle tek sorguda okunur, eksik satırlar toplu
+    INSERT ile eklenir ve parça commit edilir. Talepler nedeniyle önceden
+    oluşmuş ve devri henüz yazılmamış (carryover=0) satırların yalnızca
+    devri güncellenir. Tekrar çalıştırmak güvenlidir; yarıda kalan iş
+    kaldığı yerden devam eder.
+    """
+    # Önceki yıl satırı olmayan personel için talepler gerektiğinde bir
+    # kez taranır
+    previous_usage = None
+
+    def usage():
+        nonlocal previous_usage
+        if previous_usage is None:
+            previous_usage = compute_usage(year - 1, batch_size)
+        return previous_usage
+
+    previous = aliased(LeaveBalance)
+    current = aliased(LeaveBalance)
+    totals = {'persons': 0, 'created': 0, 'updated': 0}
+    last_id = 0
+    while True:
+        rows = db.session.query(
+            Person, previous.entitlement, previous.carryover, previous.used,
+            previous.pending, previous.id, current.id, current.carryover
+        ).outerjoin(
+            previous, (previous.person_id == Person.id) & (previous.year == year - 1)
+        ).outerjoin(
+            current, (current.person_id == Person.id) & (current.year == year)
+        ).filter(
+            Person.is_active.is_(True), Person.id > last_id
+        ).order_by(Person.id).limit(batch_size).all()
+        if not rows:
+            break
+
+        last_id = rows[-1][0].id
+        inserts, updates = [], []
+        for (person, *prev_values, prev_id, current_id, current_carryover) in rows:
+            carryover = _carryover(person, year,
+                                   prev_values if prev_id is not None else None,
+                                   max_carryover, usage)
+            if current_id is None:
+                inserts.append({
+                    'person_id': person.id, 'year': year,
+                    'entitlement': entitlement_for(person, year),
+                    'carryover': carryover, 'used': 0, 'pending': 0,
+                })
+            elif not current_carryover and carryover:
+                updates.append({'id': current_id, 'carryover': carryover})
+        if inserts:
+            db.session.execute(db.insert(LeaveBalance), inserts)
+        if updates:
+            db.session.execute(db.update(LeaveBalance), updates)
+        db.session.commit()
+        db.session.expunge_all()
+
+        totals['persons'] += len(rows)
+        totals['created'] += len(inserts)
+        totals['updated'] += len(updates)
+        if log:
+            log(totals)
+    return totals
+
+
+# Tatil günleri değişince bu günleri kapsayan bakiyeler commit öncesi
+# yeniden hesaplanır; flush sırasında değişen günler toplanır
+@event.listens_for(Session, 'after_flush')
+def _holidays_flushed(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Holiday):
+            history = inspect(obj).attrs.date.history
+            days = session.info.setdefault('holiday_dates', set())
+            days.update(d for d in (*history.added, *history.unchanged,
+                                    *history.deleted) if d is not None)
+
+
+@event.listens_for(Session, 'before_commit')
+def _holidays_committing(session):
+    # Commit'in kendi flush'ı bu olaydan sonra çalıştığından bekleyen
+    # tatil değişiklikleri önce yazılır
+    session.flush()
+    days = session.info.pop('holiday_dates', None)
+    if days:
+        resync_balances(days)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _holidays_rolled_back(session):
+    session.info.pop('holiday_dates', None)
@@ -0,0 +1,141 @@
+"""Yedek personel önerisi benchmark'ı
+
+Her biri T kişilik takımlar ve kişi başına ~R izin talebi, onaylı
+taleplerin bir kısmı için BackupAssignment satırları üretilir. Aday
+başına sorgu atan döngü ile `backups.suggestion_query` tek sorgusu
+karşılaştırılır.
+
+Kullanım:
+    python -m benchmarks.bench_backups --team-sizes 500,1000,2000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_overlap import STATUSES, build_app
+from models import db, BackupAssignment, LeaveRequest, Person, Team
+from backups import LOAD_WINDOW, suggest_backups
+from overlap import ACTIVE_STATUSES, has_conflict
+
+ROLES = ['gelistirici', 'analist', 'destek', 'test']
+
+
+def populate(team_sizes, requests_per_person, backup_ratio, samples=20, seed=42):
+    """Takımları doldur; takım başına örnek talep id'leri döndür"""
+    rnd = random.Random(seed)
+    now = datetime.now()
+    base = date(2020, 1, 1)
+    sampled = {}
+    person_id = request_id = 0
+    for size in team_sizes:
+        team = Team(name=f'Takım {size}', max_concurrent_leaves=size)
+        db.session.add(team)
+        db.session.flush()
+        first = person_id + 1
+        db.session.execute(db.insert(Person), [{
+            'name': f'Personel {first + i}', 'email': f'p{first + i}@bench.local',
+            'role': rnd.choice(ROLES), 'team_id': team.id,
+            'hire_date': date(2015, 1, 1), 'is_active': True, 'created_at': now,
+        } for i in range(size)])
+        person_id += size
+        members = range(first, person_id + 1)
+
+        requests, backups = [], []
+        for member in members:
+            for _ in range(requests_per_person):
+                start = base + timedelta(days=rnd.randrange(365 * 5))
+                status = rnd.choice(STATUSES)
+                request_id += 1
+                requests.append({
+                    'person_id': member, 'leave_type': 'annual',
+                    'start_date': start,
+                    'end_date': start + timedelta(days=rnd.randrange(10)),
+                    'status': status, 'created_at': now,
+                })
+                if status == 'approved' and rnd.random() < backup_ratio:
+                    backups.append({'leave_request_id': request_id,
+                                    'backup_person_id': rnd.choice(members),
+                                    'created_at': now})
+        db.session.execute(db.insert(LeaveRequest), requests)
+        db.session.execute(db.insert(BackupAssignment), backups)
+        sampled[size] = [rnd.randint(request_id - len(requests) + 1, request_id)
+                         for _ in range(samples)]
+    db.session.commit()
+    return sampled
+
+
+def per_candidate(leave_request, limit=10):
+    """Karşılaştırma: her takım arkadaşı için ayrı sorgular"""
+    owner = leave_request.person
+    start, end = leave_request.start_date, leave_request.end_date
+    rows = []
+    for person in Person.query.filter_by(team_id=owner.team_id, is_active=True):
+        if person.id == owner.id or has_conflict(person.id, start, end):
+            continue
+        busy = db.session.query(BackupAssignment.query.join(LeaveRequest).filter(
+            BackupAssignment.backup_person_id == person.id,
+            db.or_(LeaveRequest.id == leave_request.id,
+                   db.and_(LeaveRequest.status.in_(ACTIVE_STATUSES),
+                           LeaveRequest.start_date <= end,
+                           LeaveRequest.end_date >= start))
+        ).exists()).scalar()
+        if busy:
+            continue
+        load = BackupAssignment.query.join(LeaveRequest).filter(
+            BackupAssignment.backup_person_id == person.id,
+            LeaveRequest.status.in_(ACTIVE_STATUSES),
+            LeaveRequest.start_date >= start - LOAD_WINDOW).count()
+        rows.append((person.role != owner.role, load, person.name, person.id))
+    return sorted(rows)[:limit]
+
+
+def timed(fn, request_ids):
+    timings = []
+    for request_id in request_ids:
+        leave_request = db.session.get(LeaveRequest, request_id)
+        t0 = time.perf_counter()
+        fn(leave_request)
+        timings.append((time.perf_counter() - t0) * 1000)
+        db.session.expunge_all()
+    timings.sort()
+    return timings[len(timings) // 2], timings[int(len(timings) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--team-sizes', default='500,1000,2000')
+    parser.add_argument('--requests', type=int, default=20,
+                        help='Kişi başına izin talebi')
+    parser.add_argument('--backup-ratio', type=float, default=0.5,
+                        help='Yedek atanan onaylı talep oranı')
+    parser.add_argument('--samples', type=int, default=20,
+                        help='Takım başına ölçülen talep sayısı')
+    args = parser.parse_args()
+    team_sizes = [int(size) for size in args.team_sizes.split(',')]
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench_backups.db')
+    app = build_app(path)
+    with app.app_context():
+        db.create_all()
+        t0 = time.perf_counter()
+        samples = populate(team_sizes, args.requests, args.backup_ratio,
+                           args.samples)
+        print(f'Veri yüklendi ({time.perf_counter() - t0:.1f} sn)')
+
+        print(f'{"takım":>6} {"aday döngüsü p50":>17} {"p95":>9} '
+              f'{"tek sorgu p50":>14} {"p95":>9}')
+        for size in team_sizes:
+            loop = timed(per_candidate, samples[size])
+            single = timed(suggest_backups, samples[size])
+            print(f'{size:>6} {loop[0]:>15.2f}ms {loop[1]:>7.2f}ms '
+                  f'{single[0]:>12.2f}ms {single[1]:>7.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""Eşzamanlı yazma yük testi
+
+Uygulamanın kendisi (app.py) test istemcileriyle, her biri ayrı iş
+parçacığında çalışan W yazar ve R okuyucuyla sürülür. Her yazma işlemi
+iki transaction'dır: izin talebi oluştur, ardından onayla. Yazarlar
+farklı personel üzerinde çalıştığından çakışma/kapasite reddi oluşmaz;
+ölçülen yalnızca veritabanı kilit çekişmesidir. Okuyucular yazarlar
+bitene kadar müsaitlik kontrolü (/api/leave/check) çağırır.
+
+SQLite için eski ayarlar (DELETE günlüğü, synchronous=FULL) ile yeni
+varsayılanlar (WAL, synchronous=NORMAL) ayrı süreçlerde karşılaştırılır.
+--uri ile PostgreSQL gibi başka bir veritabanı da ölçülebilir.
+
+Kullanım:
+    python -m benchmarks.bench_concurrency --workers 1,4,8,16 --ops 50 --readers 4
+    python -m benchmarks.bench_concurrency --uri postgresql://localhost/izin_bench
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MODES = {
+    'legacy': {'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_SYNCHRONOUS': 'FULL'},
+    'wal': {'SQLITE_JOURNAL_MODE': 'WAL', 'SQLITE_SYNCHRONOUS': 'NORMAL'},
+}
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def child(workers, ops, readers):
+    """Ortam değişkenleriyle yapılandırılmış uygulamayı yük altında çalıştır"""
+    from app import create_app
+    from models import db, Person, User
+
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add_all([
+            Person(name=f'Personel {i}', email=f'p{i}@bench.local', role='bench',
+                   hire_date=date(2015, 1, 1))
+            for i in range(workers)])
+        admin = User(username='bench', email='bench@bench.local', role='admin')
+        admin.set_password('bench')
+        db.session.add(admin)
+        db.session.commit()
+        person_ids = [p.id for p in Person.query.order_by(Person.id)]
+
+    latencies = []
+    errors = []
+    reads = []
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(workers + readers + 1)
+    writers_done = threading.Event()
+
+    def work(person_id):
+        client = app.test_client()
+        client.post('/login', data={'username': 'bench', 'password': 'bench'})
+        start_barrier.wait()
+        day = date(2030, 1, 7)
+        for _ in range(ops):
+            t0 = time.perf_counter()
+            r = client.post('/api/leave/request', json={
+                'person_id': person_id, 'start_date': day.isoformat(),
+                'end_date': (day + timedelta(days=1)).isoformat()})
+            if r.status_code == 201:
+                request_id = r.get_json()['id']
+                r = client.put(f'/api/admin/leave/approve/{request_id}')
+            elapsed = time.perf_counter() - t0
+            with lock:
+                if r.status_code in (200, 201):
+                    latencies.append(elapsed)
+                else:
+                    errors.append(r.get_json().get('error', r.status_code))
+            day += timedelta(days=7)
+
+    def read():
+        client = app.test_client()
+        client.post('/login', data={'username': 'bench', 'password': 'bench'})
+        start_barrier.wait()
+        while not writers_done.is_set():
+            r = client.post('/api/leave/check', json={
+                'person_id': person_ids[0], 'start_date': '2030-01-01',
+                'end_date': '2030-01-31'})
+            with lock:
+                if r.status_code == 200:
+                    reads.append(1)
+                else:
+                    errors.append(r.get_json().get('error', r.status_code))
+
+    writers = [threading.Thread(target=work, args=(pid,)) for pid in person_ids]
+    readers_ = [threading.Thread(target=read) for _ in range(readers)]
+    for thread in writers + readers_:
+        thread.start()
+    start_barrier.wait()
+    t0 = time.perf_counter()
+    for thread in writers:
+        thread.join()
+    wall = time.perf_counter() - t0
+    writers_done.set()
+    for thread in readers_:
+        thread.join()
+
+    print(json.dumps({
+        'ok': len(latencies), 'errors': len(errors),
+        'first_error': str(errors[0]).splitlines()[0] if errors else None,
+        'throughput': len(latencies) / wall,
+        'reads': len(reads) / wall,
+        'p50': percentile(latencies, 50) * 1000,
+        'p95': percentile(latencies, 95) * 1000,
+        'p99': percentile(latencies, 99) * 1000,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', default='1,4,8,16',
+                        help='Eşzamanlı yazar sayıları')
+    parser.add_argument('--ops', type=int, default=50,
+                        help='İşçi başına talep+onay işlemi')
+    parser.add_argument('--readers', type=int, default=4,
+                        help='Yazarlarla eşzamanlı okuyucu sayısı')
+    parser.add_argument('--modes', default='legacy,wal')
+    parser.add_argument('--uri', help='SQLite yerine kullanılacak DATABASE_URL')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(int(args.workers), args.ops, args.readers)
+        return
+
+    modes = ['uri'] if args.uri else args.modes.split(',')
+    print(f'{"mod":>7} {"yazar":>5} {"yazma/sn":>9} {"p50":>8} {"p95":>8} '
+          f'{"p99":>8} {"okuma/sn":>9} {"hata":>5}')
+    for mode in modes:
+        for workers in (int(w) for w in args.workers.split(',')):
+            env = dict(os.environ)
+            if args.uri:
+                env['DATABASE_URL'] = args.uri
+            else:
+                path = os.path.join(tempfile.mkdtemp(), 'bench_concurrency.db')
+                env['DATABASE_URL'] = f'sqlite:///{path}'
+                env.update(MODES[mode])
+            out = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.bench_concurrency', '--child',
+                 '--workers', str(workers), '--ops', str(args.ops),
+                 '--readers', str(args.readers)],
+                capture_output=True, text=True, check=True, cwd=ROOT, env=env)
+            result = json.loads(out.stdout.strip().splitlines()[-1])
+            print(f'{mode:>7} {workers:>5} {result["throughput"]:>9.1f} '
+                  f'{result["p50"]:>6.1f}ms {result["p95"]:>6.1f}ms '
+                  f'{result["p99"]:>6.1f}ms {result["reads"]:>9.1f} '
+                  f'{result["errors"]:>5}')
+            if result['first_error']:
+                print(f'        ilk hata: {result["first_error"]}')
+
+
+if __name__ == '__main__':
+    main()
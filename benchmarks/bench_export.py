@@ -0,0 +1,133 @@
+"""Akışlı CSV dışa aktarımı bellek benchmark'ı
+
+Veritabanı kademeli olarak büyütülür (varsayılan 10k / 100k / 1M satır)
+ve her boyutta dışa aktarım ayrı bir süreçte çalıştırılarak tepe RSS
+ölçülür. Karşılaştırma için tüm satırları listeye alan eski yöntem de
+(`--modes stream,list`) ölçülür.
+
+Kullanım:
+    python -m benchmarks.bench_export --sizes 10000,100000,1000000
+"""
+import argparse
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_overlap import STATUSES, build_app
+from models import db, Person, Team, LeaveRequest
+from export import LEAVE_REQUEST_HEADER, leave_request_rows, stream_csv
+
+PERSONS = 5000
+
+
+def grow(target, seed=42, batch=50000):
+    """Talep sayısını target'a tamamla"""
+    if not Person.query.first():
+        db.session.add(Team(name='Bench', max_concurrent_leaves=5))
+        db.session.flush()
+        now = datetime.now()
+        db.session.execute(db.insert(Person), [{
+            'name': f'Personel {i}', 'email': f'p{i}@bench.local',
+            'role': 'bench', 'team_id': 1, 'hire_date': date(2015, 1, 1),
+            'is_active': True, 'created_at': now,
+        } for i in range(1, PERSONS + 1)])
+
+    current = LeaveRequest.query.count()
+    rnd = random.Random(seed + current)
+    now = datetime.now()
+    while current < target:
+        size = min(batch, target - current)
+        rows = []
+        for _ in range(size):
+            start = date(2020, 1, 1) + timedelta(days=rnd.randrange(365 * 5))
+            rows.append({
+                'person_id': rnd.randint(1, PERSONS), 'leave_type': 'annual',
+                'start_date': start,
+                'end_date': start + timedelta(days=rnd.randrange(10)),
+                'status': rnd.choice(STATUSES), 'created_at': now,
+                'reason': 'benchmark',
+            })
+        db.session.execute(db.insert(LeaveRequest), rows)
+        current += size
+    db.session.commit()
+
+
+def peak_rss_kb():
+    """Sürecin tepe RSS değeri (KB)
+
+    Linux'ta ru_maxrss exec öncesindeki (ebeveyn) süreçten kalan değeri
+    taşıyabildiği için öncelikle /proc/self/status içindeki VmHWM okunur.
+    """
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def child(path, mode):
+    """Dışa aktarımı çalıştır ve tepe RSS'i (KB) yazdır"""
+    app = build_app(path)
+    with app.app_context():
+        t0 = time.perf_counter()
+        written = 0
+        with open(os.devnull, 'w') as sink:
+            if mode == 'stream':
+                for part in stream_csv(LEAVE_REQUEST_HEADER, leave_request_rows()):
+                    sink.write(part)
+                    written += len(part)
+            else:
+                # Eski /api/leave-requests yaklaşımı: her şey bellekte
+                rows = [{'id': r.id, 'person_name': r.person.name,
+                         'start_date': r.start_date.isoformat(),
+                         'end_date': r.end_date.isoformat(),
+                         'status': r.status}
+                        for r in LeaveRequest.query.all()]
+                written = sink.write(repr(rows))
+        elapsed = time.perf_counter() - t0
+    print(f'{peak_rss_kb()} {elapsed:.2f} {written}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--modes', default='stream,list')
+    parser.add_argument('--db', help='Veritabanı dosyası (varsayılan: geçici)')
+    parser.add_argument('--child', choices=['stream', 'list'],
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), 'bench_export.db')
+    if args.child:
+        child(path, args.child)
+        return
+
+    app = build_app(path)
+    print(f'{"satır":>9} {"mod":>7} {"tepe RSS":>10} {"süre":>8}')
+    for size in (int(s) for s in args.sizes.split(',')):
+        with app.app_context():
+            db.create_all()
+            grow(size)
+        for mode in args.modes.split(','):
+            out = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.bench_export',
+                 '--db', path, '--child', mode],
+                capture_output=True, text=True, check=True,
+                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+            peak_kb, elapsed, _ = out.stdout.split()
+            print(f'{size:>9} {mode:>7} {int(peak_kb) / 1024:>8.1f}MB '
+                  f'{float(elapsed):>7.2f}s')
+
+
+if __name__ == '__main__':
+    main()
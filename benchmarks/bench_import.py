@@ -0,0 +1,79 @@
+"""Toplu içe aktarım benchmark'ı
+
+Sentetik personel ve izin CSV dosyaları üretip importer ile boş bir
+SQLite veritabanına aktarır; her adımın süresini ve satır/sn değerini
+yazdırır. İkinci personel aktarımı upsert (güncelleme) yolunu ölçer.
+
+Kullanım:
+    python -m benchmarks.bench_import --rows 100000
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_overlap import build_app
+from models import db
+from importer import import_stream
+
+
+def write_persons(path, rows, teams=50):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['name', 'email', 'role', 'team', 'hire_date'])
+        for i in range(rows):
+            writer.writerow([f'Personel {i}', f'p{i}@bench.local', 'Uzman',
+                             f'Takım {i % teams}',
+                             (date(2010, 1, 1) + timedelta(days=i % 5000)).isoformat()])
+
+
+def write_leaves(path, rows, persons, seed=42):
+    rnd = random.Random(seed)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['email', 'start_date', 'end_date', 'status'])
+        for _ in range(rows):
+            start = date(2022, 1, 1) + timedelta(days=rnd.randrange(365 * 3))
+            writer.writerow([f'p{rnd.randrange(persons)}@bench.local',
+                             start.isoformat(),
+                             (start + timedelta(days=rnd.randrange(7))).isoformat(),
+                             rnd.choice(['approved', 'pending'])])
+
+
+def timed_import(kind, path):
+    t0 = time.perf_counter()
+    with open(path, encoding='utf-8-sig', newline='') as stream:
+        report = import_stream(kind, stream)
+    elapsed = time.perf_counter() - t0
+    print(f'{kind:<15} {report.imported:>8} satır  {elapsed:>6.2f} sn  '
+          f'{report.imported / elapsed:>9.0f} satır/sn  '
+          f'(reddedilen: {report.rejected})')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    persons_csv = os.path.join(workdir, 'persons.csv')
+    leaves_csv = os.path.join(workdir, 'leaves.csv')
+    write_persons(persons_csv, args.rows)
+    write_leaves(leaves_csv, args.rows, args.rows)
+
+    app = build_app(os.path.join(workdir, 'bench_import.db'))
+    with app.app_context():
+        db.create_all()
+        timed_import('persons', persons_csv)
+        timed_import('persons', persons_csv)
+        timed_import('leave_requests', leaves_csv)
+
+
+if __name__ == '__main__':
+    main()
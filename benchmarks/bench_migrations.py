@@ -0,0 +1,135 @@
+"""Şema geçişleri öncesi/sonrası sıcak sorgu benchmark'ı
+
+Sentetik veritabanı kurulur ve geçişlerin eklediği indeks/sütunlar
+kaldırılarak eski şemaya (sürüm tablosu yok) indirilir. Sıcak sorgular
+ölçülür, `migrations.upgrade` çalıştırılır ve aynı sorgular yeniden
+ölçülür.
+
+Kullanım:
+    python -m benchmarks.bench_migrations --persons 10000 --rows 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from benchmarks.bench_overlap import build_app, measure, populate
+from models import db, LeaveBalance, LeaveRequest, Notification
+from balances import get_balance
+from migrations import MIGRATIONS, upgrade
+from overlap import has_conflict
+
+# Geçişlerle eklenen indeksler ve sütunlar
+MIGRATED_INDEXES = [
+    'ix_leave_request_person_status_dates', 'ix_leave_request_created',
+    'ix_leave_request_status_created', 'ix_leave_request_dates',
+    'ix_holiday_country_date', 'uq_leave_balance_person_year',
+    'ix_notification_person_read', 'ix_person_team_active',
+    'ix_backup_assignment_person_request', 'ix_backup_assignment_request',
+]
+MIGRATED_COLUMNS = [('team', 'manager'), ('leave_request', 'approved_by'),
+                    ('leave_request', 'approved_at')]
+YEARS = range(2020, 2025)
+
+
+def populate_extra(persons, notifications, seed=42, batch=50000):
+    rnd = random.Random(seed)
+    db.session.execute(db.insert(LeaveBalance), [{
+        'person_id': person_id, 'year': year, 'entitlement': 20,
+        'used': 0, 'pending': 0, 'carryover': 0,
+    } for person_id in range(1, persons + 1) for year in YEARS])
+    now = datetime.now()
+    buffer = []
+    for _ in range(notifications):
+        buffer.append({'person_id': rnd.randint(1, persons), 'message': 'bench',
+                       'is_read': rnd.random() < 0.9, 'created_at': now})
+        if len(buffer) >= batch:
+            db.session.execute(db.insert(Notification), buffer)
+            buffer = []
+    if buffer:
+        db.session.execute(db.insert(Notification), buffer)
+    db.session.commit()
+
+
+def downgrade_to_legacy():
+    with db.engine.begin() as conn:
+        for name in MIGRATED_INDEXES:
+            conn.execute(text(f'DROP INDEX IF EXISTS {name}'))
+        for table, column in MIGRATED_COLUMNS:
+            conn.execute(text(f'ALTER TABLE {table} DROP COLUMN {column}'))
+        conn.execute(text('DROP TABLE IF EXISTS schema_version'))
+
+
+def hot_queries():
+    """(etiket, fn(person_id, start, end)) listesi"""
+    return [
+        ('bakiye (person_id, year)',
+         lambda p, s, e: get_balance(p, s.year)),
+        ('okunmamış bildirim sayısı',
+         lambda p, s, e: Notification.query.filter_by(
+             person_id=p, is_read=False).count()),
+        ('çakışma kontrolü',
+         lambda p, s, e: has_conflict(p, s, e)),
+        ('yaklaşan izinler',
+         lambda p, s, e: db.session.query(LeaveRequest.id).filter(
+             LeaveRequest.start_date >= s
+         ).order_by(LeaveRequest.start_date).limit(10).all()),
+    ]
+
+
+def run(probes):
+    results = {}
+    for label, fn in hot_queries():
+        results[label] = measure(fn, probes)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--persons', type=int, default=10000)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--notifications', type=int, default=500000)
+    parser.add_argument('--probes', type=int, default=300)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench_migrations.db')
+    app = build_app(path)
+    with app.app_context():
+        db.create_all()
+        t0 = time.perf_counter()
+        populate(args.persons, args.rows)
+        populate_extra(args.persons, args.notifications)
+        print(f'Veri yüklendi ({time.perf_counter() - t0:.1f} sn)')
+        downgrade_to_legacy()
+        rnd = random.Random(7)
+        probes = []
+        for _ in range(args.probes):
+            start = date(2020, 1, 1) + timedelta(days=rnd.randrange(365 * 5))
+            probes.append((rnd.randint(1, args.persons), start,
+                           start + timedelta(days=rnd.randrange(1, 15))))
+
+        before = run(probes)
+        db.session.commit()
+        t0 = time.perf_counter()
+        upgrade(db.engine, log=lambda line: None)
+        print(f'Geçişler ({len(MIGRATIONS)}) uygulandı '
+              f'({time.perf_counter() - t0:.1f} sn)')
+        after = run(probes)
+
+    print(f'{"sorgu":<28} {"önce p50":>10} {"sonra p50":>10} '
+          f'{"önce p95":>10} {"sonra p95":>10}')
+    for label in before:
+        b, a = before[label], after[label]
+        print(f'{label:<28} {b["p50"]:>8.3f}ms {a["p50"]:>8.3f}ms '
+              f'{b["p95"]:>8.3f}ms {a["p95"]:>8.3f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""Çakışma sorgusu benchmark'ı
+
+Sentetik bir SQLite veritabanına N personel / M izin talebi yükler ve
+eski üç dallı OR sorgusunu, tek koşullu `overlap.overlaps` sorgusuyla
+(bileşik indeksli) karşılaştırır.
+
+Kullanım:
+    python -m benchmarks.bench_overlap --persons 10000 --rows 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import db, Person, LeaveRequest
+from overlap import find_conflicts
+
+STATUSES = ['approved', 'pending', 'rejected']
+
+
+def build_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def populate(persons, rows, seed=42, batch=50000):
+    rnd = random.Random(seed)
+    now = datetime.now()
+    db.session.execute(db.insert(Person), [{
+        'name': f'Personel {i}',
+        'email': f'p{i}@bench.local',
+        'role': 'bench',
+        'hire_date': date(2015, 1, 1),
+        'is_active': True,
+        'created_at': now,
+    } for i in range(1, persons + 1)])
+
+    base = date(2020, 1, 1)
+    buffer = []
+    for _ in range(rows):
+        start = base + timedelta(days=rnd.randrange(365 * 5))
+        buffer.append({
+            'person_id': rnd.randint(1, persons),
+            'leave_type': 'annual',
+            'start_date': start,
+            'end_date': start + timedelta(days=rnd.randrange(10)),
+            'status': rnd.choice(STATUSES),
+            'created_at': now,
+        })
+        if len(buffer) >= batch:
+            db.session.execute(db.insert(LeaveRequest), buffer)
+            buffer = []
+    if buffer:
+        db.session.execute(db.insert(LeaveRequest), buffer)
+    db.session.commit()
+
+
+def legacy_conflicts(person_id, start_date, end_date):
+    """Eski check_leave sorgusu (karşılaştırma için)"""
+    return LeaveRequest.query.filter(
+        LeaveRequest.person_id == person_id,
+        LeaveRequest.status.in_(['approved', 'pending']),
+        db.or_(
+            (LeaveRequest.start_date <= start_date) & (LeaveRequest.end_date >= start_date),
+            (LeaveRequest.start_date <= end_date) & (LeaveRequest.end_date >= end_date),
+            (LeaveRequest.start_date >= start_date) & (LeaveRequest.end_date <= end_date)
+        )
+    ).all()
+
+
+def measure(fn, probes):
+    timings = []
+    for person_id, start, end in probes:
+        t0 = time.perf_counter()
+        fn(person_id, start, end)
+        timings.append((time.perf_counter() - t0) * 1000)
+        db.session.expunge_all()
+    timings.sort()
+    return {
+        'p50': statistics.median(timings),
+        'p95': timings[int(len(timings) * 0.95) - 1],
+        'max': timings[-1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--persons', type=int, default=10000)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--probes', type=int, default=500)
+    parser.add_argument('--db', help='Veritabanı dosyası (varsayılan: geçici)')
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), 'bench_overlap.db')
+    app = build_app(path)
+    with app.app_context():
+        db.create_all()
+        if not LeaveRequest.query.first():
+            t0 = time.perf_counter()
+            populate(args.persons, args.rows)
+            print(f'Veri yüklendi: {args.persons} personel, {args.rows} talep '
+                  f'({time.perf_counter() - t0:.1f} sn)')
+
+        rnd = random.Random(7)
+        probes = []
+        for _ in range(args.probes):
+            start = date(2020, 1, 1) + timedelta(days=rnd.randrange(365 * 5))
+            probes.append((rnd.randint(1, args.persons), start,
+                           start + timedelta(days=rnd.randrange(1, 15))))
+
+        for label, fn in (('eski OR sorgusu', legacy_conflicts),
+                          ('overlap.find_conflicts', find_conflicts)):
+            stats = measure(fn, probes)
+            print(f'{label:<24} p50={stats["p50"]:.3f} ms  '
+                  f'p95={stats["p95"]:.3f} ms  max={stats["max"]:.3f} ms')
+
+        # Aynı sorgu indeks olmadan (tam tablo taraması)
+        index = next(i for i in LeaveRequest.__table__.indexes
+                     if i.name == 'ix_leave_request_person_status_dates')
+        db.session.commit()
+        index.drop(db.engine)
+        stats = measure(find_conflicts, probes)
+        print(f'{"indekssiz":<24} p50={stats["p50"]:.3f} ms  '
+              f'p95={stats["p95"]:.3f} ms  max={stats["max"]:.3f} ms')
+        db.session.commit()
+        index.create(db.engine)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Listeleme sayfalarının SQL sorgu sayısı kontrolü
+
+Geçici bir SQLite veritabanına N takım/personel/kullanıcı/talep/bakiye
+yüklenir, listeleme sayfaları test istemcisiyle çağrılıp sorgular
+sayılır; ardından aynı miktar satır daha eklenip (2N) ölçüm tekrarlanır.
+Her sayfanın sorgu sayısı satır sayısından bağımsız olmalı ve MAX_QUERIES
+sınırının altında kalmalıdır; aksi halde çıkış kodu 1'dir (N+1
+gerilemeleri için).
+
+Yanıt önbellekleri (referans veri, sayfa parçaları) kapatılır; her sayfa
+ölçümden önce bir kez çağrılarak süreç içi önbellekler (oturum kimliği,
+iş günü takvimi) ısıtılır.
+
+Kullanım:
+    python -m benchmarks.bench_queries --rows 40
+"""
+import argparse
+import os
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from instrumentation import count_queries
+from migrations import upgrade
+from models import db, LeaveBalance, LeaveRequest, Person, Team, User
+
+PAGES = ('/', '/admin', '/admin/users', '/admin/leave-balances',
+         '/api/persons', '/api/leave-requests', '/api/admin/person/list')
+# Sayfa başına izin verilen en fazla sorgu
+MAX_QUERIES = 12
+USER = 'sorgu'
+PASSWORD = 'sorgu'
+
+
+def seed(start, count):
+    """start'tan itibaren count adet takım, personel, kullanıcı, talep ve bakiye"""
+    today = date.today()
+    now = datetime.now()
+    for i in range(start, start + count):
+        team = Team(name=f'Takım {i}', manager=f'Yönetici {i}', max_concurrent_leaves=5)
+        person = Person(name=f'Personel {i}', email=f'p{i}@sorgu.local', role='Analist',
+                        team=team, hire_date=date(2015, 1, 1))
+        user = User(username=f'kullanici{i}', email=f'u{i}@sorgu.local', role='personel',
+                    person=person, password_hash='-')
+        db.session.add_all([team, person, user])
+        for offset, status in ((10, 'pending'), (40, 'approved')):
+            start_date = today + timedelta(days=offset + i % 20)
+            db.session.add(LeaveRequest(person=person, leave_type='annual', status=status,
+                                        start_date=start_date, end_date=start_date,
+                                        reason='Sorgu kontrolü', created_at=now))
+        db.session.add(LeaveBalance(person=person, year=today.year, entitlement=20,
+                                    used=0, pending=1, carryover=0))
+    db.session.commit()
+
+
+def measure(client):
+    """Sayfa -> (durum kodu, sorgu sayısı); önce ısıtma çağrısı yapılır"""
+    results = {}
+    for page in PAGES:
+        client.get(page).close()
+        with count_queries() as stats:
+            response = client.get(page)
+            # Akışlı gövdelerin sorguları gövde okunurken çalışır
+            response.get_data()
+            response.close()
+        results[page] = (response.status_code, stats.count)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=40,
+                        help='İlk ölçümdeki satır sayısı; ikinci ölçüm iki katı '
+                             '(varsayılan: 40, /api/leave-requests sayfası 100)')
+    parser.add_argument('--max-queries', type=int, default=MAX_QUERIES)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench_queries.db')
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+        'REFERENCE_CACHE_SIZE': 0,
+        'FRAGMENT_CACHE': 'none',
+        'NOTIFICATION_TRANSPORT': 'memory',
+        'JINJA_BYTECODE_CACHE': False,
+    })
+    with app.app_context():
+        upgrade(db.engine, log=lambda line: None)
+        admin = User(username=USER, email='sorgu@sorgu.local', role='admin')
+        admin.set_password(PASSWORD)
+        db.session.add(admin)
+        seed(1, args.rows)
+
+    client = app.test_client()
+    client.post('/login', data={'username': USER, 'password': PASSWORD})
+    first = measure(client)
+    with app.app_context():
+        seed(args.rows + 1, args.rows)
+    second = measure(client)
+
+    failures = []
+    print(f'{"sayfa":<28}{args.rows:>8}{args.rows * 2:>8}')
+    for page in PAGES:
+        (status1, count1), (status2, count2) = first[page], second[page]
+        print(f'{page:<28}{count1:>8}{count2:>8}')
+        if status1 != 200 or status2 != 200:
+            failures.append(f'{page}: durum {status1}/{status2}')
+        elif count1 != count2:
+            failures.append(f'{page}: sorgu sayısı satırla artıyor ({count1} -> {count2})')
+        elif count2 > args.max_queries:
+            failures.append(f'{page}: {count2} sorgu (sınır {args.max_queries})')
+    if failures:
+        sys.exit('\n'.join(failures))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Bakiye mutabakatı benchmark'ı
+
+Sentetik organizasyon (geçmiş yılların talepleri ve bunlardan hesaplanan
+bakiyeler) oluşturulur, bakiyelerin bir kısmı bozulur ve bir yılın
+mutabakatı ölçülür. Bulunan fark sayısının bozulan satır sayısına eşit
+olduğu da kontrol edilir.
+
+Kullanım:
+    python -m benchmarks.bench_reconcile --persons 20000 --years 3
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_overlap import build_app
+from benchmarks.synthetic import generate
+from models import db, LeaveBalance, LeaveRequest
+from reconcile import reconcile
+
+
+def corrupt(year, ratio, seed):
+    """Yılın bakiyelerinin ratio kadarının used değerini değiştir"""
+    rnd = random.Random(seed)
+    ids = [i for (i,) in db.session.query(LeaveBalance.id).filter(LeaveBalance.year == year)]
+    chosen = rnd.sample(ids, int(len(ids) * ratio))
+    # Sentetik kullanım yılda en fazla ~20 gün; 50+ her zaman farklıdır
+    db.session.execute(db.update(LeaveBalance), [
+        {'id': balance_id, 'used': rnd.randint(50, 60)} for balance_id in chosen])
+    db.session.commit()
+    return len(chosen)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--persons', type=int, default=20000)
+    parser.add_argument('--teams', type=int, default=200)
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--corrupt', type=float, default=0.01,
+                        help='Bozulacak bakiye oranı (varsayılan: 0.01)')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench_reconcile.db')
+    app = build_app(path)
+    with app.app_context():
+        db.create_all()
+        t0 = time.perf_counter()
+        summary = generate(args.persons, args.teams, args.years, seed=args.seed)
+        print(f"Sentetik veri: {summary['persons']} personel, {summary['requests']} talep, "
+              f"{summary['balances']} bakiye ({time.perf_counter() - t0:.1f} sn)")
+
+        year = date.today().year - 1
+        corrupted = corrupt(year, args.corrupt, args.seed)
+        requests = LeaveRequest.query.filter(
+            LeaveRequest.start_date <= date(year, 12, 31),
+            LeaveRequest.end_date >= date(year, 1, 1)).count()
+
+        t0 = time.perf_counter()
+        report = reconcile(year)
+        elapsed = time.perf_counter() - t0
+        print(f"{year}: {report['checked']} bakiye, {requests} talep, "
+              f"{report['mismatched']} fark ({corrupted} bozuldu) - {elapsed * 1000:.0f} ms")
+        if report['mismatched'] != corrupted:
+            sys.exit('Bulunan fark sayısı bozulan satır sayısıyla eşleşmiyor')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""Soğuk başlangıç ölçümü: içe aktarmadan ilk yanıta
+
+Her çalıştırma yeni bir Python sürecinde yapılır ve şu aşamalar ölçülür:
+  import  `import app` (Flask, SQLAlchemy ve uygulama modülleri)
+  create  create_app() (yapılandırma, engine, önbellekler)
+  login   ilk GET /login (login.html derlenir/yüklenir)
+  index   girişten sonra ilk GET / (index.html, parçalar, ilk sorgular)
+  toplam  süreç başlatılmasından ilk sayfanın dönmesine kadar geçen süre
+
+Jinja bytecode önbelleği üç durumda karşılaştırılır: kapalı (off), boş
+dizinle (cold) ve önceki çalıştırmanın doldurduğu dizinle (warm).
+
+Kullanım:
+    python -m benchmarks.bench_startup --runs 7
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.bench_concurrency import percentile
+
+PHASES = ('import', 'create', 'login', 'index', 'total')
+
+CHILD = '''
+import json, sys, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+application = app.create_app()
+t2 = time.perf_counter()
+client = application.test_client()
+assert client.get('/login').status_code == 200
+t3 = time.perf_counter()
+client.post('/login', data={'username': 'bench', 'password': 'bench'})
+assert client.get('/').status_code == 200
+t4 = time.perf_counter()
+done = time.time()
+print(json.dumps({'import': t1 - t0, 'create': t2 - t1, 'login': t3 - t2,
+                  'index': t4 - t3, 'done': done}))
+'''
+
+
+def prepare_database(path):
+    """Küçük bir veritabanı: bench kullanıcısı, birkaç takım, personel ve tatil"""
+    from datetime import date
+
+    from config import create_db_app
+    from migrations import upgrade
+    from models import db, Holiday, Person, Team, User
+
+    app = create_db_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'})
+    with app.app_context():
+        upgrade(db.engine, log=lambda line: None)
+        db.session.add_all(Team(name=f'Takım {i}') for i in range(1, 6))
+        db.session.add_all(Person(name=f'Personel {i}', email=f'p{i}@bench.local',
+                                  role='bench', team_id=i % 5 + 1,
+                                  hire_date=date(2015, 1, 1)) for i in range(200))
+        db.session.add_all(Holiday(date=date(date.today().year, month, 1), name=f'Tatil {month}')
+                           for month in range(1, 13))
+        user = User(username='bench', email='bench@bench.local', role='admin')
+        # Ölçüm şifre hashini değil başlangıcı hedefler
+        user.password_hash = _cheap_hash('bench')
+        db.session.add(user)
+        db.session.commit()
+
+
+def _cheap_hash(password):
+    from werkzeug.security import generate_password_hash
+    return generate_password_hash(password, method='pbkdf2:sha256:1000')
+
+
+def run_once(env):
+    started = time.time()
+    output = subprocess.run([sys.executable, '-c', CHILD], cwd=ROOT, env=env,
+                            check=True, capture_output=True, text=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result['total'] = result.pop('done') - started
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=7)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_startup_')
+    db_path = os.path.join(workdir, 'startup.db')
+    prepare_database(db_path)
+    base_env = dict(os.environ, DATABASE_URL=f'sqlite:///{db_path}',
+                    NOTIFICATION_TRANSPORT='memory', METRICS_ENABLED='0',
+                    PASSWORD_HASH_METHOD='pbkdf2:sha256:1000')
+    warm_dir = os.path.join(workdir, 'jinja-warm')
+
+    modes = {
+        'off': lambda i: dict(base_env, JINJA_BYTECODE_CACHE='0'),
+        'cold': lambda i: dict(base_env, JINJA_CACHE_DIR=os.path.join(workdir, f'jinja-cold-{i}')),
+        'warm': lambda i: dict(base_env, JINJA_CACHE_DIR=warm_dir),
+    }
+    # warm dizini bir ön çalıştırmayla doldurulur
+    run_once(modes['warm'](0))
+
+    print(f'{"mod":<6}' + ''.join(f'{phase:>10}' for phase in PHASES) + '   (ms, medyan)')
+    try:
+        for mode, make_env in modes.items():
+            runs = [run_once(make_env(i)) for i in range(args.runs)]
+            print(f'{mode:<6}' + ''.join(
+                f'{percentile([r[phase] for r in runs], 50) * 1000:>10.1f}' for phase in PHASES))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
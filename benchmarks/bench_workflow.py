@@ -0,0 +1,247 @@
+"""İzin iş akışı yük testi
+
+Sentetik bir organizasyon üzerinde sırasıyla müsaitlik kontrolü, talep
+oluşturma, onay ve listeleme uç noktaları W eşzamanlı istemciyle çağrılır;
+her aşama için p50/p95/p99 gecikme ve saniyedeki istek raporlanır.
+
+İki sürücü vardır:
+  client  Flask test istemcisi (aynı süreçte, ağ yok). DATABASE_URL
+          verilmezse geçici bir SQLite veritabanı oluşturulup sentetik
+          veriyle doldurulur.
+  http    Çalışan bir sunucuya gerçek HTTP istekleri (requests). Sunucunun
+          veritabanı önceden `python -m benchmarks.synthetic` ile
+          doldurulmuş olmalıdır.
+
+Sonuçlar --json ile kaydedilip başka bir commit'teki çalıştırmayla --compare
+seçeneğiyle karşılaştırılabilir. Aynı --seed ile aynı istek dizisi üretilir.
+
+Kullanım:
+    python -m benchmarks.bench_workflow --persons 2000 --workers 8 --json before.json
+    python -m benchmarks.bench_workflow --persons 2000 --workers 8 --compare before.json
+    python -m benchmarks.bench_workflow --driver http --url http://localhost:5000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.bench_concurrency import percentile
+from benchmarks.synthetic import BENCH_PASSWORD, BENCH_USER
+
+PHASES = ('check', 'request', 'approve', 'list')
+
+
+class ClientSession:
+    """Flask test istemcisi üzerinde oturum"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+        self.client.post('/login', data={'username': BENCH_USER,
+                                         'password': BENCH_PASSWORD})
+
+    def call(self, method, path, payload=None):
+        response = self.client.open(path, method=method, json=payload)
+        return response.status_code, response.get_json(silent=True)
+
+
+class HTTPSession:
+    """Çalışan sunucuya requests ile oturum"""
+
+    def __init__(self, url):
+        import requests
+
+        self.url = url.rstrip('/')
+        self.session = requests.Session()
+        self.session.post(f'{self.url}/login', data={'username': BENCH_USER,
+                                                     'password': BENCH_PASSWORD})
+
+    def call(self, method, path, payload=None):
+        response = self.session.request(method, self.url + path, json=payload)
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        return response.status_code, body
+
+
+def run_phase(sessions, operations):
+    """operations: her biri session -> (yöntem, yol, gövde) üreten iş listesi
+
+    İşler oturumlar arasında paylaştırılır; her yanıtın süresi ve durum
+    kodu kaydedilir.
+    """
+    latencies, statuses, bodies = [], [], []
+    lock = threading.Lock()
+    cursor = iter(operations)
+
+    def worker(session):
+        while True:
+            with lock:
+                operation = next(cursor, None)
+            if operation is None:
+                return
+            method, path, payload = operation
+            t0 = time.perf_counter()
+            try:
+                status, body = session.call(method, path, payload)
+            except Exception as e:
+                status, body = 599, {'error': str(e)}
+            elapsed = time.perf_counter() - t0
+            with lock:
+                latencies.append(elapsed)
+                statuses.append(status)
+                bodies.append(body)
+
+    threads = [threading.Thread(target=worker, args=(s,)) for s in sessions]
+    t0 = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - t0
+
+    return {
+        'requests': len(latencies),
+        'ok': sum(200 <= s < 300 for s in statuses),
+        'rejected': sum(400 <= s < 500 for s in statuses),
+        'errors': sum(s >= 500 for s in statuses),
+        'throughput': len(latencies) / wall if wall else 0.0,
+        'p50': percentile(latencies, 50) * 1000,
+        'p95': percentile(latencies, 95) * 1000,
+        'p99': percentile(latencies, 99) * 1000,
+    }, bodies
+
+
+def build_operations(phase, ops, persons, teams, created, rnd, year):
+    """Aşamanın istek dizisi (aynı tohumla aynı dizi)"""
+    def window():
+        start = date(year, 1, 1) + timedelta(days=rnd.randrange(350))
+        return start, start + timedelta(days=rnd.randrange(0, 5))
+
+    operations = []
+    for i in range(ops):
+        if phase == 'check':
+            start, end = window()
+            operations.append(('POST', '/api/leave/check', {
+                'person_id': rnd.choice(persons), 'start_date': start.isoformat(),
+                'end_date': end.isoformat()}))
+        elif phase == 'request':
+            start, end = window()
+            operations.append(('POST', '/api/leave/request', {
+                'person_id': rnd.choice(persons), 'start_date': start.isoformat(),
+                'end_date': end.isoformat(), 'reason': 'Yük testi'}))
+        elif phase == 'approve':
+            if i >= len(created):
+                break
+            operations.append(('PUT', f'/api/admin/leave/approve/{created[i]}', None))
+        elif phase == 'list':
+            team_id = rnd.choice(teams)
+            if i % 2:
+                operations.append(('GET', f'/api/leave-requests?team_id={team_id}'
+                                          f'&status=approved&limit=50', None))
+            else:
+                month = date(year, rnd.randint(1, 12), 1)
+                operations.append(('GET', f'/api/calendar/availability?team={team_id}'
+                                          f'&from={month.isoformat()}', None))
+    return operations
+
+
+def prepare_client(args):
+    """Test istemcisi için uygulamayı ve (gerekirse) sentetik veriyi hazırla"""
+    if not os.environ.get('DATABASE_URL'):
+        path = os.path.join(tempfile.mkdtemp(), 'bench_workflow.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    from app import create_app
+    from benchmarks.synthetic import generate
+    from migrations import upgrade
+    from models import db, Person
+
+    app = create_app()
+    with app.app_context():
+        upgrade(db.engine, log=lambda line: None)
+        if Person.query.first() is None:
+            t0 = time.perf_counter()
+            summary = generate(args.persons, args.teams, args.years, seed=args.seed)
+            print(f"Sentetik veri: {summary['persons']} personel, {summary['teams']} takım, "
+                  f"{summary['requests']} talep ({time.perf_counter() - t0:.1f} sn)")
+    return lambda: ClientSession(app)
+
+
+def print_report(results, baseline=None):
+    print(f'{"aşama":<8} {"istek":>6} {"istek/sn":>9} {"p50":>9} {"p95":>9} '
+          f'{"p99":>9} {"4xx":>5} {"5xx":>5}')
+    for phase, stats in results.items():
+        print(f'{phase:<8} {stats["requests"]:>6} {stats["throughput"]:>9.1f} '
+              f'{stats["p50"]:>7.2f}ms {stats["p95"]:>7.2f}ms {stats["p99"]:>7.2f}ms '
+              f'{stats["rejected"]:>5} {stats["errors"]:>5}')
+        if baseline and phase in baseline:
+            before = baseline[phase]
+
+            def change(key):
+                return (stats[key] / before[key] - 1) * 100 if before[key] else 0.0
+            print(f'{"  fark":<8} {"":>6} {change("throughput"):>+8.1f}% '
+                  f'{change("p50"):>+8.1f}% {change("p95"):>+8.1f}% {change("p99"):>+8.1f}%')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--driver', choices=['client', 'http'], default='client')
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--ops', type=int, default=500, help='Aşama başına istek sayısı')
+    parser.add_argument('--phases', default=','.join(PHASES))
+    parser.add_argument('--persons', type=int, default=1000)
+    parser.add_argument('--teams', type=int, default=20)
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help='Sonuçların yazılacağı dosya')
+    parser.add_argument('--compare', help='Karşılaştırılacak önceki --json çıktısı')
+    args = parser.parse_args()
+
+    if args.driver == 'client':
+        make_session = prepare_client(args)
+    else:
+        make_session = lambda: HTTPSession(args.url)
+
+    sessions = [make_session() for _ in range(args.workers)]
+    status, persons = sessions[0].call('GET', '/api/persons')
+    if status != 200:
+        sys.exit(f'Personel listesi alınamadı ({status}); {BENCH_USER} kullanıcısı var mı?')
+    person_ids = [p['id'] for p in persons]
+    team_ids = sorted({p['team_id'] for p in persons if p['team_id']})
+
+    rnd = random.Random(args.seed)
+    # Geçmiş verinin dışında, ileri bir yılda çalışılır
+    year = date.today().year + 2
+    created = []
+    results = {}
+    for phase in args.phases.split(','):
+        operations = build_operations(phase, args.ops, person_ids, team_ids,
+                                      created, rnd, year)
+        stats, bodies = run_phase(sessions, operations)
+        if phase == 'request':
+            created = [body['id'] for body in bodies
+                       if body and body.get('status') == 'pending']
+        results[phase] = stats
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+    print(f'sürücü={args.driver} işçi={args.workers} aşama başına istek={args.ops}')
+    print_report(results, baseline)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
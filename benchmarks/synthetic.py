@@ -0,0 +1,140 @@
+"""Sentetik organizasyon üreteci
+
+Takımlar, personel, geçmiş yılların izin talepleri, resmi tatiller ve
+bunlardan hesaplanan bakiyeler aynı tohumla her seferinde aynı biçimde
+üretilir. Benchmark'lar için `bench` / `bench` admin kullanıcısı eklenir.
+
+Kullanım (DATABASE_URL'deki boş veritabanına):
+    python -m benchmarks.synthetic --persons 2000 --teams 50 --years 3
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import db, Holiday, LeaveRequest, Person, Team, User
+from balances import rebuild_balances
+
+BENCH_USER = 'bench'
+BENCH_PASSWORD = 'bench'
+
+# Her yıl tekrarlanan resmi tatiller (ay, gün, ad)
+FIXED_HOLIDAYS = [
+    (1, 1, 'Yılbaşı'), (4, 23, 'Ulusal Egemenlik ve Çocuk Bayramı'),
+    (5, 1, 'Emek ve Dayanışma Günü'), (5, 19, 'Gençlik ve Spor Bayramı'),
+    (7, 15, 'Demokrasi ve Milli Birlik Günü'), (8, 30, 'Zafer Bayramı'),
+    (10, 29, 'Cumhuriyet Bayramı'),
+]
+ROLES = ['Yazılım Geliştirici', 'Analist', 'Test Uzmanı', 'Destek Uzmanı',
+         'Tasarımcı', 'Proje Yöneticisi']
+# Geçmiş taleplerin durum dağılımı
+HISTORY_STATUSES = ['approved'] * 8 + ['rejected', 'pending']
+
+
+def _holidays(years, per_year, rnd):
+    rows = []
+    for year in years:
+        days = {date(year, month, day): name for month, day, name in FIXED_HOLIDAYS}
+        # Dini bayramlar yerine yıl içine dağılmış rastgele günler
+        while len(days) < max(per_year, len(FIXED_HOLIDAYS)):
+            day = date(year, 1, 1) + timedelta(days=rnd.randrange(365))
+            days.setdefault(day, 'Bayram')
+        rows.extend({'date': day, 'name': name, 'is_public': True, 'country': 'TR'}
+                    for day, name in sorted(days.items()))
+    return rows
+
+
+def _history(person_ids, years, leaves_per_year, rnd, now):
+    """Personel başına çakışmayan geçmiş talepler"""
+    for person_id in person_ids:
+        for year in years:
+            day = date(year, 1, 2)
+            for _ in range(leaves_per_year):
+                day += timedelta(days=rnd.randrange(5, 60))
+                length = rnd.randrange(1, 6)
+                if (day + timedelta(days=length)).year != year:
+                    break
+                yield {
+                    'person_id': person_id, 'leave_type': 'annual',
+                    'start_date': day, 'end_date': day + timedelta(days=length - 1),
+                    'reason': 'Sentetik', 'status': rnd.choice(HISTORY_STATUSES),
+                    'created_at': now,
+                }
+                day += timedelta(days=length)
+
+
+def generate(persons=1000, teams=20, years=3, leaves_per_year=4,
+             holidays_per_year=12, seed=42, batch=20000, today=None):
+    """Boş veritabanına sentetik organizasyon yükle; özet döndür"""
+    rnd = random.Random(seed)
+    now = datetime.now()
+    today = today or date.today()
+    history_years = range(today.year - years, today.year)
+    team_size = max(persons // max(teams, 1), 1)
+
+    db.session.execute(db.insert(Team), [{
+        'name': f'Takım {i}', 'manager': f'Yönetici {i}',
+        'max_concurrent_leaves': max(2, team_size // 5), 'created_at': now,
+    } for i in range(1, teams + 1)])
+    db.session.execute(db.insert(Person), [{
+        'name': f'Personel {i}', 'email': f'personel{i}@bench.local',
+        'role': rnd.choice(ROLES), 'team_id': rnd.randint(1, teams),
+        'hire_date': today - timedelta(days=rnd.randrange(30, 365 * 15)),
+        'is_active': True, 'created_at': now,
+    } for i in range(1, persons + 1)])
+    db.session.execute(db.insert(Holiday), _holidays(
+        range(today.year - years, today.year + 3), holidays_per_year, rnd))
+
+    requests = 0
+    buffer = []
+    for row in _history(range(1, persons + 1), history_years, leaves_per_year, rnd, now):
+        buffer.append(row)
+        if len(buffer) >= batch:
+            db.session.execute(db.insert(LeaveRequest), buffer)
+            requests += len(buffer)
+            buffer = []
+    if buffer:
+        db.session.execute(db.insert(LeaveRequest), buffer)
+        requests += len(buffer)
+
+    user = User(username=BENCH_USER, email='bench@bench.local', role='admin')
+    user.set_password(BENCH_PASSWORD)
+    db.session.add(user)
+    db.session.commit()
+    balances = rebuild_balances()
+    return {'teams': teams, 'persons': persons, 'requests': requests,
+            'balances': balances['created']}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--persons', type=int, default=1000)
+    parser.add_argument('--teams', type=int, default=20)
+    parser.add_argument('--years', type=int, default=3, help='Geçmiş izin yılı sayısı')
+    parser.add_argument('--leaves-per-year', type=int, default=4)
+    parser.add_argument('--holidays-per-year', type=int, default=12)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    from config import create_db_app
+    from migrations import upgrade
+
+    app = create_db_app()
+    with app.app_context():
+        upgrade(db.engine, log=lambda line: None)
+        if Person.query.first() is not None:
+            sys.exit('Veritabanı boş değil; sentetik veri yalnızca boş veritabanına yüklenir')
+        t0 = time.perf_counter()
+        summary = generate(args.persons, args.teams, args.years, args.leaves_per_year,
+                           args.holidays_per_year, args.seed)
+    print(f"{summary['teams']} takım, {summary['persons']} personel, "
+          f"{summary['requests']} talep, {summary['balances']} bakiye "
+          f"({time.perf_counter() - t0:.1f} sn)")
+
+
+if __name__ == '__main__':
+    main()
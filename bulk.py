@@ -0,0 +1,213 @@
+"""Toplu izin onayı/reddi (admin bekleyen kuyruğu)
+
+Seçilen talepler tek istekte ve tek transaction içinde işlenir: talepler,
+kişilerin onaylı izinleri ve bakiyeler birer sorguyla yüklenir; çakışma,
+takım kapasitesi ve bakiye kontrolleri bellekte, önceki kararları da
+hesaba katarak yapılır. Ardından her (eski, yeni) durum çifti için tek
+bir `UPDATE ... WHERE id IN (...) AND status = :eski` çalışır; arada
+başka bir işlemle değişmiş talepler güncellenmez. Kontrolden geçemeyen
+talepler atlanır ve sonuç listesinde nedeniyle birlikte döner.
+"""
+from collections import defaultdict, namedtuple
+from datetime import datetime
+
+from models import db, LeaveRequest
+from balances import (STATUS_CONFLICT_MESSAGE, apply_status_changes,
+                      balance_deltas, balance_message, insufficient_year,
+                      remaining_balances)
+from capacity import capacity_index, capacity_message
+from overlap import overlaps
+from queries import leave_requests_with_person
+
+MAX_ITEMS = 1000
+# İşlem -> yeni durum
+ACTIONS = {'approve': 'approved', 'reject': 'rejected'}
+# Kuyruktaki sıra fark etmeksizin önce reddedilenler işlenir; böylece
+# boşalan kapasite ve bakiye aynı istekteki onaylarda kullanılabilir
+ACTION_ORDER = ('reject', 'approve')
+
+# Commit sonrası kancalar için talebin ORM'den bağımsız görüntüsü
+LeaveSnapshot = namedtuple('LeaveSnapshot', 'id person_id leave_type '
+                                            'start_date end_date status')
+
+
+class BulkError(ValueError):
+    """Geçersiz toplu işlem isteği"""
+
+
+def parse_items(data):
+    """İstek gövdesini [(id, action)] listesine çevir
+
+    Kabul edilen biçimler: {"items": [{"id": 1, "action": "approve"}, ...]}
+    veya {"ids": [1, 2], "action": "reject"}.
+    """
+    if not isinstance(data, dict):
+        raise BulkError('Geçersiz istek gövdesi')
+    if 'items' in data:
+        items = data['items']
+        if not isinstance(items, list) or not all(isinstance(i, dict) for i in items):
+            raise BulkError('items nesne listesi olmalı')
+        pairs = [(item.get('id'), item.get('action')) for item in items]
+    elif isinstance(data.get('ids'), list):
+        pairs = [(request_id, data.get('action')) for request_id in data['ids']]
+    else:
+        raise BulkError('items veya ids zorunlu')
+    if not pairs:
+        raise BulkError('En az bir talep seçilmeli')
+    if len(pairs) > MAX_ITEMS:
+        raise BulkError(f'Tek istekte en fazla {MAX_ITEMS} talep işlenebilir')
+    return pairs
+
+
+def _ordinals(start_date, end_date):
+    return range(start_date.toordinal(), end_date.toordinal() + 1)
+
+
+class _Batch:
+    """Tek istekteki kararların bellekteki durumu"""
+
+    def __init__(self, requests):
+        leave_requests = [r for r, _ in requests.values()]
+        person_ids = {r.person_id for r in leave_requests}
+        start = min(r.start_date for r in leave_requests)
+        end = max(r.end_date for r in leave_requests)
+
+        # Kişi -> onaylı izinler (id, başlangıç, bitiş)
+        self.approved = defaultdict(dict)
+        if person_ids:
+            query = db.session.query(
+                LeaveRequest.id, LeaveRequest.person_id,
+                LeaveRequest.start_date, LeaveRequest.end_date
+            ).filter(
+                LeaveRequest.person_id.in_(person_ids),
+                LeaveRequest.status == 'approved',
+                overlaps(start, end)
+            )
+            for other_id, person_id, other_start, other_end in query:
+                self.approved[person_id][other_id] = (other_start, other_end)
+
+        # Takım -> {ordinal: onaylı sayısındaki fark}
+        self.capacity = defaultdict(lambda: defaultdict(int))
+
+        # (kişi, yıl) -> kalan gün
+        changes = [(r, r.status, ACTIONS[action])
+                   for r, action in requests.values()]
+        self.remaining = remaining_balances(
+            balance_deltas(changes), {r.person_id: r.person for r in leave_requests})
+
+        self.changes = []
+
+    def check(self, leave_request, new_status):
+        """Kararın reddedilme nedeni; uygunsa None"""
+        old_status = leave_request.status
+        if old_status == new_status:
+            return 'Talep zaten bu durumda'
+        team_id = leave_request.person.team_id
+        if new_status == 'approved':
+            for other_id, (start, end) in self.approved[leave_request.person_id].items():
+                if (other_id != leave_request.id and start <= leave_request.end_date
+                        and end >= leave_request.start_date):
+                    return 'Personelin bu tarihlerde onaylı başka bir izni var'
+            overbooked = capacity_index.overbooked_days(
+                team_id, leave_request.start_date, leave_request.end_date,
+                statuses=('approved',), extra=self.capacity.get(team_id))
+            if overbooked:
+                return capacity_message(overbooked)
+            year = insufficient_year(leave_request, old_status, new_status,
+                                     self.remaining)
+            if year is not None:
+                return balance_message(year)
+        return None
+
+    def accept(self, leave_request, new_status):
+        old_status = leave_request.status
+        team_id = leave_request.person.team_id
+        dates = (leave_request.start_date, leave_request.end_date)
+        if new_status == 'approved':
+            self.approved[leave_request.person_id][leave_request.id] = dates
+        elif old_status == 'approved':
+            self.approved[leave_request.person_id].pop(leave_request.id, None)
+        step = (new_status == 'approved') - (old_status == 'approved')
+        if step and team_id is not None:
+            extra = self.capacity[team_id]
+            for day in _ordinals(*dates):
+                extra[day] += step
+        for key, columns in balance_deltas(
+                [(leave_request, old_status, new_status)]).items():
+            self.remaining[key] -= sum(columns.values())
+        self.changes.append((leave_request, old_status, new_status))
+
+
+def process(pairs, approved_by):
+    """Kararları oturuma uygula (commit etmez)
+
+    (sonuçlar, değişiklikler) döndürür; değişiklikler commit sonrası
+    kancalar için [(LeaveSnapshot, team_id, eski_durum)] listesidir.
+    """
+    results = []
+    selected = {}
+    for request_id, action in pairs:
+        result = {'id': request_id, 'action': action, 'ok': False}
+        results.append(result)
+        if not isinstance(request_id, int) or isinstance(request_id, bool):
+            result['error'] = 'Geçersiz talep id'
+        elif action not in ACTIONS:
+            result['error'] = 'action approve veya reject olmalı'
+        elif request_id in selected:
+            result['error'] = 'Talep listede birden fazla kez var'
+        else:
+            selected[request_id] = (action, result)
+
+    requests = {}
+    if selected:
+        for leave_request in leave_requests_with_person().filter(
+                LeaveRequest.id.in_(selected)):
+            requests[leave_request.id] = (leave_request,
+                                          selected[leave_request.id][0])
+    for request_id, (action, result) in selected.items():
+        if request_id not in requests:
+            result['error'] = 'Talep bulunamadı'
+    if not requests:
+        return results, []
+
+    batch = _Batch(requests)
+    for current in ACTION_ORDER:
+        for request_id, (leave_request, action) in requests.items():
+            if action != current:
+                continue
+            result = selected[request_id][1]
+            new_status = ACTIONS[action]
+            error = batch.check(leave_request, new_status)
+            if error:
+                result['error'] = error
+                continue
+            batch.accept(leave_request, new_status)
+            result.update(ok=True, status=new_status)
+
+    # Talepler okunduktan sonra başka bir işlemle güncellenmişse durum
+    # koşulu satırı eşlemez; bakiye yalnızca güncellenen satırlara uygulanır
+    by_transition = defaultdict(list)
+    for leave_request, old_status, new_status in batch.changes:
+        by_transition[(old_status, new_status)].append(leave_request.id)
+    now = datetime.now()
+    updated = set()
+    for (old_status, new_status), ids in by_transition.items():
+        updated.update(db.session.scalars(
+            db.update(LeaveRequest).where(
+                LeaveRequest.id.in_(ids), LeaveRequest.status == old_status
+            ).values(status=new_status, approved_by=approved_by, approved_at=now)
+            .returning(LeaveRequest.id),
+            execution_options={'synchronize_session': False}))
+    applied = [change for change in batch.changes if change[0].id in updated]
+    for leave_request, _, _ in batch.changes:
+        if leave_request.id not in updated:
+            result = selected[leave_request.id][1]
+            result.pop('status')
+            result.update(ok=False, error=STATUS_CONFLICT_MESSAGE)
+    apply_status_changes(applied, {r.person_id: r.person for r, _, _ in applied})
+
+    changes = [(LeaveSnapshot(r.id, r.person_id, r.leave_type, r.start_date,
+                              r.end_date, new_status),
+                r.person.team_id, old_status)
+               for r, old_status, new_status in applied]
+    return results, changes
@@ -0,0 +1,166 @@
+"""Takım eşzamanlı izin kapasitesi
+
+Her takım için gün -> izinli kişi sayısı tablosu (onaylı ve bekleyen
+ayrı) tutulur. Tablo ilk ihtiyaçta takımın talepleri üzerinde tek bir
+sweep-line geçişiyle kurulur, sonrasında talep oluşturma/onay/red
+işlemlerinde artımlı güncellenir. Bir talebin kapasiteyi aşıp aşmadığı
+talep edilen gün sayısı kadar sözlük okumasıyla (O(gün)) bulunur.
+"""
+import threading
+from collections import defaultdict
+from datetime import date
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db, LeaveRequest, Person, Team
+
+COUNTED_STATUSES = ('approved', 'pending')
+
+
+def sweep(intervals):
+    """[(başlangıç_ordinal, bitiş_ordinal)] -> {ordinal: eşzamanlı sayı}"""
+    diff = defaultdict(int)
+    for start, end in intervals:
+        diff[start] += 1
+        diff[end + 1] -= 1
+    counts = {}
+    running = 0
+    points = sorted(diff)
+    for point, next_point in zip(points, points[1:]):
+        running += diff[point]
+        if running:
+            for day in range(point, next_point):
+                counts[day] = running
+    return counts
+
+
+class TeamOccupancy:
+    def __init__(self, max_concurrent, approved=(), pending=()):
+        self.max_concurrent = max_concurrent
+        self.counts = {'approved': sweep(approved), 'pending': sweep(pending)}
+
+    def add(self, start_date, end_date, status, delta=1):
+        counts = self.counts.get(status)
+        if counts is None:
+            return
+        for day in range(start_date.toordinal(), end_date.toordinal() + 1):
+            value = counts.get(day, 0) + delta
+            if value > 0:
+                counts[day] = value
+            else:
+                counts.pop(day, None)
+
+    def count(self, day, statuses=COUNTED_STATUSES):
+        ordinal = day.toordinal()
+        return sum(self.counts[s].get(ordinal, 0) for s in statuses)
+
+    def overbooked_days(self, start_date, end_date, statuses=COUNTED_STATUSES,
+                        extra=None):
+        """Bir kişi daha eklendiğinde kapasiteyi aşan günler
+
+        extra: henüz commit edilmemiş değişiklikler için {ordinal: fark}.
+        """
+        if not self.max_concurrent:
+            return []
+        tables = [self.counts[s] for s in statuses]
+        if extra:
+            tables.append(extra)
+        return [date.fromordinal(day)
+                for day in range(start_date.toordinal(), end_date.toordinal() + 1)
+                if sum(t.get(day, 0) for t in tables) + 1 > self.max_concurrent]
+
+
+class CapacityIndex:
+    """Takım bazlı doluluk tablolarının süreç içi önbelleği"""
+
+    def __init__(self):
+        self._teams = {}
+        self._lock = threading.RLock()
+
+    def invalidate(self, team_id=None):
+        with self._lock:
+            if team_id is None:
+                self._teams.clear()
+            else:
+                self._teams.pop(team_id, None)
+
+    def _build(self, team_id):
+        max_concurrent = db.session.query(Team.max_concurrent_leaves).filter(
+            Team.id == team_id).scalar()
+        rows = db.session.query(
+            LeaveRequest.start_date, LeaveRequest.end_date, LeaveRequest.status
+        ).join(Person, LeaveRequest.person_id == Person.id).filter(
+            Person.team_id == team_id,
+            LeaveRequest.status.in_(COUNTED_STATUSES)
+        )
+        intervals = {'approved': [], 'pending': []}
+        for start_date, end_date, status in rows:
+            intervals[status].append((start_date.toordinal(), end_date.toordinal()))
+        return TeamOccupancy(max_concurrent, intervals['approved'],
+                             intervals['pending'])
+
+    def for_team(self, team_id):
+        with self._lock:
+            occupancy = self._teams.get(team_id)
+            if occupancy is None:
+                occupancy = self._teams[team_id] = self._build(team_id)
+            return occupancy
+
+    def overbooked_days(self, team_id, start_date, end_date,
+                        statuses=COUNTED_STATUSES, extra=None):
+        """Takımda kapasitenin aşıldığı günler (takımsız personel için boş)"""
+        if team_id is None:
+            return []
+        with self._lock:
+            return self.for_team(team_id).overbooked_days(start_date, end_date,
+                                                          statuses, extra)
+
+    def apply_status_change(self, team_id, start_date, end_date, old_status,
+                            new_status):
+        """Commit sonrası artımlı güncelleme; tablo kurulmamışsa dokunulmaz"""
+        if team_id is None or old_status == new_status:
+            return
+        with self._lock:
+            occupancy = self._teams.get(team_id)
+            if occupancy is None:
+                return
+            occupancy.add(start_date, end_date, old_status, -1)
+            occupancy.add(start_date, end_date, new_status, 1)
+
+
+capacity_index = CapacityIndex()
+
+
+def capacity_message(days):
+    """Kapasite aşımı hata mesajı (ilk beş gün listelenir)"""
+    shown = ', '.join(d.strftime('%d/%m/%Y') for d in days[:5])
+    more = f' (+{len(days) - 5} gün)' if len(days) > 5 else ''
+    return f'Takım eşzamanlı izin kapasitesi aşılıyor: {shown}{more}'
+
+
+# Takım üyeliği veya kapasite değiştiğinde tabloları yeniden kur;
+# transaction sonunda bir kez daha düşürülür ki arada eski satırları
+# okuyan eşzamanlı istekler önbelleğe eski tabloyu bırakmasın
+# (None: tüm takımlar)
+@event.listens_for(Session, 'after_flush')
+def _membership_flushed(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Team):
+            session.info.setdefault('capacity_changed', set()).add(obj.id)
+            capacity_index.invalidate(obj.id)
+        elif isinstance(obj, Person) and obj not in session.new:
+            session.info.setdefault('capacity_changed', set()).add(None)
+            capacity_index.invalidate()
+            return
+
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+def _membership_transaction_end(session):
+    team_ids = session.info.pop('capacity_changed', ())
+    if None in team_ids:
+        capacity_index.invalidate()
+        return
+    for team_id in team_ids:
+        capacity_index.invalidate(team_id)
@@ -0,0 +1,102 @@
+"""Akışlı CSV dışa aktarımı (bordro mutabakatı için)
+
+Satırlar yield_per ile sunucu tarafı cursor'dan parça parça okunur ve
+CSV olarak üretici (generator) üzerinden yazılır; ORM nesnesi yerine
+sütun demetleri okunduğundan oturum kimlik haritası büyümez ve bellek
+kullanımı satır sayısından bağımsız kalır.
+"""
+import csv
+from datetime import date
+
+from models import db, LeaveBalance, LeaveRequest, Person, Team
+from overlap import overlaps
+from work_calendar import work_calendar
+
+FETCH_BATCH = 1000
+# Excel'in Türkçe karakterleri doğru açması için UTF-8 BOM
+BOM = '\ufeff'
+
+
+class _Chunk:
+    """csv.writer için satırları biriktiren yazma hedefi"""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, value):
+        self.parts.append(value)
+
+    def drain(self):
+        data = ''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def stream_csv(header, rows, chunk_rows=FETCH_BATCH):
+    """Başlık + satırları chunk_rows'luk parçalar halinde CSV metni üret"""
+    chunk = _Chunk()
+    writer = csv.writer(chunk)
+    chunk.write(BOM)
+    writer.writerow(header)
+    for index, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if index % chunk_rows == 0:
+            yield chunk.drain()
+    yield chunk.drain()
+
+
+LEAVE_REQUEST_HEADER = ['id', 'personel', 'email', 'takim', 'izin_turu',
+                        'baslangic', 'bitis', 'is_gunu', 'durum',
+                        'olusturma']
+
+
+def leave_request_rows(status=None, team_id=None, start_date=None,
+                       end_date=None):
+    """Dışa aktarılacak izin talebi satırları"""
+    query = db.session.query(
+        LeaveRequest.id, Person.name, Person.email, Team.name,
+        LeaveRequest.leave_type, LeaveRequest.start_date,
+        LeaveRequest.end_date, LeaveRequest.status, LeaveRequest.created_at
+    ).join(Person, LeaveRequest.person_id == Person.id).outerjoin(
+        Team, Person.team_id == Team.id
+    )
+    if status:
+        query = query.filter(LeaveRequest.status == status)
+    if team_id:
+        query = query.filter(Person.team_id == team_id)
+    if start_date or end_date:
+        query = query.filter(overlaps(start_date or date.min,
+                                      end_date or date.max))
+    query = query.order_by(LeaveRequest.id)
+
+    for (request_id, name, email, team, leave_type, start, end, status_,
+         created_at) in query.yield_per(FETCH_BATCH):
+        yield (request_id, name, email, team or '', leave_type,
+               start.isoformat(), end.isoformat(),
+               work_calendar.working_days(start, end), status_,
+               created_at.strftime('%Y-%m-%d %H:%M:%S') if created_at else '')
+
+
+BALANCE_HEADER = ['personel_id', 'personel', 'email', 'takim', 'yil',
+                  'hak', 'devreden', 'kullanilan', 'bekleyen', 'kalan']
+
+
+def balance_rows(year=None):
+    """Dışa aktarılacak bakiye satırları"""
+    query = db.session.query(
+        Person.id, Person.name, Person.email, Team.name, LeaveBalance.year,
+        LeaveBalance.entitlement, LeaveBalance.carryover, LeaveBalance.used,
+        LeaveBalance.pending
+    ).join(Person, LeaveBalance.person_id == Person.id).outerjoin(
+        Team, Person.team_id == Team.id
+    )
+    if year:
+        query = query.filter(LeaveBalance.year == year)
+    query = query.order_by(LeaveBalance.year, Person.id)
+
+    for (person_id, name, email, team, year_, entitlement, carryover, used,
+         pending) in query.yield_per(FETCH_BATCH):
+        carryover, used, pending = carryover or 0, used or 0, pending or 0
+        yield (person_id, name, email, team or '', year_, entitlement,
+               carryover, used, pending,
+               entitlement + carryover - used - pending)
@@ -0,0 +1,247 @@
+"""Sayfa parçası (fragment) önbelleği
+
+Ana sayfadaki personel seçici ve tatil listesi ile bakiye sayfasındaki
+özet tablo her istekte yeniden sorgulanıp render edilmez. Parça, bağlı
+olduğu tabloların sürümü, kullanıcının rolü ve parçaya özgü anahtar
+(ör. yıl) ile saklanır; tablolardan biri commit'te değişince sürüm
+değişir ve parça bir sonraki istekte yeniden üretilir.
+
+Arka uçlar:
+  memory  Süreç içi LRU (varsayılan). Her işçi süreci kendi kopyasını ve
+          sürüm sayaçlarını tutar.
+  file    FRAGMENT_CACHE_DIR altında dosyalar; sürüm belirteçleri de aynı
+          dizinde tutulduğundan aynı makinedeki tüm işçi süreçleri parçaları
+          ve geçersiz kılmaları paylaşır. Dizin /dev/shm altında verilirse
+          paylaşımlı bellekte durur.
+  none    Önbellek kapalı; parçalar her istekte render edilir.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+
+from flask import render_template
+from flask_login import current_user
+from markupsafe import Markup
+
+from refdata import watch_tables
+
+DEFAULT_MAX_ENTRIES = 256
+# Dosya arka ucunda her bu kadar yazmada bir eski parçalar temizlenir
+PRUNE_EVERY = 64
+
+# Parça adı -> bağlı olduğu tablolar
+FRAGMENTS = {
+    'person_options': ('person',),
+    'holiday_list': ('holiday',),
+    'balance_table': ('leave_balance', 'person', 'team'),
+}
+
+
+class MemoryBackend:
+    """Süreç içi LRU"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def versions(self, tables):
+        with self._lock:
+            return tuple(self._versions.get(table, 0) for table in tables)
+
+    def bump(self, tables):
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def get(self, key):
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+            return html
+
+    def set(self, key, html):
+        with self._lock:
+            self._entries[key] = html
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def size(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class FileBackend:
+    """Süreçler arası paylaşılan dizin
+
+    Her parça ayrı bir dosyadır; yazma geçici dosya + os.replace ile
+    atomiktir. Tablo sürümleri versions/<tablo> dosyasındaki rastgele
+    belirteçtir, değişiklikte yenisi yazılır.
+    """
+
+    def __init__(self, directory, max_entries=DEFAULT_MAX_ENTRIES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._version_dir = os.path.join(directory, 'versions')
+        os.makedirs(self._version_dir, exist_ok=True)
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def _write(self, path, text):
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def versions(self, tables):
+        tokens = []
+        for table in tables:
+            try:
+                with open(os.path.join(self._version_dir, table), encoding='utf-8') as f:
+                    tokens.append(f.read())
+            except FileNotFoundError:
+                tokens.append('0')
+        return tuple(tokens)
+
+    def bump(self, tables):
+        for table in tables:
+            self._write(os.path.join(self._version_dir, table), uuid.uuid4().hex)
+
+    def _path(self, key):
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.directory, f'{digest}.html')
+
+    def get(self, key):
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def set(self, key, html):
+        self._write(self._path(key), html)
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % PRUNE_EVERY == 0
+        if prune:
+            self._prune()
+
+    def _files(self):
+        with os.scandir(self.directory) as entries:
+            return [entry for entry in entries
+                    if entry.is_file() and entry.name.endswith('.html')]
+
+    def _prune(self):
+        """En eski parçaları max_entries'e inene kadar sil"""
+        files = self._files()
+        if len(files) <= self.max_entries:
+            return
+        files.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in files[:len(files) - self.max_entries]:
+            try:
+                os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        for entry in self._files():
+            try:
+                os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def size(self):
+        return len(self._files())
+
+
+class FragmentCache:
+    def __init__(self, backend=None):
+        self.backend = backend
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def bump(self, tables):
+        if self.backend is not None:
+            self.backend.bump(tables)
+
+    def _count(self, name, field):
+        with self._lock:
+            stats = self._stats.setdefault(name, {'hits': 0, 'misses': 0})
+            stats[field] += 1
+
+    def render(self, name, template, load, **key):
+        """Parçayı önbellekten veya load() sonucuyla template'ten üret
+
+        key parçanın veriden başka neye bağlı olduğunu belirtir (ör. yıl).
+        """
+        if self.backend is None:
+            return Markup(render_template(template, **load()))
+        tables = FRAGMENTS[name]
+        versions = self.backend.versions(tables)
+        cache_key = (name, current_user.role, versions, tuple(sorted(key.items())))
+        html = self.backend.get(cache_key)
+        if html is not None:
+            self._count(name, 'hits')
+            return Markup(html)
+
+        self._count(name, 'misses')
+        html = render_template(template, **load())
+        # Render sırasında veri değiştiyse eski sürümle saklanmaz
+        if self.backend.versions(tables) == versions:
+            self.backend.set(cache_key, html)
+        return Markup(html)
+
+    def stats(self):
+        with self._lock:
+            per_fragment = {name: dict(stats) for name, stats in self._stats.items()}
+        hits = sum(s['hits'] for s in per_fragment.values())
+        misses = sum(s['misses'] for s in per_fragment.values())
+        return {
+            'backend': type(self.backend).__name__ if self.backend else None,
+            'size': self.backend.size() if self.backend else 0,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            'fragments': per_fragment,
+        }
+
+
+fragment_cache = FragmentCache()
+watch_tables({table for tables in FRAGMENTS.values() for table in tables},
+             fragment_cache.bump)
+
+
+def init_fragment_cache(app):
+    """Arka ucu uygulama yapılandırmasından seç"""
+    config = app.config
+    config.setdefault('FRAGMENT_CACHE', 'memory')
+    config.setdefault('FRAGMENT_CACHE_SIZE', DEFAULT_MAX_ENTRIES)
+    if not config.get('FRAGMENT_CACHE_DIR'):
+        config['FRAGMENT_CACHE_DIR'] = os.path.join(app.instance_path, 'fragments')
+
+    kind = config['FRAGMENT_CACHE']
+    if kind == 'memory':
+        fragment_cache.backend = MemoryBackend(config['FRAGMENT_CACHE_SIZE'])
+    elif kind == 'file':
+        fragment_cache.backend = FileBackend(config['FRAGMENT_CACHE_DIR'],
+                                             config['FRAGMENT_CACHE_SIZE'])
+        # Uygulama kapalıyken yapılan değişiklikler eski parça bırakmasın
+        fragment_cache.bump(set().union(*FRAGMENTS.values()))
+    elif kind == 'none':
+        fragment_cache.backend = None
+    else:
+        raise ValueError(f'Geçersiz FRAGMENT_CACHE: {kind} (memory, file, none)')
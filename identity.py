@@ -0,0 +1,125 @@
+"""Oturum kimliği önbelleği
+
+Flask-Login her istekte `load_user` ile kullanıcıyı yükler. Kullanıcının
+yetki kontrolleri için gereken alanları (rol, bağlı personel, aktiflik)
+taşıyan hafif Identity nesneleri süreç içinde TTL ve boyut sınırlı bir
+LRU önbellekte tutulur; kararlı durumda kimlik için veritabanına gidilmez.
+Kullanıcı güncellendiğinde, silindiğinde veya pasifleştirildiğinde kayıt
+flush anında düşürülür. TTL, çok süreçli dağıtımlarda diğer süreçlerdeki
+değişikliklerin en geç ne kadar sonra görüleceğini belirler.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db, RoleMixin, User
+
+DEFAULT_TTL = 300
+DEFAULT_MAX_SIZE = 1024
+
+
+class Identity(UserMixin, RoleMixin):
+    """current_user için ORM'den bağımsız, salt okunur kullanıcı görüntüsü"""
+
+    def __init__(self, id, username, email, role, person_id, active):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.role = role
+        self.person_id = person_id
+        self.active = active
+
+    @property
+    def is_active(self):
+        return self.active
+
+
+class IdentityCache:
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, ttl=DEFAULT_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id):
+        """Kullanıcı kimliği; kullanıcı yoksa None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        row = db.session.query(
+            User.id, User.username, User.email, User.role, User.person_id,
+            User.is_active
+        ).filter(User.id == user_id).first()
+        if row is None:
+            return None
+        identity = Identity(*row)
+        with self._lock:
+            self._entries[user_id] = (identity, now + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return identity
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+identity_cache = IdentityCache()
+
+
+def init_identity_cache(app):
+    """Önbellek ayarlarını uygulama yapılandırmasından al"""
+    app.config.setdefault('IDENTITY_CACHE_TTL', DEFAULT_TTL)
+    app.config.setdefault('IDENTITY_CACHE_SIZE', DEFAULT_MAX_SIZE)
+    identity_cache.ttl = app.config['IDENTITY_CACHE_TTL']
+    identity_cache.max_size = app.config['IDENTITY_CACHE_SIZE']
+    identity_cache.invalidate()
+
+
+# Kullanıcı güncellendiğinde/silindiğinde kaydı düşür; transaction
+# sonunda bir kez daha düşürülür ki arada eski satırı okuyan eşzamanlı
+# istekler önbelleğe eski kimliği bırakmasın
+@event.listens_for(Session, 'after_flush')
+def _users_flushed(session, flush_context):
+    for obj in (*session.dirty, *session.deleted):
+        if isinstance(obj, User):
+            session.info.setdefault('users_changed', set()).add(obj.id)
+            identity_cache.invalidate(obj.id)
+
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+def _users_transaction_end(session):
+    for user_id in session.info.pop('users_changed', ()):
+        identity_cache.invalidate(user_id)
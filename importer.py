@@ -0,0 +1,378 @@
+"""Toplu veri aktarımı (İK sistemi dökümleri)
+
+CSV veya JSON (dizi ya da satır başına bir nesne) kayıtları tek geçişte
+okunur, her satır doğrulanır ve geçerli satırlar batch_size'lık gruplar
+halinde executemany ile yazılır. Personel e-posta, tatil tarih, takım
+ise ad üzerinden güncellenir (upsert). Hatalı satırlar atlanır ve
+satır numarası ile rapora eklenir.
+
+Beklenen alanlar:
+    teams:          name, max_concurrent_leaves
+    persons:        name, email, role, team (ad) veya team_id, hire_date, is_active
+    holidays:       date, name, is_public, country
+    leave_requests: email, leave_type, start_date, end_date, reason, status
+"""
+import csv
+import json
+from datetime import date, datetime
+
+from models import db, Holiday, LeaveRequest, Person, Team
+from availability import availability_cache
+from capacity import capacity_index
+from work_calendar import work_calendar
+
+DEFAULT_BATCH_SIZE = 5000
+# Raporda ayrıntısı tutulan en fazla hatalı satır sayısı
+MAX_REPORTED_ERRORS = 1000
+
+TRUE_VALUES = {'1', 'true', 'evet', 'yes', 'e', 'y'}
+FALSE_VALUES = {'0', 'false', 'hayir', 'hayır', 'no', 'h', 'n'}
+LEAVE_STATUSES = {'pending', 'approved', 'rejected'}
+
+
+class ImportReport:
+    def __init__(self, kind):
+        self.kind = kind
+        self.total = 0
+        self.imported = 0
+        self.rejected = 0
+        self.errors = []
+
+    def reject(self, line, errors):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'errors': errors})
+
+    def to_dict(self):
+        return {
+            'kind': self.kind,
+            'total': self.total,
+            'imported': self.imported,
+            'rejected': self.rejected,
+            'errors': self.errors,
+        }
+
+
+def read_records(stream, fmt='csv'):
+    """Metin akışından (satır_no, kayıt) çiftleri üret"""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    if fmt != 'json':
+        raise ValueError(f'Desteklenmeyen format: {fmt}')
+
+    first = stream.read(1)
+    while first and first.isspace():
+        first = stream.read(1)
+    if not first:
+        return
+    if first == '[':
+        # JSON dizisi bütün olarak çözülür; büyük dosyalar için satır
+        # başına bir nesne (JSON Lines) tercih edilmeli
+        for index, record in enumerate(json.loads(first + stream.read()), 1):
+            yield index, record
+        return
+    for line_no, line in enumerate(_prepend(first, stream), 1):
+        if line.strip():
+            try:
+                yield line_no, json.loads(line)
+            except ValueError:
+                yield line_no, None
+
+
+def _prepend(first, stream):
+    lines = iter(stream)
+    yield first + next(lines, '')
+    yield from lines
+
+
+def _text(record, field, errors, required=False, max_length=None):
+    value = record.get(field)
+    value = str(value).strip() if value not in (None, '') else None
+    if required and not value:
+        errors.append(f'{field} zorunlu')
+    elif value and max_length and len(value) > max_length:
+        errors.append(f'{field} en fazla {max_length} karakter olabilir')
+    return value
+
+
+def _date(record, field, errors, required=False):
+    value = record.get(field)
+    if value in (None, ''):
+        if required:
+            errors.append(f'{field} zorunlu')
+        return None
+    if isinstance(value, date):
+        return value
+    try:
+        # strptime'a göre çok daha hızlı; satır başına iki tarih çözülüyor
+        return date.fromisoformat(str(value).strip())
+    except ValueError:
+        errors.append(f'{field} YYYY-MM-DD formatında olmalı')
+        return None
+
+
+def _int(record, field, errors, default=None):
+    value = record.get(field)
+    if value in (None, ''):
+        return default
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        errors.append(f'{field} sayı olmalı')
+        return default
+
+
+def _bool(record, field, errors, default):
+    value = record.get(field)
+    if value in (None, ''):
+        return default
+    if isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    errors.append(f'{field} evet/hayır olmalı')
+    return default
+
+
+def _upsert(model, rows, key, update_columns):
+    """Anahtar sütununda çakışan satırları güncelleyen toplu INSERT"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        raise RuntimeError(f'{dialect} için upsert desteklenmiyor')
+    stmt = insert(model.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[key],
+        set_={column: stmt.excluded[column] for column in update_columns})
+    db.session.execute(stmt, rows)
+
+
+class _Importer:
+    kind = None
+    # Aynı batch içinde tekrarlanan anahtarlarda son satır geçerlidir
+    key = None
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.report = ImportReport(self.kind)
+
+    def run(self, records):
+        batch = {}
+        for line, record in records:
+            self.report.total += 1
+            if not isinstance(record, dict):
+                self.report.reject(line, ['Geçersiz kayıt'])
+                continue
+            errors = []
+            values = self.validate(record, errors)
+            if errors:
+                self.report.reject(line, errors)
+                continue
+            batch[values[self.key] if self.key else line] = values
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = {}
+        if batch:
+            self._flush(batch)
+        self.finish()
+        db.session.commit()
+        # Commit'ten önce düşürülen önbelleği eşzamanlı bir istek henüz
+        # commit edilmemiş eski veriyle yeniden doldurabilir
+        self.invalidate()
+        return self.report
+
+    def _flush(self, batch):
+        self.write(list(batch.values()))
+        # Batch içinde tekrarlanan anahtar tek satır olarak yazılır
+        self.report.imported += len(batch)
+
+    def validate(self, record, errors):
+        raise NotImplementedError
+
+    def write(self, rows):
+        raise NotImplementedError
+
+    def finish(self):
+        """Commit öncesi son yazmalar"""
+
+    def invalidate(self):
+        # Core INSERT/UPDATE ORM olaylarını tetiklemez; takım doluluk
+        # tabloları elle temizlenir
+        capacity_index.invalidate()
+        availability_cache.invalidate()
+
+
+class _TeamResolver:
+    """Takım adı -> id eşlemesi; bilinmeyen takımlar oluşturulur"""
+
+    def __init__(self):
+        self.ids = dict(db.session.query(Team.name, Team.id))
+
+    def resolve(self, name):
+        if name not in self.ids:
+            result = db.session.execute(db.insert(Team).values(
+                name=name, max_concurrent_leaves=1,
+                created_at=datetime.now()))
+            self.ids[name] = result.inserted_primary_key[0]
+        return self.ids[name]
+
+
+class TeamImporter(_Importer):
+    kind = 'teams'
+    key = 'name'
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE):
+        super().__init__(batch_size)
+        # Team.name benzersiz tanımlı değil; ad eşlemesi bellekte tutulur
+        self.ids = dict(db.session.query(Team.name, Team.id))
+
+    def validate(self, record, errors):
+        return {
+            'name': _text(record, 'name', errors, required=True, max_length=100),
+            'max_concurrent_leaves': _int(record, 'max_concurrent_leaves',
+                                          errors, default=1),
+        }
+
+    def write(self, rows):
+        updates = [{'id': self.ids[r['name']], **r} for r in rows
+                   if r['name'] in self.ids]
+        inserts = [{**r, 'created_at': datetime.now()} for r in rows
+                   if r['name'] not in self.ids]
+        if updates:
+            db.session.execute(db.update(Team), updates)
+        if inserts:
+            db.session.execute(db.insert(Team), inserts)
+            self.ids.update(db.session.query(Team.name, Team.id).filter(
+                Team.name.in_([r['name'] for r in inserts])))
+
+
+class PersonImporter(_Importer):
+    kind = 'persons'
+    key = 'email'
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE):
+        super().__init__(batch_size)
+        self.teams = _TeamResolver()
+
+    def validate(self, record, errors):
+        values = {
+            'name': _text(record, 'name', errors, required=True, max_length=100),
+            'email': _text(record, 'email', errors, required=True, max_length=120),
+            'role': _text(record, 'role', errors, required=True, max_length=50),
+            'hire_date': _date(record, 'hire_date', errors) or date.today(),
+            'is_active': _bool(record, 'is_active', errors, default=True),
+            'team_id': _int(record, 'team_id', errors),
+            'created_at': datetime.now(),
+        }
+        if values['email']:
+            values['email'] = values['email'].lower()
+            if '@' not in values['email']:
+                errors.append('email geçersiz')
+        team = _text(record, 'team', errors, max_length=100)
+        if team and not errors:
+            values['team_id'] = self.teams.resolve(team)
+        return values
+
+    def write(self, rows):
+        _upsert(Person, rows, 'email',
+                ['name', 'role', 'team_id', 'hire_date', 'is_active'])
+
+
+class HolidayImporter(_Importer):
+    kind = 'holidays'
+    key = 'date'
+
+    def validate(self, record, errors):
+        return {
+            'date': _date(record, 'date', errors, required=True),
+            'name': _text(record, 'name', errors, required=True, max_length=100),
+            'is_public': _bool(record, 'is_public', errors, default=True),
+            'country': _text(record, 'country', errors, max_length=10) or 'TR',
+            'created_at': datetime.now(),
+        }
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE):
+        super().__init__(batch_size)
+        self.dates = set()
+
+    def write(self, rows):
+        _upsert(Holiday, rows, 'date', ['name', 'is_public', 'country'])
+        self.dates.update(row['date'] for row in rows)
+
+    def finish(self):
+        if self.dates:
+            # Bakiyeler yeni takvimle hesaplanmalı; Core upsert Holiday
+            # flush olaylarını tetiklemediğinden takvim burada da düşürülür
+            from balances import resync_balances
+            work_calendar.invalidate()
+            resync_balances(self.dates)
+
+    def invalidate(self):
+        super().invalidate()
+        # Ay ızgaraları takvimden üretildiği için ikisi birlikte düşürülür
+        work_calendar.invalidate()
+
+
+class LeaveRequestImporter(_Importer):
+    kind = 'leave_requests'
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE):
+        super().__init__(batch_size)
+        self.person_ids = dict(db.session.query(Person.email, Person.id))
+
+    def validate(self, record, errors):
+        email = (_text(record, 'email', errors, required=True) or '').lower()
+        values = {
+            'person_id': self.person_ids.get(email),
+            'leave_type': _text(record, 'leave_type', errors, max_length=20) or 'annual',
+            'start_date': _date(record, 'start_date', errors, required=True),
+            'end_date': _date(record, 'end_date', errors, required=True),
+            'reason': _text(record, 'reason', errors),
+            # Geçmiş izin dökümleri varsayılan olarak onaylı kabul edilir
+            'status': _text(record, 'status', errors) or 'approved',
+            'created_at': datetime.now(),
+        }
+        if email and values['person_id'] is None:
+            errors.append(f'{email} adresli personel bulunamadı')
+        if values['status'] not in LEAVE_STATUSES:
+            errors.append('status pending/approved/rejected olmalı')
+        if (values['start_date'] and values['end_date']
+                and values['start_date'] > values['end_date']):
+            errors.append('start_date end_date sonrasında olamaz')
+        return values
+
+    def write(self, rows):
+        db.session.execute(db.insert(LeaveRequest), rows)
+
+    def finish(self):
+        if self.report.imported:
+            # Bakiyeler tek toplu geçişle yeniden hesaplanır
+            from balances import rebuild_balances
+            rebuild_balances()
+
+
+IMPORTERS = {
+    importer.kind: importer
+    for importer in (TeamImporter, PersonImporter, HolidayImporter,
+                     LeaveRequestImporter)
+}
+
+
+def import_stream(kind, stream, fmt='csv', batch_size=DEFAULT_BATCH_SIZE):
+    """Metin akışını içe aktar ve ImportReport döndür"""
+    if kind not in IMPORTERS:
+        raise ValueError(f'Bilinmeyen veri türü: {kind}')
+    try:
+        return IMPORTERS[kind](batch_size).run(read_records(stream, fmt))
+    except Exception:
+        db.session.rollback()
+        raise
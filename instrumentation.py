@@ -0,0 +1,116 @@
+"""İstek başına SQL sorgu sayısı ve süresi
+
+SQLAlchemy engine olaylarıyla her sorgu sayılır ve süresi ölçülür.
+Değerler yanıt gövdesi tamamen üretildikten sonra loglanır; akışlı
+yanıtlarda gövdenin sorguları after_request'ten sonra çalıştığından bu an
+yanıtın kapatılmasıdır. SQL_DEBUG_HEADERS açıksa (varsayılan: debug modu)
+yanıta X-SQL-Queries / X-SQL-Time başlıkları eklenir; başlıklar gövdeden
+önce gönderildiği için bu modda akışlı gövdeler (SSE hariç) tamponlanır.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryStats:
+    __slots__ = ('count', 'duration')
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def record(self, duration):
+        self.count += 1
+        self.duration += duration
+
+
+# İstek dışı ölçümler (CLI, benchmark) için iş parçacığına özel sayaçlar
+_local = threading.local()
+
+
+def _active_stats():
+    stats = list(getattr(_local, 'stack', ()))
+    if has_request_context() and 'sql_stats' in g:
+        stats.append(g.sql_stats)
+    return stats
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    duration = time.perf_counter() - conn.info['query_start'].pop()
+    for stats in _active_stats():
+        stats.record(duration)
+
+
+@contextmanager
+def count_queries():
+    """Blok içindeki sorguları say
+
+        with count_queries() as stats:
+            client.get('/api/persons')
+        assert stats.count <= 2
+    """
+    stats = QueryStats()
+    stack = _local.__dict__.setdefault('stack', [])
+    stack.append(stats)
+    try:
+        yield stats
+    finally:
+        stack.remove(stats)
+
+
+def after_response(response, callback):
+    """callback'i yanıt gövdesi tamamen üretildikten sonra çağır
+
+    Akışlı yanıtlarda WSGI sunucusu yanıtı kapattığında çağrılır; istek
+    bağlamı o sırada kapanmış olabileceğinden callback g'ye erişmemelidir.
+    """
+    if response.is_streamed:
+        response.call_on_close(callback)
+    else:
+        callback()
+
+
+def init_query_stats(app):
+    """Engine olaylarını ve istek kancalarını kaydet"""
+    if not event.contains(Engine, 'before_cursor_execute',
+                          _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    app.config.setdefault('SQL_DEBUG_HEADERS', app.debug)
+
+    @app.before_request
+    def _start_query_stats():
+        g.sql_stats = QueryStats()
+
+    @app.after_request
+    def _finish_query_stats(response):
+        stats = g.get('sql_stats')
+        if stats is None:
+            return response
+        if app.config['SQL_DEBUG_HEADERS']:
+            if response.is_streamed and response.mimetype != 'text/event-stream':
+                # Sayının gövdenin sorgularını da içermesi için
+                response.make_sequence()
+            if not response.is_streamed:
+                response.headers['X-SQL-Queries'] = str(stats.count)
+                response.headers['X-SQL-Time'] = f'{stats.duration * 1000:.2f}'
+
+        method, path, status = request.method, request.path, response.status_code
+
+        def log():
+            app.logger.debug('%s %s -> %s: %d sorgu, %.2f ms', method, path,
+                             status, stats.count, stats.duration * 1000)
+
+        after_response(response, log)
+        return response
@@ -0,0 +1,320 @@
+"""İstek, SQL ve şablon metrikleri
+
+Her istek için uç nokta (Flask endpoint adı), yöntem ve durum koduna göre
+süre histogramı; istek başına SQL sorgu sayısı ve süresi (instrumentation
+modülünün engine olaylarından) ve şablon render süresi tutulur. Değerler
+/metrics adresinde Prometheus metin biçiminde yayınlanır. Akışlı
+yanıtların sorguları gövde üretilirken çalıştığından istek metrikleri
+yanıt tamamen gönderildikten sonra kaydedilir; istek süresi de gövdenin
+gönderimini kapsar.
+
+PROFILE_REQUESTS açıksa her istek cProfile ile profillenir; süresi
+PROFILE_MIN_MS'i aşan isteklerin .prof dosyası PROFILE_DIR altına yazılır
+(`python -m pstats <dosya>` veya snakeviz ile incelenebilir). Profilleme
+isteği belirgin biçimde yavaşlatır; yalnızca sorun ararken açılmalıdır.
+METRICS_TOKEN verilirse /metrics için `Authorization: Bearer <token>`
+gerekir; verilmezse yalnızca yerel adreslerden (127.0.0.1, ::1) gelen
+isteklere yanıt verilir.
+
+Seriler süreç içindedir; çok işçili sunucu (server.py) fork'tan önce
+registry.share() ile paylaşımlı belleğe geçer ve /metrics tüm işçilerin
+toplamını verir.
+"""
+import cProfile
+import hmac
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from datetime import datetime
+
+from flask import Response, g, request, template_rendered, before_render_template
+
+from instrumentation import after_response
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+# Paylaşımlı bellekte metrik başına en fazla seri (etiket birleşimi)
+DEFAULT_SHARED_SERIES = 2048
+# METRICS_TOKEN yokken /metrics'e erişebilen adresler
+LOCAL_ADDRESSES = {'127.0.0.1', '::1'}
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+class _LocalSeries:
+    """Süreç içi seri tablosu: etiketler -> değer dizisi"""
+
+    def __init__(self, width):
+        self.width = width
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def add(self, labels, updates):
+        """updates: [(değer sırası, artış)]"""
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * self.width
+            for index, amount in updates:
+                series[index] += amount
+
+    def snapshot(self):
+        with self._lock:
+            return {labels: list(series) for labels, series in self._series.items()}
+
+
+class _SharedSeries:
+    """Paylaşımlı bellekte seri tablosu; fork edilen işçiler aynı değerleri artırır
+
+    Seriler sırayla yuvalara yerleşir ve yerinden oynamaz; etiketler
+    JSON olarak yuvanın yanında saklanır. Süreç, gördüğü etiketlerin
+    yuvasını kendi belleğinde tutar. Yuvalar dolunca yeni seriler
+    kaydedilmez.
+    """
+
+    LABEL_BYTES = 256
+
+    def __init__(self, width, capacity, lock):
+        self.width = width
+        self.capacity = capacity
+        self._values = multiprocessing.RawArray('d', capacity * width)
+        self._labels = multiprocessing.RawArray('c', capacity * self.LABEL_BYTES)
+        self._used = multiprocessing.RawValue('i', 0)
+        self._lock = lock
+        self._slots = {}
+
+    def _label(self, slot):
+        start = slot * self.LABEL_BYTES
+        return self._labels[start:start + self.LABEL_BYTES].rstrip(b'\0')
+
+    def _slot(self, labels):
+        encoded = json.dumps(labels).encode()
+        if len(encoded) > self.LABEL_BYTES:
+            return None
+        # Başka bir işçinin eklediği seri aranır
+        for slot in range(self._used.value):
+            if self._label(slot) == encoded:
+                return slot
+        if self._used.value == self.capacity:
+            logger.warning('Metrik yuvaları dolu; %s kaydedilmedi', labels)
+            return None
+        slot = self._used.value
+        start = slot * self.LABEL_BYTES
+        self._labels[start:start + len(encoded)] = encoded
+        self._used.value += 1
+        return slot
+
+    def add(self, labels, updates):
+        with self._lock:
+            if labels in self._slots:
+                slot = self._slots[labels]
+            else:
+                slot = self._slots[labels] = self._slot(labels)
+            if slot is None:
+                return
+            for index, amount in updates:
+                self._values[slot * self.width + index] += amount
+
+    def snapshot(self):
+        with self._lock:
+            return {tuple(json.loads(self._label(slot))):
+                    self._values[slot * self.width:(slot + 1) * self.width]
+                    for slot in range(self._used.value)}
+
+
+class Counter:
+    kind = 'counter'
+    width = 1
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.store = _LocalSeries(self.width)
+
+    def inc(self, *labels, amount=1):
+        self.store.add(labels, [(0, amount)])
+
+    def samples(self):
+        for labels, series in sorted(self.store.snapshot().items()):
+            yield self.name, _format_labels(self.labels, labels), series[0]
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # [kova sayıları..., toplam, adet]
+        self.width = len(self.buckets) + 2
+        self.store = _LocalSeries(self.width)
+
+    def observe(self, value, *labels):
+        updates = [(self.width - 2, value), (self.width - 1, 1)]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                updates.append((i, 1))
+                break
+        self.store.add(labels, updates)
+
+    def samples(self):
+        for labels, series in sorted(self.store.snapshot().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield (f'{self.name}_bucket',
+                       _format_labels(self.labels + ('le',), labels + (bound,)),
+                       cumulative)
+            yield (f'{self.name}_bucket',
+                   _format_labels(self.labels + ('le',), labels + ('+Inf',)),
+                   series[-1])
+            yield f'{self.name}_sum', _format_labels(self.labels, labels), series[-2]
+            yield f'{self.name}_count', _format_labels(self.labels, labels), series[-1]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def share(self, capacity=DEFAULT_SHARED_SERIES):
+        """Serileri paylaşımlı belleğe taşı (fork'tan önce çağrılır)
+
+        Çok işçili sunucuda /metrics hangi işçiye düşerse düşsün tüm
+        işçilerin toplamını döndürür; sayaçlar işçi değişince sıfırlanmaz.
+        """
+        lock = multiprocessing.Lock()
+        for metric in self._metrics:
+            metric.store = _SharedSeries(metric.width, capacity, lock)
+
+    def render(self):
+        """Prometheus metin biçimi (0.0.4)"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{labels} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+request_latency = registry.register(Histogram(
+    'http_request_duration_seconds', 'İstek süresi',
+    ('endpoint', 'method', 'status')))
+sql_queries = registry.register(Histogram(
+    'sql_queries_per_request', 'İstek başına SQL sorgu sayısı',
+    ('endpoint',), QUERY_COUNT_BUCKETS))
+sql_seconds = registry.register(Counter(
+    'sql_query_seconds_total', 'İsteklerde SQL sorgularında geçen toplam süre',
+    ('endpoint',)))
+template_latency = registry.register(Histogram(
+    'template_render_seconds', 'Şablon render süresi', ('template',)))
+
+
+def _endpoint():
+    return request.endpoint or '<eşleşmeyen>'
+
+
+def _before_render(sender, template, context, **extra):
+    g.setdefault('template_starts', []).append(time.perf_counter())
+
+
+def _rendered(sender, template, context, **extra):
+    starts = g.get('template_starts')
+    if starts:
+        template_latency.observe(time.perf_counter() - starts.pop(),
+                                 template.name or '<string>')
+
+
+def _dump_profile(app, profile, endpoint, elapsed_ms):
+    directory = app.config['PROFILE_DIR']
+    os.makedirs(directory, exist_ok=True)
+    name = (f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-"
+            f"{endpoint.replace('/', '_')}-{elapsed_ms:.0f}ms.prof")
+    profile.dump_stats(os.path.join(directory, name))
+
+
+def init_metrics(app):
+    """Ölçüm kancalarını ve /metrics uç noktasını kaydet"""
+    config = app.config
+    config.setdefault('METRICS_ENABLED', True)
+    config.setdefault('METRICS_TOKEN', None)
+    config.setdefault('PROFILE_REQUESTS', False)
+    config.setdefault('PROFILE_MIN_MS', 0)
+    if not config.get('PROFILE_DIR'):
+        config['PROFILE_DIR'] = os.path.join(app.instance_path, 'profiles')
+    if not config['METRICS_ENABLED']:
+        return
+
+    template_rendered.connect(_rendered, app)
+    before_render_template.connect(_before_render, app)
+
+    @app.before_request
+    def _start_metrics():
+        g.metrics_start = time.perf_counter()
+        if app.config['PROFILE_REQUESTS']:
+            g.profile = cProfile.Profile()
+            g.profile.enable()
+
+    @app.after_request
+    def _record_metrics(response):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return response
+        endpoint, method, status = _endpoint(), request.method, response.status_code
+        stats = g.get('sql_stats')
+        profile = g.pop('profile', None)
+
+        def record():
+            elapsed = time.perf_counter() - start
+            request_latency.observe(elapsed, endpoint, method, status)
+            if stats is not None:
+                sql_queries.observe(stats.count, endpoint)
+                sql_seconds.inc(endpoint, amount=stats.duration)
+            if profile is not None:
+                profile.disable()
+                if elapsed * 1000 >= app.config['PROFILE_MIN_MS']:
+                    _dump_profile(app, profile, endpoint, elapsed * 1000)
+
+        # Akışlı gövdenin sorguları after_request'ten sonra çalışır
+        after_response(response, record)
+        return response
+
+    @app.teardown_request
+    def _stop_profile(exc):
+        # after_request çalışmadan biten isteklerde profil kapatılır
+        profile = g.pop('profile', None)
+        if profile is not None:
+            profile.disable()
+
+    @app.route('/metrics')
+    def metrics():
+        token = app.config['METRICS_TOKEN']
+        if token:
+            if not hmac.compare_digest(request.headers.get('Authorization', ''),
+                                       f'Bearer {token}'):
+                return Response('Yetkiniz yok\n', 401, mimetype='text/plain')
+        elif request.remote_addr not in LOCAL_ADDRESSES:
+            return Response('Yetkiniz yok\n', 403, mimetype='text/plain')
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
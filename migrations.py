@@ -0,0 +1,183 @@
+"""Sürümlü şema geçişleri
+
+Uygulanan son sürüm `schema_version` tablosunda tutulur. `upgrade`
+eksik tabloları modellerden oluşturur, ardından sürümü veritabanındakinden
+büyük geçişleri sırayla ve her birini kendi transaction'ında çalıştırır.
+Boş veritabanı modellerden eksiksiz kurulduğu için doğrudan son sürüme
+işaretlenir. Geçişler sütun/indeks varlığını kontrol ettiğinden yarıda
+kalmış bir geçiş tekrar çalıştırılabilir.
+
+Flask uygulaması olmadan da çalışır (sunucu kapalıyken SQLite dosyası
+üzerinde):
+
+    python -m migrations upgrade --uri sqlite:///izin_takip.db
+    python -m migrations current
+"""
+import argparse
+import os
+from datetime import datetime
+
+from sqlalchemy import (Column, DateTime, Integer, MetaData, String, Table,
+                        create_engine, inspect, text)
+from sqlalchemy.engine import make_url
+
+from models import db
+
+# Sürüm tablosu uygulama modellerinden ayrı tutulur; create_all ile
+# oluşturulmaz
+_version_metadata = MetaData()
+schema_version = Table(
+    'schema_version', _version_metadata,
+    Column('version', Integer, primary_key=True),
+    Column('description', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+def _add_column(conn, table, name, type_):
+    columns = {c['name'] for c in inspect(conn).get_columns(table)}
+    if name not in columns:
+        ddl = type_.compile(dialect=conn.dialect)
+        conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {name} {ddl}'))
+
+
+def _create_index(conn, name, table, columns, unique=False):
+    kind = 'UNIQUE INDEX' if unique else 'INDEX'
+    conn.execute(text(f'CREATE {kind} IF NOT EXISTS {name} '
+                      f'ON {table} ({", ".join(columns)})'))
+
+
+def _001_listing_indexes(conn):
+    # Çakışma, listeleme ve tatil sorgularının indeksleri
+    _create_index(conn, 'ix_leave_request_person_status_dates', 'leave_request',
+                  ['person_id', 'status', 'start_date', 'end_date'])
+    _create_index(conn, 'ix_leave_request_created', 'leave_request',
+                  ['created_at', 'id'])
+    _create_index(conn, 'ix_leave_request_status_created', 'leave_request',
+                  ['status', 'created_at', 'id'])
+    _create_index(conn, 'ix_holiday_country_date', 'holiday',
+                  ['country', 'date'])
+
+
+def _002_missing_columns(conn):
+    _add_column(conn, 'team', 'manager', String(100))
+    _add_column(conn, 'leave_request', 'approved_by', String(80))
+    _add_column(conn, 'leave_request', 'approved_at', DateTime())
+
+
+def _003_balance_unique_and_indexes(conn):
+    # Aynı (personel, yıl) için birden fazla bakiye satırı varsa artımlı
+    # güncellemeler satırlara dağılmıştır; toplamlar en eski satırda
+    # birleştirilip diğerleri silinir
+    conn.execute(text('''
+        UPDATE leave_balance SET
+            used = (SELECT SUM(COALESCE(b.used, 0)) FROM leave_balance b
+                    WHERE b.person_id = leave_balance.person_id
+                      AND b.year = leave_balance.year),
+            pending = (SELECT SUM(COALESCE(b.pending, 0)) FROM leave_balance b
+                       WHERE b.person_id = leave_balance.person_id
+                         AND b.year = leave_balance.year)
+        WHERE id IN (SELECT MIN(id) FROM leave_balance
+                     GROUP BY person_id, year HAVING COUNT(*) > 1)
+    '''))
+    conn.execute(text('''
+        DELETE FROM leave_balance WHERE id NOT IN (
+            SELECT MIN(id) FROM leave_balance GROUP BY person_id, year)
+    '''))
+    _create_index(conn, 'uq_leave_balance_person_year', 'leave_balance',
+                  ['person_id', 'year'], unique=True)
+    _create_index(conn, 'ix_leave_request_dates', 'leave_request',
+                  ['start_date', 'end_date'])
+    _create_index(conn, 'ix_notification_person_read', 'notification',
+                  ['person_id', 'is_read'])
+
+
+def _004_backup_indexes(conn):
+    _create_index(conn, 'ix_person_team_active', 'person', ['team_id', 'is_active'])
+    _create_index(conn, 'ix_backup_assignment_person_request', 'backup_assignment',
+                  ['backup_person_id', 'leave_request_id'])
+    _create_index(conn, 'ix_backup_assignment_request', 'backup_assignment',
+                  ['leave_request_id'])
+
+
+# (sürüm, açıklama, geçiş); yeni geçişler sona eklenir
+MIGRATIONS = [
+    (1, 'İzin talebi ve tatil indeksleri', _001_listing_indexes),
+    (2, 'Team.manager, LeaveRequest.approved_by/approved_at', _002_missing_columns),
+    (3, 'Bakiye (person_id, year) tekilliği, tarih ve bildirim indeksleri',
+     _003_balance_unique_and_indexes),
+    (4, 'Takım üyeleri ve yedek görevlendirme indeksleri', _004_backup_indexes),
+]
+HEAD = MIGRATIONS[-1][0]
+
+
+def current_version(engine):
+    """Veritabanının şema sürümü; sürüm tablosu yoksa None"""
+    with engine.connect() as conn:
+        if not inspect(conn).has_table('schema_version'):
+            return None
+        return conn.execute(text('SELECT MAX(version) FROM schema_version')).scalar() or 0
+
+
+def _stamp(conn, version, description):
+    conn.execute(schema_version.insert().values(
+        version=version, description=description, applied_at=datetime.now()))
+
+
+def upgrade(engine, target=HEAD, log=print):
+    """Veritabanını target sürümüne getir; uygulanan sürümleri döndür"""
+    with engine.begin() as conn:
+        fresh = not inspect(conn).has_table('leave_request')
+        _version_metadata.create_all(conn)
+        db.metadata.create_all(conn)
+        version = conn.execute(
+            text('SELECT MAX(version) FROM schema_version')).scalar() or 0
+        if fresh and version == 0:
+            # Modellerden kurulan şema tüm geçişleri zaten içerir
+            _stamp(conn, HEAD, 'Yeni veritabanı')
+            log(f'Yeni veritabanı sürüm {HEAD} olarak işaretlendi')
+            return [HEAD]
+
+    applied = []
+    for number, description, migrate in MIGRATIONS:
+        if number <= version or number > target:
+            continue
+        with engine.begin() as conn:
+            migrate(conn)
+            _stamp(conn, number, description)
+        log(f'{number:03d} {description}')
+        applied.append(number)
+    return applied
+
+
+def _resolve_uri(uri):
+    """Göreli SQLite yolunu Flask-SQLAlchemy gibi instance/ altına çöz"""
+    url = make_url(uri)
+    if (url.get_backend_name() == 'sqlite' and url.database
+            and url.database != ':memory:' and not os.path.isabs(url.database)):
+        instance = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance')
+        os.makedirs(instance, exist_ok=True)
+        url = url.set(database=os.path.join(instance, url.database))
+    return url
+
+
+def main():
+    from config import database_uri
+
+    parser = argparse.ArgumentParser(description='Şema geçişleri')
+    parser.add_argument('command', choices=['upgrade', 'current'])
+    parser.add_argument('--uri', help='Veritabanı adresi (varsayılan: DATABASE_URL)')
+    parser.add_argument('--target', type=int, default=HEAD)
+    args = parser.parse_args()
+
+    engine = create_engine(_resolve_uri(args.uri or database_uri()))
+    if args.command == 'current':
+        version = current_version(engine)
+        print('sürüm tablosu yok' if version is None else f'sürüm {version} (son: {HEAD})')
+        return
+    if not upgrade(engine, args.target):
+        print(f'Şema güncel (sürüm {current_version(engine)})')
+
+
+if __name__ == '__main__':
+    main()
@@ -6,7 +6,35 @@ from flask_login import UserMixin
 db = SQLAlchemy()
 
 
-class User(UserMixin, db.Model):
+class RoleMixin:
+    """`role` alanına göre yetki kontrolleri
+
+    Hem User modeli hem de oturum kimliği önbelleğindeki hafif Identity
+    nesneleri tarafından kullanılır.
+    """
+    
+    def is_admin(self):
+        """Admin yetkisi kontrolü"""
+        return self.role == 'admin'
+    
+    def is_manager(self):
+        """Yönetici yetkisi kontrolü"""
+        return self.role in ['admin', 'yonetici']
+    
+    def can_manage_users(self):
+        """Kullanıcı yönetimi yetkisi"""
+        return self.role in ['admin', 'yonetici']
+    
+    def can_manage_leaves(self):
+        """İzin yönetimi yetkisi"""
+        return self.role in ['admin', 'yonetici']
+    
+    def can_access_admin(self):
+        """Admin paneli erişim yetkisi"""
+        return self.role in ['admin', 'yonetici']
+
+
+class User(UserMixin, RoleMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
@@ -22,38 +50,26 @@ class User(UserMixin, db.Model):
     person = db.relationship('Person', backref='user', lazy=True,
                            uselist=False)
     
+    # Hash yöntemi (auth.init_auth PASSWORD_HASH_METHOD ile ayarlar);
+    # None ise Werkzeug varsayılanı
+    password_method = None
+    
     def set_password(self, password):
         """Şifreyi hashleyerek kaydet"""
-        self.password_hash = generate_password_hash(password)
+        if self.password_method:
+            self.password_hash = generate_password_hash(password, method=self.password_method)
+        else:
+            self.password_hash = generate_password_hash(password)
     
     def check_password(self, password):
         """Şifreyi kontrol et"""
         return check_password_hash(self.password_hash, password)
-    
-    def is_admin(self):
-        """Admin yetkisi kontrolü"""
-        return self.role == 'admin'
-    
-    def is_manager(self):
-        """Yönetici yetkisi kontrolü"""
-        return self.role in ['admin', 'yonetici']
-    
-    def can_manage_users(self):
-        """Kullanıcı yönetimi yetkisi"""
-        return self.role in ['admin', 'yonetici']
-    
-    def can_manage_leaves(self):
-        """İzin yönetimi yetkisi"""
-        return self.role in ['admin', 'yonetici']
-    
-    def can_access_admin(self):
-        """Admin paneli erişim yetkisi"""
-        return self.role in ['admin', 'yonetici']
 
 
 class Team(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
+    manager = db.Column(db.String(100))
     max_concurrent_leaves = db.Column(db.Integer, default=1)
     created_at = db.Column(db.DateTime, default=datetime.now)
     
@@ -62,6 +78,11 @@ class Team(db.Model):
 
 
 class Person(db.Model):
+    __table_args__ = (
+        # Takım üyeleri (kapasite, müsaitlik, yedek önerileri)
+        db.Index('ix_person_team_active', 'team_id', 'is_active'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
@@ -72,9 +93,14 @@ class Person(db.Model):
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.now)
     
-    def annual_leave_entitlement(self):
-        """Çalışma yılına göre yıllık izin hakkını hesapla"""
-        years_of_service = (date.today() - self.hire_date).days // 365
+    def annual_leave_entitlement(self, as_of=None):
+        """Çalışma yılına göre yıllık izin hakkını hesapla
+
+        as_of verilmezse bugünün tarihi kullanılır; raporlar belirli bir
+        yılın hakkını hesaplamak için o yılın tarihini geçmelidir.
+        """
+        as_of = as_of or date.today()
+        years_of_service = (as_of - self.hire_date).days // 365
         if years_of_service < 1:
             return 14
         elif years_of_service < 5:
@@ -84,6 +110,18 @@ class Person(db.Model):
 
 
 class LeaveRequest(db.Model):
+    __table_args__ = (
+        # Çakışma sorguları: person_id + status eşitliği, tarih aralığı
+        db.Index('ix_leave_request_person_status_dates',
+                 'person_id', 'status', 'start_date', 'end_date'),
+        # Listeleme: created_at + id keyset sayfalama, durum filtresiyle
+        db.Index('ix_leave_request_created', 'created_at', 'id'),
+        db.Index('ix_leave_request_status_created',
+                 'status', 'created_at', 'id'),
+        # Kişiden bağımsız tarih aralığı filtreleri (liste, dışa aktarım)
+        db.Index('ix_leave_request_dates', 'start_date', 'end_date'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     person_id = db.Column(db.Integer, db.ForeignKey('person.id'),
                          nullable=False)
@@ -92,6 +130,8 @@ class LeaveRequest(db.Model):
     end_date = db.Column(db.Date, nullable=False)
     reason = db.Column(db.Text)
     status = db.Column(db.String(20), default='pending')
+    approved_by = db.Column(db.String(80))
+    approved_at = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.now)
     
     # İlişkiler
@@ -100,6 +140,12 @@ class LeaveRequest(db.Model):
 
 
 class LeaveBalance(db.Model):
+    __table_args__ = (
+        # Kişi başına yılda tek bakiye satırı
+        db.Index('uq_leave_balance_person_year', 'person_id', 'year',
+                 unique=True),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     person_id = db.Column(db.Integer, db.ForeignKey('person.id'),
                          nullable=False)
@@ -120,6 +166,10 @@ class LeaveBalance(db.Model):
 
 
 class Holiday(db.Model):
+    __table_args__ = (
+        db.Index('ix_holiday_country_date', 'country', 'date'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     date = db.Column(db.Date, nullable=False, unique=True)
     name = db.Column(db.String(100), nullable=False)
@@ -129,6 +179,10 @@ class Holiday(db.Model):
 
 
 class Notification(db.Model):
+    __table_args__ = (
+        db.Index('ix_notification_person_read', 'person_id', 'is_read'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     person_id = db.Column(db.Integer, db.ForeignKey('person.id'),
                          nullable=False)
@@ -142,6 +196,13 @@ class Notification(db.Model):
 
 
 class BackupAssignment(db.Model):
+    __table_args__ = (
+        # Yedek önerileri: kişinin yedeklikleri ve talebin yedekleri
+        db.Index('ix_backup_assignment_person_request',
+                 'backup_person_id', 'leave_request_id'),
+        db.Index('ix_backup_assignment_request', 'leave_request_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     leave_request_id = db.Column(db.Integer,
                                 db.ForeignKey('leave_request.id'),
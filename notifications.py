@@ -0,0 +1,408 @@
+"""Arka planda bildirim gönderimi
+
+İzin onay/red kancaları bildirim işini yalnızca kuyruğa bırakır; istek
+iş parçacığı veritabanına veya e-posta sunucusuna gitmez. Arka plan
+işçisi kuyruktan batch_size'a kadar işi birlikte alır, alıcıları
+(personel ve BackupAssignment yedekleri) tek sorguda çözer, Notification
+satırlarını toplu INSERT ile yazar ve e-postaları tek SMTP bağlantısı
+üzerinden gönderir. Başarısız yazma/gönderimler artan beklemeyle yeniden
+denenir.
+
+Okunmamış bildirim sayıları bellekte (UnreadCounter) tutulur; ilk
+kullanımda Notification.is_read üzerinden tek sorguyla kurulur, sonra
+yazma ve okundu işaretleme sonrasında artımlı güncellenir. Bekleyen
+istemciler (uzun yoklama/SSE) yalnızca kendi sayıları değiştiğinde
+uyandırılır ve veritabanına gitmez.
+
+Bekleyen her istek (uzun yoklama süresince, SSE bağlantı boyunca) bir
+sunucu iş parçacığını tutar. Bu yüzden tarayıcı SSE yerine kısa beklemeli
+yoklama kullanır: NOTIFICATION_POLL_WAIT sn bekler, değişiklik yoksa
+NOTIFICATION_POLL_INTERVAL sn sonra yeniden sorar; gizli sekmeler
+sormaz. Sayılar işçi süreç başınadır; başka bir işçide yazılan bildirim
+bir sonraki yoklamada görülür.
+
+Kuyruk sınırlıdır (geri basınç): dolu kuyruğa ekleme kısa süre bekler,
+yine yer açılmazsa iş çağıranın iş parçacığında işlenir.
+
+Taşıyıcılar (NOTIFICATION_TRANSPORT): `log` (varsayılan, e-postaları
+loglar), `memory` (geliştirme/deneme için bellekte tutar), `smtp`.
+Yerel bir SMTP sunucusu yerine geçici olarak:
+
+    python -m smtpd -n -c DebuggingServer localhost:1025
+"""
+import atexit
+import json
+import logging
+import queue
+import smtplib
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from email.message import EmailMessage
+
+from sqlalchemy import func
+
+from models import db, BackupAssignment, Notification, Person
+
+logger = logging.getLogger(__name__)
+
+# Kapanışta kuyruğun boşalması için beklenecek en uzun süre (sn)
+SHUTDOWN_TIMEOUT = 5
+
+# Uzun yoklamada en uzun bekleme; SSE'de boş satır (ping) aralığı ve
+# bağlantının kapatılıp tarayıcının yeniden bağlanacağı süre (sn)
+LONG_POLL_MAX = 30
+# Tarayıcının yoklamada sunucuda beklediği süre ve yoklama aralığı (sn)
+DEFAULT_POLL_WAIT = 2
+DEFAULT_POLL_INTERVAL = 20
+SSE_HEARTBEAT = 25
+SSE_MAX_DURATION = 300
+
+STATUS_MESSAGES = {
+    'approved': 'İzin talebiniz onaylandı',
+    'rejected': 'İzin talebiniz reddedildi',
+}
+
+
+class LogTransport:
+    """E-postaları göndermek yerine loglar"""
+
+    def send_many(self, messages):
+        for message in messages:
+            logger.info('E-posta: %s -> %s', message['Subject'], message['To'])
+
+
+class MemoryTransport:
+    """Gönderilen e-postaları bellekte biriktirir"""
+
+    def __init__(self):
+        self.outbox = []
+
+    def send_many(self, messages):
+        self.outbox.extend(messages)
+
+
+class SMTPTransport:
+    def __init__(self, host='localhost', port=1025, username=None,
+                 password=None, use_tls=False, timeout=10):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+
+    def send_many(self, messages):
+        # Batch başına tek bağlantı
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.use_tls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+            for message in messages:
+                smtp.send_message(message)
+
+
+def make_transport(config):
+    kind = config.get('NOTIFICATION_TRANSPORT', 'log')
+    if kind == 'smtp':
+        return SMTPTransport(config.get('SMTP_HOST', 'localhost'),
+                             config.get('SMTP_PORT', 1025),
+                             config.get('SMTP_USERNAME'),
+                             config.get('SMTP_PASSWORD'),
+                             config.get('SMTP_USE_TLS', False))
+    if kind == 'memory':
+        return MemoryTransport()
+    if kind == 'log':
+        return LogTransport()
+    raise ValueError(f'Bilinmeyen bildirim taşıyıcısı: {kind}')
+
+
+def _retry(action, attempts, backoff, label):
+    """action'ı en fazla attempts kez dene; başarılıysa True"""
+    for attempt in range(1, attempts + 1):
+        try:
+            action()
+            return True
+        except Exception:
+            logger.warning('%s başarısız (deneme %d/%d)', label, attempt,
+                           attempts, exc_info=attempt == attempts)
+            if attempt < attempts:
+                time.sleep(backoff * 2 ** (attempt - 1))
+    return False
+
+
+class UnreadCounter:
+    """Personel başına okunmamış bildirim sayısı ve değişiklik sürümü
+
+    Her değişiklik genel bir sıra numarasını artırır ve personelin
+    sürümü olarak kaydedilir; istemci son gördüğü sürümü gönderir, farklıysa
+    hemen, aynıysa değişiklik ya da zaman aşımına kadar beklenir.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+        self._versions = {}
+        self._conditions = {}
+        self._seq = 0
+        self._loaded = False
+
+    def ensure_loaded(self):
+        """Sayıları veritabanından kur (uygulama bağlamı gerekir)"""
+        if self._loaded:
+            return
+        counts = dict(db.session.query(
+            Notification.person_id, func.count(Notification.id)
+        ).filter(Notification.is_read.is_(False)).group_by(Notification.person_id))
+        with self._lock:
+            if not self._loaded:
+                self._counts = counts
+                self._loaded = True
+
+    def reset(self):
+        """Sayıları bir sonraki ensure_loaded'da yeniden oku"""
+        with self._lock:
+            self._loaded = False
+            self._counts = {}
+
+    def get(self, person_id):
+        """(okunmamış sayı, sürüm)"""
+        with self._lock:
+            return self._counts.get(person_id, 0), self._versions.get(person_id, 0)
+
+    def add(self, deltas):
+        """{person_id: fark} uygula ve bekleyenleri uyandır"""
+        with self._lock:
+            if not self._loaded:
+                # Kurulum henüz yapılmadı; sayılar ilk kullanımda okunacak
+                return
+            self._seq += 1
+            for person_id, delta in deltas.items():
+                self._counts[person_id] = max(0, self._counts.get(person_id, 0) + delta)
+                self._versions[person_id] = self._seq
+                condition = self._conditions.get(person_id)
+                if condition is not None:
+                    condition.notify_all()
+
+    def wait(self, person_id, version, timeout):
+        """Sürüm version'dan farklı olana kadar en fazla timeout sn bekle"""
+        with self._lock:
+            condition = self._conditions.get(person_id)
+            if condition is None:
+                condition = self._conditions[person_id] = threading.Condition(self._lock)
+            condition.wait_for(
+                lambda: self._versions.get(person_id, 0) != version, timeout)
+            return self._counts.get(person_id, 0), self._versions.get(person_id, 0)
+
+
+unread_counter = UnreadCounter()
+
+
+class Dispatcher:
+    def __init__(self, app, transport, queue_size=10000, batch_size=200,
+                 max_retries=3, retry_backoff=0.5, enqueue_timeout=0.5,
+                 sender='izin-takip@localhost'):
+        self.app = app
+        self.transport = transport
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.enqueue_timeout = enqueue_timeout
+        self.sender = sender
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.stats = {'queued': 0, 'inline': 0, 'written': 0, 'sent': 0,
+                      'failed': 0}
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True,
+                                                name='notification-dispatcher')
+                self._thread.start()
+
+    def submit(self, job):
+        """İşi kuyruğa bırak; kuyruk doluysa çağıran iş parçacığında işle"""
+        self._ensure_worker()
+        try:
+            self._queue.put(job, timeout=self.enqueue_timeout)
+            self.stats['queued'] += 1
+        except queue.Full:
+            logger.warning('Bildirim kuyruğu dolu; iş eşzamanlı işleniyor')
+            self.stats['inline'] += 1
+            try:
+                self._process([job])
+            except Exception:
+                logger.exception('Bildirim işlenemedi')
+
+    def join(self, timeout=None):
+        """Kuyruktaki işler bitene kadar bekle; zaman aşımında False"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._process(batch)
+            except Exception:
+                logger.exception('Bildirim batch işlenemedi')
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _process(self, jobs):
+        with self.app.app_context():
+            rows, emails = self._build(jobs)
+            if rows and _retry(lambda: self._write(rows), self.max_retries,
+                               self.retry_backoff, 'Bildirim yazma'):
+                self.stats['written'] += len(rows)
+                unread_counter.add(Counter(row['person_id'] for row in rows))
+            elif rows:
+                self.stats['failed'] += len(rows)
+            if emails and _retry(lambda: self.transport.send_many(emails),
+                                 self.max_retries, self.retry_backoff,
+                                 'E-posta gönderimi'):
+                self.stats['sent'] += len(emails)
+            elif emails:
+                self.stats['failed'] += len(emails)
+
+    def _write(self, rows):
+        try:
+            db.session.execute(db.insert(Notification), rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def _build(self, jobs):
+        """İşlerden (Notification satırları, e-postalar) üret"""
+        person_ids = {job['person_id'] for job in jobs}
+        approved_ids = [job['leave_request_id'] for job in jobs
+                        if job['status'] == 'approved']
+        backups = {}
+        if approved_ids:
+            for leave_request_id, backup_id in db.session.query(
+                    BackupAssignment.leave_request_id,
+                    BackupAssignment.backup_person_id
+            ).filter(BackupAssignment.leave_request_id.in_(approved_ids)):
+                backups.setdefault(leave_request_id, []).append(backup_id)
+                person_ids.add(backup_id)
+        persons = {person_id: (name, email) for person_id, name, email in
+                   db.session.query(Person.id, Person.name, Person.email).filter(
+                       Person.id.in_(person_ids))}
+
+        now = datetime.now()
+        rows, emails = [], []
+
+        def notify(person_id, subject, body):
+            if person_id not in persons:
+                return
+            rows.append({'person_id': person_id, 'message': body,
+                         'is_read': False, 'created_at': now})
+            if persons[person_id][1]:
+                emails.append(self._email(persons[person_id][1], subject, body))
+
+        for job in jobs:
+            period = (f"{job['start_date'].strftime('%d/%m/%Y')} - "
+                      f"{job['end_date'].strftime('%d/%m/%Y')}")
+            subject = STATUS_MESSAGES[job['status']]
+            notify(job['person_id'], subject, f'{subject} ({period})')
+            owner = persons.get(job['person_id'], ('', None))[0]
+            for backup_id in backups.get(job['leave_request_id'], ()):
+                notify(backup_id, 'Yedek görevlendirmesi',
+                       f'{owner} {period} tarihlerinde izinli; '
+                       f'yedek olarak atandınız')
+        return rows, emails
+
+    def _email(self, to, subject, body):
+        message = EmailMessage()
+        message['From'] = self.sender
+        message['To'] = to
+        message['Subject'] = subject
+        message.set_content(body)
+        return message
+
+
+dispatcher = None
+
+
+def init_notifications(app):
+    """Bildirim ayarlarını ve dağıtıcıyı kur (işçi ilk işte başlar)"""
+    global dispatcher
+    config = app.config
+    config.setdefault('NOTIFICATIONS_ENABLED', True)
+    config.setdefault('NOTIFICATION_QUEUE_SIZE', 10000)
+    config.setdefault('NOTIFICATION_BATCH_SIZE', 200)
+    config.setdefault('NOTIFICATION_MAX_RETRIES', 3)
+    config.setdefault('NOTIFICATION_POLL_WAIT', DEFAULT_POLL_WAIT)
+    config.setdefault('NOTIFICATION_POLL_INTERVAL', DEFAULT_POLL_INTERVAL)
+    dispatcher = Dispatcher(
+        app, make_transport(config),
+        queue_size=config['NOTIFICATION_QUEUE_SIZE'],
+        batch_size=config['NOTIFICATION_BATCH_SIZE'],
+        max_retries=config['NOTIFICATION_MAX_RETRIES'],
+        sender=config.get('SMTP_SENDER', 'izin-takip@localhost'))
+    # Kapanışta kuyrukta kalan işlerin yazılması beklenir
+    atexit.register(dispatcher.join, SHUTDOWN_TIMEOUT)
+
+
+def leave_status_changed(leave_request, old_status):
+    """Onay/red sonrası personele (ve onayda yedeklerine) bildirim"""
+    if (dispatcher is None or not dispatcher.app.config['NOTIFICATIONS_ENABLED']
+            or leave_request.status == old_status
+            or leave_request.status not in STATUS_MESSAGES):
+        return
+    dispatcher.submit({
+        'leave_request_id': leave_request.id,
+        'person_id': leave_request.person_id,
+        'status': leave_request.status,
+        'start_date': leave_request.start_date,
+        'end_date': leave_request.end_date,
+    })
+
+
+def unread_events(person_id, version=None):
+    """SSE akışı: yalnızca okunmamış sayısı değiştiğinde olay gönderir
+
+    version (Last-Event-ID) verilmezse ilk olay güncel sayıdır. Üreteç
+    veritabanına gitmez; çağıran önce unread_counter.ensure_loaded()
+    çağırmalıdır.
+    """
+    version = -1 if version is None else version
+    deadline = time.monotonic() + SSE_MAX_DURATION
+    yield 'retry: 3000\n\n'
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        count, current = unread_counter.wait(person_id, version,
+                                             min(SSE_HEARTBEAT, remaining))
+        if current != version:
+            version = current
+            yield (f'id: {version}\nevent: unread\n'
+                   f'data: {json.dumps({"unread_count": count})}\n\n')
+        else:
+            yield ': ping\n\n'
+
+
+def unread_for(person_id, limit=50):
+    """Personelin okunmamış bildirimleri (person_id, is_read indeksi)"""
+    return Notification.query.filter(
+        Notification.person_id == person_id,
+        Notification.is_read.is_(False)
+    ).order_by(Notification.id.desc()).limit(limit)
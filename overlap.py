@@ -0,0 +1,48 @@
+from models import db, LeaveRequest
+
+# Çakışma kontrolünde dikkate alınan talep durumları
+ACTIVE_STATUSES = ('approved', 'pending')
+
+
+def overlaps(start_date, end_date):
+    """[start_date, end_date] aralığıyla kesişen talepler için tek koşul
+
+    İki kapalı aralık ancak ve ancak biri diğeri bitmeden başlıyorsa
+    kesişir; eski üç dallı OR ifadesinin yerine geçer ve
+    (person_id, status, start_date, end_date) indeksiyle taranabilir.
+    """
+    return db.and_(LeaveRequest.start_date <= end_date,
+                   LeaveRequest.end_date >= start_date)
+
+
+def _overlap_query(person_id, start_date, end_date, statuses, exclude_id):
+    query = LeaveRequest.query.filter(
+        LeaveRequest.person_id == person_id,
+        LeaveRequest.status.in_(statuses),
+        overlaps(start_date, end_date)
+    )
+    if exclude_id is not None:
+        query = query.filter(LeaveRequest.id != exclude_id)
+    return query
+
+
+def overlapping_requests(person_id, start_date, end_date,
+                         statuses=ACTIVE_STATUSES, exclude_id=None):
+    """Personelin verilen aralıkla çakışan izin taleplerini döndüren sorgu"""
+    return _overlap_query(person_id, start_date, end_date, statuses,
+                          exclude_id).order_by(LeaveRequest.start_date)
+
+
+def find_conflicts(person_id, start_date, end_date,
+                   statuses=ACTIVE_STATUSES, exclude_id=None):
+    """Çakışan talepleri liste olarak döndür"""
+    return overlapping_requests(person_id, start_date, end_date,
+                                statuses, exclude_id).all()
+
+
+def has_conflict(person_id, start_date, end_date,
+                 statuses=ACTIVE_STATUSES, exclude_id=None):
+    """En az bir çakışan talep var mı (ilk eşleşmede durur)"""
+    query = _overlap_query(person_id, start_date, end_date, statuses,
+                           exclude_id)
+    return db.session.query(query.exists()).scalar()
@@ -0,0 +1,122 @@
+"""Keyset (cursor) sayfalama ve akışlı JSON yanıtları
+
+Sayfa sonu, sıralama sütunlarının son satırdaki değerlerinden oluşan
+opak bir cursor ile ifade edilir; sonraki sayfa `(sütunlar) > (değerler)`
+koşuluyla indeks üzerinden doğrudan bulunur (OFFSET taraması yoktur).
+Satırlar yield_per ile okunup JSON olarak parça parça yazılır.
+"""
+import base64
+import json
+from datetime import date, datetime
+
+from flask import Response, stream_with_context
+from sqlalchemy import literal, tuple_
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+FETCH_BATCH = 500
+
+
+class CursorError(ValueError):
+    """Geçersiz cursor veya sayfa parametresi"""
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+    return value
+
+
+def encode_cursor(values):
+    raw = json.dumps([_encode_value(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return [_decode_value(v) for v in values]
+    except (ValueError, TypeError) as e:
+        raise CursorError('Geçersiz cursor') from e
+
+
+def _matches_type(column, value):
+    """Cursor değeri sütunun Python türünde mi (datetime tarih sayılmaz)"""
+    try:
+        expected = column.type.python_type
+    except NotImplementedError:
+        return True
+    if isinstance(value, bool) and expected is not bool:
+        return False
+    if expected is date and isinstance(value, datetime):
+        return False
+    return isinstance(value, expected)
+
+
+def parse_limit(value):
+    """?limit= parametresini doğrula"""
+    if value is None:
+        return DEFAULT_LIMIT
+    try:
+        limit = int(value)
+    except ValueError:
+        raise CursorError('limit sayı olmalı')
+    if limit < 1:
+        raise CursorError('limit en az 1 olmalı')
+    return min(limit, MAX_LIMIT)
+
+
+def keyset_page(query, columns, cursor=None, limit=DEFAULT_LIMIT,
+                descending=False):
+    """Sorguyu sıralayıp cursor sonrasından limit+1 satırlık sorgu döndür
+
+    Fazladan okunan satır yalnızca sonraki sayfanın varlığını anlamak
+    içindir; `stream_page` bunu yanıta yazmaz.
+    """
+    if cursor:
+        values = decode_cursor(cursor)
+        # Değerler sorgu akmaya başlamadan doğrulanır; aksi halde hata
+        # yanıtın ortasında çıkar ve gövde yarım kalır
+        if len(values) != len(columns) or not all(
+                _matches_type(c, v) for c, v in zip(columns, values)):
+            raise CursorError('Geçersiz cursor')
+        key = tuple_(*columns)
+        bound = tuple_(*[literal(v, c.type) for c, v in zip(columns, values)])
+        query = query.filter(key < bound if descending else key > bound)
+    order = [c.desc() if descending else c.asc() for c in columns]
+    return query.order_by(*order).limit(limit + 1)
+
+
+def stream_page(query, limit, serialize, cursor_values):
+    """Sayfayı `{"items": [...], "next_cursor": ...}` olarak akıt
+
+    serialize(row) -> dict, cursor_values(row) -> sıralama değerleri.
+    """
+    def generate():
+        yield '{"items":['
+        last = None
+        for index, row in enumerate(query.yield_per(FETCH_BATCH)):
+            if index == limit:
+                # limit+1'inci satır: sonraki sayfa var
+                next_cursor = encode_cursor(cursor_values(last))
+                yield '],"next_cursor":' + json.dumps(next_cursor) + '}'
+                return
+            yield (',' if index else '') + json.dumps(
+                serialize(row), ensure_ascii=False, separators=(',', ':'))
+            last = row
+        yield '],"next_cursor":null}'
+
+    return Response(stream_with_context(generate()),
+                    mimetype='application/json')
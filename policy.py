@@ -0,0 +1,137 @@
+"""İzin politikası değerlendirmesi
+
+Takımın LeavePolicy satırları (takıma özel olanlar genel olanları, yani
+team_id'si boş olanları ezer) ve engelleyici Event tarihleri ilk
+ihtiyaçta derlenip bellekte tutulur. Bir talebin değerlendirilmesi
+sözlük okuması ve sıralı tarih listesinde ikili aramadan ibarettir;
+veritabanına gidilmez. LeavePolicy veya Event değiştiğinde önbellek
+temizlenir.
+"""
+import threading
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from datetime import date
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db, Event, LeavePolicy
+
+Rule = namedtuple('Rule', 'max_consecutive_days advance_notice_days requires_approval')
+
+# Politika tanımlı olmayan izin türleri onaya düşer, başka kısıt yoktur
+DEFAULT_RULE = Rule(None, None, True)
+
+# Otomatik onaylanan taleplerde approved_by değeri
+AUTO_APPROVER = 'otomatik'
+
+
+class PolicyResult(namedtuple('PolicyResult', 'violations requires_approval')):
+    __slots__ = ()
+
+    @property
+    def allowed(self):
+        return not self.violations
+
+
+class BlockingDates:
+    """Engelleyici etkinlikler: sıralı ordinal listesi ve adları"""
+
+    def __init__(self, events):
+        events = sorted(events)
+        self.ordinals = [d.toordinal() for d, _ in events]
+        self.names = [name for _, name in events]
+
+    def between(self, start_date, end_date):
+        lo = bisect_left(self.ordinals, start_date.toordinal())
+        hi = bisect_right(self.ordinals, end_date.toordinal())
+        return [(date.fromordinal(self.ordinals[i]), self.names[i])
+                for i in range(lo, hi)]
+
+
+class PolicyEngine:
+    def __init__(self):
+        self._rules = {}
+        self._blocking = None
+        self._lock = threading.Lock()
+        # Derleme kilit dışında yapılır; arada invalidate edilirse sonuç
+        # eski satırlardan gelmiş olabileceğinden önbelleğe yazılmaz
+        self._generation = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._rules.clear()
+            self._blocking = None
+            self._generation += 1
+
+    def _compile(self, team_id):
+        """{izin türü: Rule}; takıma özel satır genel satırı ezer"""
+        rows = LeavePolicy.query.filter(
+            db.or_(LeavePolicy.team_id == team_id, LeavePolicy.team_id.is_(None))
+        ).order_by(LeavePolicy.team_id.is_(None).desc(), LeavePolicy.id).all()
+        rules = {}
+        for row in rows:
+            rules[row.leave_type] = Rule(
+                row.max_consecutive_days, row.advance_notice_days,
+                row.requires_approval is not False)
+        return rules
+
+    def rules_for(self, team_id):
+        rules = self._rules.get(team_id)
+        if rules is None:
+            generation = self._generation
+            rules = self._compile(team_id)
+            with self._lock:
+                if generation == self._generation:
+                    self._rules[team_id] = rules
+        return rules
+
+    def blocking_dates(self):
+        blocking = self._blocking
+        if blocking is None:
+            generation = self._generation
+            blocking = BlockingDates(db.session.query(Event.date, Event.name).filter(
+                Event.is_blocking.is_(True)))
+            with self._lock:
+                if generation == self._generation:
+                    self._blocking = blocking
+        return blocking
+
+    def evaluate(self, team_id, leave_type, start_date, end_date, today=None):
+        """Talebin politika ihlalleri ve onaya ihtiyaç duyup duymadığı"""
+        rule = self.rules_for(team_id).get(leave_type, DEFAULT_RULE)
+        today = today or date.today()
+        violations = []
+
+        days = (end_date - start_date).days + 1
+        if rule.max_consecutive_days and days > rule.max_consecutive_days:
+            violations.append(f'En fazla {rule.max_consecutive_days} gün ardışık '
+                              f'izin alınabilir ({days} gün istendi)')
+        if rule.advance_notice_days and (start_date - today).days < rule.advance_notice_days:
+            violations.append(f'İzin en az {rule.advance_notice_days} gün önceden '
+                              f'talep edilmelidir')
+        for day, name in self.blocking_dates().between(start_date, end_date):
+            violations.append(f'{day.strftime("%d/%m/%Y")} tarihinde izin '
+                              f'alınamaz: {name}')
+        return PolicyResult(violations, rule.requires_approval)
+
+
+policy_engine = PolicyEngine()
+
+
+# Transaction sonunda bir kez daha temizlenir ki flush ile commit arasında
+# eski satırları okuyan eşzamanlı istekler önbelleğe eski kuralı bırakmasın
+@event.listens_for(Session, 'after_flush')
+def _policies_flushed(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, (LeavePolicy, Event)):
+            session.info['policies_changed'] = True
+            policy_engine.invalidate()
+            return
+
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+def _policies_transaction_end(session):
+    if session.info.pop('policies_changed', False):
+        policy_engine.invalidate()
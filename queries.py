@@ -0,0 +1,49 @@
+"""Listeleme sorguları
+
+Tüm ilişkiler `lazy=True` tanımlı olduğundan satır başına `r.person.name`
+gibi erişimler ayrı SELECT'e (N+1) yol açar. Listeleme yapan route'lar
+ve şablonlar ihtiyaç duydukları ilişkileri buradaki sorgularla önceden
+yükler.
+"""
+from sqlalchemy.orm import contains_eager, joinedload
+
+from models import LeaveBalance, LeaveRequest, Person, User
+
+
+def leave_requests_with_person():
+    """Personeli birlikte yüklenen izin talepleri"""
+    return LeaveRequest.query.options(joinedload(LeaveRequest.person))
+
+
+def pending_requests():
+    """Admin paneli için bekleyen talepler (personel dahil)"""
+    return leave_requests_with_person().filter(
+        LeaveRequest.status == 'pending'
+    ).order_by(LeaveRequest.start_date, LeaveRequest.id)
+
+
+def upcoming_approved(today, limit):
+    """Bugünden sonra başlayan onaylı izinler"""
+    return leave_requests_with_person().filter(
+        LeaveRequest.start_date >= today,
+        LeaveRequest.status == 'approved'
+    ).order_by(LeaveRequest.start_date).limit(limit)
+
+
+def persons_with_team():
+    """Takımı birlikte yüklenen personel listesi (isme göre)"""
+    return Person.query.options(joinedload(Person.team)).order_by(Person.name)
+
+
+def users_with_person():
+    """Bağlı personeli birlikte yüklenen kullanıcılar"""
+    return User.query.options(joinedload(User.person)).order_by(User.username)
+
+
+def balances_with_person(year):
+    """Yıllık bakiyeler; personel JOIN üzerinden, takımı ile birlikte"""
+    return LeaveBalance.query.filter(LeaveBalance.year == year).join(
+        LeaveBalance.person
+    ).options(
+        contains_eager(LeaveBalance.person).joinedload(Person.team)
+    ).order_by(Person.name)
@@ -0,0 +1,61 @@
+"""Bakiye mutabakatı
+
+LeaveBalance.used/pending değerleri taleplerden artımlı güncellenir;
+mutabakat bunları izin geçmişinden baştan hesaplanan değerlerle
+karşılaştırır. Beklenen kullanım balances.compute_usage ile tek geçişte
+bulunur (yıl sınırını aşan talepler bölünür, tatil ve hafta sonları
+çalışma takviminin önek toplamlarıyla düşülür); kayıtlı bakiyeler tek
+sorguyla akıtılıp karşılaştırılır ve yalnızca tutmayan satırlar döner.
+Bakiye satırı olmadığı halde kullanımı olan personel de raporlanır.
+"""
+from models import db, LeaveBalance, Person
+from balances import compute_usage
+
+COLUMNS = ('used', 'pending')
+
+
+def _mismatch(person_id, year, balance_id, stored, expected):
+    return {
+        'person_id': person_id,
+        'year': year,
+        'balance_id': balance_id,
+        'stored': stored,
+        'expected': expected,
+        'diff': {column: stored[column] - expected[column] for column in COLUMNS},
+    }
+
+
+def reconcile(year, batch_size=5000):
+    """Yılın bakiyelerini taleplerle karşılaştır; yalnızca farkları döndür"""
+    usage = compute_usage(year, batch_size)
+
+    checked = 0
+    mismatches = []
+    query = db.session.query(
+        LeaveBalance.id, LeaveBalance.person_id, LeaveBalance.used, LeaveBalance.pending
+    ).filter(LeaveBalance.year == year)
+    for balance_id, person_id, used, pending in query.yield_per(batch_size):
+        checked += 1
+        stored = {'used': used or 0, 'pending': pending or 0}
+        expected = usage.pop((person_id, year), {'used': 0, 'pending': 0})
+        if stored != expected:
+            mismatches.append(_mismatch(person_id, year, balance_id, stored, expected))
+
+    # Kullanımı olup bakiye satırı hiç oluşturulmamış personel
+    for (person_id, _), expected in usage.items():
+        if any(expected.values()):
+            checked += 1
+            mismatches.append(_mismatch(person_id, year, None,
+                                        {'used': 0, 'pending': 0}, expected))
+
+    person_ids = sorted({m['person_id'] for m in mismatches})
+    names = {}
+    for start in range(0, len(person_ids), batch_size):
+        chunk = person_ids[start:start + batch_size]
+        names.update(db.session.query(Person.id, Person.name).filter(Person.id.in_(chunk)))
+    for mismatch in mismatches:
+        mismatch['name'] = names.get(mismatch['person_id'])
+    mismatches.sort(key=lambda m: (m['name'] or '', m['person_id']))
+
+    return {'year': year, 'checked': checked, 'mismatched': len(mismatches),
+            'items': mismatches}
@@ -0,0 +1,217 @@
+"""Referans veri (tatil, personel, takım) yanıtları için koşullu GET
+
+Bu tablolar yılda birkaç kez değişir ama index.html ve admin.html her
+açılışta tamamını ister. Her tablo için bellekte bir sürüm sayacı tutulur;
+ORM flush'ları ve session.execute ile yapılan toplu INSERT/UPDATE/DELETE
+commit edildiğinde ilgili tablonun sürümü artırılır.
+
+Yanıtın ETag'i uç nokta, sorgu parametreleri ve bağlı tabloların
+sürümlerinden türetilir; Last-Modified tabloların son değişme zamanıdır.
+İstemci aynı ETag'i If-None-Match ile (veya If-Modified-Since ile)
+gönderirse veritabanına gidilmeden 304 döner. Aksi halde serileştirilmiş
+gövde sürüm anahtarıyla LRU önbellekte tutulur; tekrar eden isteklerde
+sorgu ve JSON kodlaması yapılmaz.
+
+Diğer modüller watch_tables ile aynı commit bildirimlerine abone olur
+(ör. sayfa parçası önbelleği).
+
+Sayaçlar süreç içidir: uygulama dışından (ör. doğrudan SQL ile) yapılan
+değişiklikler yeniden başlatmaya kadar görünmez. Çok süreçli sunucuda
+sürümler işçiler arası paylaşımlı sayaçlardan okunur (TableVersions.share).
+"""
+import hashlib
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from flask import Response, make_response, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import Holiday, Person, Team
+
+DEFAULT_MAX_ENTRIES = 256
+REFERENCE_TABLES = frozenset(model.__table__.name for model in (Holiday, Person, Team))
+
+# (tablolar, geri çağırma): commit'te değişen izlenen tablolar bildirilir
+_watchers = []
+_watched = set()
+
+
+def watch_tables(tables, callback):
+    """tables'tan biri commit'te değiştiğinde callback(değişen_tablolar)"""
+    tables = frozenset(tables)
+    _watchers.append((tables, callback))
+    _watched.update(tables)
+
+
+class TableVersions:
+    """Tablo başına (sürüm, son değişme zamanı)"""
+
+    def __init__(self):
+        # Yeniden başlatılan sürecin ETag'leri eskileriyle çakışmasın
+        self.epoch = uuid.uuid4().hex[:8]
+        self._started = datetime.now(timezone.utc).replace(microsecond=0)
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._shared = None
+
+    def share(self, source):
+        """Sürümleri source.versions(tablolar) -> [(sayaç, zaman)] kaynağından oku
+
+        Fork'tan önce çağrılır; epoch ve başlangıç zamanı da ana süreçte
+        belirlendiğinden tüm işçilerin ETag'leri aynı olur.
+        """
+        self._shared = source
+
+    def bump(self, tables):
+        now = datetime.now(timezone.utc).replace(microsecond=0)
+        with self._lock:
+            for table in tables:
+                version, _ = self._versions.get(table, (0, None))
+                self._versions[table] = (version + 1, now)
+
+    def get(self, tables):
+        """((sürüm, ...), en son değişme zamanı)"""
+        if self._shared is not None:
+            entries = [(version, datetime.fromtimestamp(int(when), timezone.utc)
+                        if when else self._started)
+                       for version, when in self._shared.versions(tables)]
+            return tuple(version for version, _ in entries), max(when for _, when in entries)
+        with self._lock:
+            entries = [self._versions.get(table, (0, self._started)) for table in tables]
+        return tuple(version for version, _ in entries), max(when for _, when in entries)
+
+
+class ResponseCache:
+    """Sürüm anahtarlı serileştirilmiş yanıtlar (LRU)"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def count_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'max_entries': self.max_entries,
+                    'hits': self.hits, 'misses': self.misses,
+                    'not_modified': self.not_modified}
+
+
+table_versions = TableVersions()
+response_cache = ResponseCache()
+watch_tables(REFERENCE_TABLES, table_versions.bump)
+
+
+def init_reference_cache(app):
+    """Önbellek boyutunu uygulama yapılandırmasından al"""
+    app.config.setdefault('REFERENCE_CACHE_SIZE', DEFAULT_MAX_ENTRIES)
+    response_cache.max_entries = app.config['REFERENCE_CACHE_SIZE']
+    response_cache.clear()
+
+
+def reference_response(tables, build):
+    """tables'a bağlı yanıtı koşullu ve önbellekli döndür
+
+    build() yalnızca önbellekte yoksa çağrılır; 200 dışındaki yanıtlar
+    önbelleğe alınmaz. Yetki kontrolleri çağırmadan önce yapılmalıdır.
+    """
+    versions, last_modified = table_versions.get(tables)
+    args = tuple(sorted(request.args.items(multi=True)))
+    key = (request.endpoint, args, versions)
+    etag = hashlib.sha1(repr((table_versions.epoch, key)).encode()).hexdigest()[:20]
+
+    if request.if_none_match:
+        fresh = request.if_none_match.contains(etag)
+    else:
+        fresh = (request.if_modified_since is not None
+                 and last_modified <= request.if_modified_since)
+    if fresh:
+        response_cache.count_not_modified()
+        response = Response(status=304)
+    else:
+        entry = response_cache.get(key)
+        if entry is not None:
+            body, mimetype = entry
+            response = Response(body, mimetype=mimetype)
+        else:
+            response = make_response(build())
+            if response.status_code != 200:
+                return response
+            # Akış yanıtları burada tüketilir
+            body = response.get_data()
+            # Hesaplama sırasında tablo değiştiyse eski sürümle saklanmaz
+            if table_versions.get(tables)[0] == versions:
+                response_cache.put(key, (body, response.mimetype))
+
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    # Tarayıcı saklasın ama her kullanımda doğrulasın (304)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+# Değişen referans tabloları transaction boyunca biriktirilir, yalnızca
+# commit'te sürüm artırılır; rollback'te atılır
+def _mark(session, table):
+    if table in _watched:
+        session.info.setdefault('reference_changed', set()).add(table)
+
+
+@event.listens_for(Session, 'after_flush')
+def _reference_flushed(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        table = getattr(obj, '__table__', None)
+        if table is not None:
+            _mark(session, table.name)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _reference_bulk_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None:
+            _mark(orm_execute_state.session, table.name)
+
+
+@event.listens_for(Session, 'after_commit')
+def _reference_committed(session):
+    changed = session.info.pop('reference_changed', None)
+    if changed:
+        for tables, callback in _watchers:
+            if not changed.isdisjoint(tables):
+                callback(changed & tables)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _reference_rolled_back(session):
+    session.info.pop('reference_changed', None)
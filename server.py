@@ -0,0 +1,309 @@
+"""Üretim sunucusu: ön yüklemeli, çok süreçli/çok iş parçacıklı başlatıcı
+
+Uygulama ana süreçte bir kez oluşturulur, tüm şablonlar derlenir ve
+veritabanı bağlantıları kapatılır; ardından --workers kadar işçi süreç
+fork edilir ve aynı dinleme soketini paylaşır (yazma sırasında kopyalanan
+bellek sayesinde derlenmiş şablonlar ve içe aktarılmış modüller
+paylaşılır). Her işçi istekleri --threads boyutlu bir iş parçacığı
+havuzunda işler. Ölen işçinin yerine yenisi başlatılır; SIGTERM/SIGINT
+ile işçiler durdurulur.
+
+Süreç içi önbellekler (kapasite, müsaitlik, politika, takvim, kimlik,
+okunmamış bildirim sayısı, referans veri ve bellek parça önbelleği) her
+işçide ayrıdır. Bir işçide commit edilen değişiklik paylaşımlı bellekteki
+tablo sayaçlarını artırır; diğer işçiler sonraki isteklerinin başında
+sayaçları karşılaştırıp ilgili önbellekleri düşürür. Referans veri
+ETag'leri doğrudan bu sayaçlardan üretildiğinden tüm işçilerde aynıdır.
+Başarısız giriş
+sayaçları ve /metrics serileri de paylaşımlı bellektedir
+(auth.share_login_throttles, metrics.registry.share); /metrics hangi
+işçiye düşerse düşsün tüm işçilerin toplamını verir. Bekleyen
+long-poll/SSE bağlantıları başka işçide yazılan bildirimi yeniden
+bağlandıklarında görür; tarayıcı yoklamasında bu gecikme en fazla
+NOTIFICATION_POLL_INTERVAL + NOTIFICATION_POLL_WAIT saniyedir.
+
+--workers 1 (veya fork desteklenmeyen sistemlerde) tek süreç, çok iş
+parçacıklı çalışır. Bekleyen istekler (bildirim yoklaması, SSE) havuzdan
+bir iş parçacığını bekleme süresince tutar; tarayıcı bu yüzden kısa
+beklemeli yoklama kullanır (bkz. notifications). SSE uç noktasını
+kullanan istemciler --threads'i bağlantı sayısı kadar tüketir.
+
+Kullanım:
+    python server.py --workers 4 --threads 16 --port 5004
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.orm import configure_mappers
+from werkzeug.serving import BaseWSGIServer
+
+from app import create_app
+from auth import share_login_throttles
+from availability import availability_cache
+from capacity import capacity_index
+from fragments import FRAGMENTS, MemoryBackend, fragment_cache
+from identity import identity_cache
+from metrics import registry as metrics_registry
+from models import db
+from notifications import unread_counter
+from policy import policy_engine
+from refdata import REFERENCE_TABLES, table_versions, watch_tables
+from work_calendar import work_calendar
+
+logger = logging.getLogger(__name__)
+
+# İşçiler durdurulurken açık isteklerin bitmesi için beklenen süre (sn)
+GRACEFUL_TIMEOUT = 30
+
+
+def _drop_fragments(tables):
+    # Dosya arka ucu zaten süreçler arası paylaşılır
+    if isinstance(fragment_cache.backend, MemoryBackend):
+        fragment_cache.bump(tables)
+
+
+# Tablo -> başka bir işçide değiştiğinde bu süreçte düşürülecek önbellekler
+INVALIDATORS = {
+    'leave_request': [lambda: capacity_index.invalidate(),
+                      lambda: availability_cache.invalidate()],
+    'team': [lambda: capacity_index.invalidate(),
+             lambda: availability_cache.invalidate()],
+    'person': [lambda: capacity_index.invalidate(),
+               lambda: availability_cache.invalidate()],
+    'holiday': [lambda: work_calendar.invalidate(),
+                lambda: availability_cache.invalidate()],
+    'leave_policy': [lambda: policy_engine.invalidate()],
+    'event': [lambda: policy_engine.invalidate()],
+    'user': [lambda: identity_cache.invalidate()],
+    'notification': [lambda: unread_counter.reset()],
+}
+# Referans tablo sürümleri paylaşımlı sayaçlardan okunur (enable_worker_sync)
+for _table in REFERENCE_TABLES:
+    INVALIDATORS.setdefault(_table, [])
+for _table in set().union(*FRAGMENTS.values()):
+    INVALIDATORS.setdefault(_table, []).append(
+        lambda table=_table: _drop_fragments([table]))
+
+
+class Generations:
+    """Tablo başına paylaşımlı değişiklik sayacı
+
+    Sayaçlar fork'tan önce paylaşımlı bellekte oluşturulur; her işçi en
+    son gördüğü değerleri kendi belleğinde tutar.
+    """
+
+    def __init__(self, tables):
+        self.tables = sorted(tables)
+        self._index = {table: i for i, table in enumerate(self.tables)}
+        self._shared = multiprocessing.RawArray('Q', len(self.tables))
+        # Son değişme zamanı (epoch saniyesi; 0: değişmedi)
+        self._changed_at = multiprocessing.RawArray('d', len(self.tables))
+        self._lock = multiprocessing.Lock()
+        self._seen = [0] * len(self.tables)
+
+    def bump(self, tables):
+        """Bu süreçte commit edilen değişikliği diğer işçilere duyur"""
+        now = time.time()
+        with self._lock:
+            for table in tables:
+                i = self._index[table]
+                self._changed_at[i] = now
+                # Araya başka işçinin değişikliği girmediyse kendi
+                # değişikliğimiz için önbellek düşürmeye gerek yok
+                if self._seen[i] == self._shared[i]:
+                    self._seen[i] += 1
+                self._shared[i] += 1
+
+    def changed(self):
+        """Son çağrıdan beri başka işçide değişen tablolar"""
+        with self._lock:
+            current = self._shared[:]
+            if current == self._seen:
+                return []
+            changed = [table for table, seen, now in zip(self.tables, self._seen, current)
+                       if seen != now]
+            self._seen = current
+        return changed
+
+    def versions(self, tables):
+        """Tabloların tüm işçilerde aynı olan (sayaç, son değişme zamanı) değerleri"""
+        with self._lock:
+            return [(self._shared[self._index[table]],
+                     self._changed_at[self._index[table]]) for table in tables]
+
+
+def enable_worker_sync(app):
+    """Commit'leri paylaşımlı sayaçlara yaz, isteklerden önce kontrol et"""
+    generations = Generations(INVALIDATORS)
+    watch_tables(INVALIDATORS, generations.bump)
+    # Referans veri ETag'leri hangi işçi yanıtlarsa yanıtlasın aynı olsun
+    table_versions.share(generations)
+    sync_lock = threading.Lock()
+
+    @app.before_request
+    def _sync_worker_caches():
+        # Değişikliği gören iş parçacığı önbellekleri düşürmeyi bitirene
+        # kadar diğerleri eski önbellekten yanıt vermez
+        with sync_lock:
+            for table in generations.changed():
+                for invalidate in INVALIDATORS[table]:
+                    invalidate()
+
+    return generations
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """İstekleri sabit boyutlu iş parçacığı havuzunda işleyen WSGI sunucusu"""
+
+    multithread = True
+
+    def __init__(self, host, port, app, threads, **kwargs):
+        # Soket bağlanamazsa üst sınıf server_close çağırır
+        self.threads = threads
+        self.executor = None
+        super().__init__(host, port, app, **kwargs)
+
+    def process_request(self, request, client_address):
+        # Havuz fork'tan sonra, işçinin kendi sürecinde oluşturulur
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(self.threads,
+                                               thread_name_prefix='http-worker')
+        self.executor.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            # Dinleme soketi bloklamasız; bağlantı soketi bloklu çalışır
+            request.setblocking(True)
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def preload(app):
+    """Fork'tan önce şablonları derle, eşlemeleri kur, bağlantıları kapat"""
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        app.jinja_env.get_template(name)
+    # İlk sorguda yapılan mapper kurulumu her işçide tekrarlanmasın
+    configure_mappers()
+    with app.app_context():
+        for engine in db.engines.values():
+            # İşçiler ana sürecin bağlantılarını paylaşmasın
+            engine.dispose()
+
+
+def _serve(server, stop_signals):
+    def stop(signum, frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    for signum in stop_signals:
+        signal.signal(signum, stop)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def _spawn(server):
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            # Ctrl+C ana sürece gider; işçiler SIGTERM ile durdurulur
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            _serve(server, [signal.SIGTERM])
+        except BaseException:
+            logger.exception('İşçi hata ile sonlandı')
+            code = 1
+        finally:
+            # atexit kancaları (bildirim kuyruğu, last_login) çalışsın
+            sys.stdout.flush()
+            sys.exit(code)
+    logger.info('İşçi %d başlatıldı', pid)
+    return pid
+
+
+def run_prefork(server, workers):
+    children = set()
+    stopping = threading.Event()
+
+    def stop(signum, frame):
+        stopping.set()
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(workers):
+        children.add(_spawn(server))
+
+    deadline = None
+    while children:
+        if stopping.is_set() and deadline is None:
+            deadline = time.monotonic() + GRACEFUL_TIMEOUT
+        if deadline is not None and time.monotonic() > deadline:
+            for pid in children:
+                os.kill(pid, signal.SIGKILL)
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            time.sleep(0.2)
+            continue
+        children.discard(pid)
+        if not stopping.is_set():
+            logger.warning('İşçi %d sonlandı (durum %d); yenisi başlatılıyor', pid, status)
+            children.add(_spawn(server))
+    server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5004)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='İşçi süreç sayısı (varsayılan: CPU sayısı)')
+    parser.add_argument('--threads', type=int, default=16,
+                        help='İşçi başına iş parçacığı (varsayılan: 16)')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s [%(process)d] %(levelname)s %(message)s')
+
+    workers = args.workers if hasattr(os, 'fork') else 1
+    app = create_app()
+    if workers > 1:
+        enable_worker_sync(app)
+        # Deneme sınırı ve metrikler işçi başına değil, toplamda tutulur
+        share_login_throttles(app)
+        metrics_registry.share()
+    preload(app)
+    server = PooledWSGIServer(args.host, args.port, app, args.threads)
+    # accept yarışını kaybeden işçi bir sonraki bağlantıya kadar bloklanmasın
+    server.socket.setblocking(False)
+    logger.info('http://%s:%d adresinde %d işçi x %d iş parçacığı', args.host,
+                args.port, workers, args.threads)
+    if workers > 1:
+        run_prefork(server, workers)
+    else:
+        _serve(server, [signal.SIGTERM, signal.SIGINT])
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,9 @@
-from app import app, db
-from models import Person, Holiday, Team, User
+from config import create_db_app
+from models import db, Person, Holiday, Team, User
 from datetime import date
 
 def add_minimal_test_data():
+    app = create_db_app()
     with app.app_context():
         # Takım ekle
         if not Team.query.first():
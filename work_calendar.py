@@ -0,0 +1,131 @@
+"""Önceden hesaplanmış iş günü takvimi
+
+Her (ülke, yıl) için hafta sonları ve resmi tatiller bir kez yüklenir;
+günlük bitmap ve önek toplam dizisi sayesinde iki tarih arasındaki iş
+günü sayısı sabit zamanda bulunur. Holiday tablosu değiştiğinde önbellek
+temizlenir.
+"""
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import Holiday
+
+DEFAULT_COUNTRY = 'TR'
+WEEKEND = (5, 6)  # Cumartesi, Pazar
+
+
+class _YearTable:
+    """Tek bir yılın iş günü bitmap'i ve önek toplamları"""
+
+    __slots__ = ('first_ordinal', 'bitmap', 'prefix', 'holidays',
+                 'holiday_ordinals')
+
+    def __init__(self, year, holidays, weekend=WEEKEND):
+        first = date(year, 1, 1).toordinal()
+        length = date(year, 12, 31).toordinal() - first + 1
+        public = {h.date.toordinal() for h in holidays if h.is_public}
+
+        bitmap = bytearray(length)
+        prefix = array('H', [0]) * (length + 1)
+        weekday = date(year, 1, 1).weekday()
+        for i in range(length):
+            working = (weekday + i) % 7 not in weekend and first + i not in public
+            bitmap[i] = working
+            prefix[i + 1] = prefix[i] + working
+
+        self.first_ordinal = first
+        self.bitmap = bitmap
+        self.prefix = prefix
+        self.holidays = sorted((h.date, h.name) for h in holidays)
+        self.holiday_ordinals = [d.toordinal() for d, _ in self.holidays]
+
+    def count(self, start_ordinal, end_ordinal):
+        """[start, end] (aynı yıl içinde) arasındaki iş günü sayısı"""
+        return (self.prefix[end_ordinal - self.first_ordinal + 1]
+                - self.prefix[start_ordinal - self.first_ordinal])
+
+
+class WorkCalendar:
+    def __init__(self, weekend=WEEKEND):
+        self.weekend = weekend
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def invalidate(self, country=None):
+        """Önbelleği temizle (tatil eklendiğinde/silindiğinde)"""
+        with self._lock:
+            if country is None:
+                self._tables.clear()
+            else:
+                for key in [k for k in self._tables if k[0] == country]:
+                    del self._tables[key]
+
+    def _table(self, year, country):
+        key = (country, year)
+        table = self._tables.get(key)
+        if table is None:
+            holidays = Holiday.query.filter(
+                Holiday.country == country,
+                Holiday.date >= date(year, 1, 1),
+                Holiday.date <= date(year, 12, 31)
+            ).all()
+            table = _YearTable(year, holidays, self.weekend)
+            with self._lock:
+                self._tables[key] = table
+        return table
+
+    def working_days(self, start_date, end_date, country=DEFAULT_COUNTRY):
+        """İki tarih (dahil) arasındaki iş günü sayısı"""
+        if start_date > end_date:
+            return 0
+        return sum(self.working_days_by_year(start_date, end_date,
+                                             country).values())
+
+    def working_days_by_year(self, start_date, end_date,
+                             country=DEFAULT_COUNTRY):
+        """Yıllara bölünmüş iş günü sayıları: {yıl: gün}"""
+        result = {}
+        for year in range(start_date.year, end_date.year + 1):
+            first = max(start_date, date(year, 1, 1)).toordinal()
+            last = min(end_date, date(year, 12, 31)).toordinal()
+            result[year] = self._table(year, country).count(first, last)
+        return result
+
+    def is_working_day(self, day, country=DEFAULT_COUNTRY):
+        table = self._table(day.year, country)
+        return bool(table.bitmap[day.toordinal() - table.first_ordinal])
+
+    def holidays_between(self, start_date, end_date, country=DEFAULT_COUNTRY):
+        """Aralıktaki tatiller: [(tarih, ad), ...]"""
+        result = []
+        for year in range(start_date.year, end_date.year + 1):
+            table = self._table(year, country)
+            lo = bisect_left(table.holiday_ordinals, start_date.toordinal())
+            hi = bisect_right(table.holiday_ordinals, end_date.toordinal())
+            result.extend(table.holidays[lo:hi])
+        return result
+
+
+work_calendar = WorkCalendar()
+
+
+# Holiday değişikliklerinde önbelleği temizle
+@event.listens_for(Session, 'after_flush')
+def _holiday_flushed(session, flush_context):
+    changed = [obj for obj in (*session.new, *session.dirty, *session.deleted)
+               if isinstance(obj, Holiday)]
+    if changed:
+        session.info['holidays_changed'] = True
+        work_calendar.invalidate()
+
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+def _holiday_transaction_end(session):
+    if session.info.pop('holidays_changed', False):
+        work_calendar.invalidate()